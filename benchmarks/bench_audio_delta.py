@@ -0,0 +1,97 @@
+"""
+Microbenchmark of response.audio.delta handling in RealtimeConversation.
+
+Measures deltas/sec on one core for an already decoded event, from
+conversation processing to the consumer reading the audio:
+
+- baseline: the previous path, every delta decoded into a numpy array,
+  copied with tobytes() and kept on the item
+- lazy, base64 consumer: AudioPayload with no audio retained, the consumer
+  forwards the original base64 string (the Twilio bridge)
+- lazy, bytes consumer: AudioPayload with all audio retained, the consumer
+  reads the raw bytes (the Chainlit app), decoded once for both
+
+Run from the repository root:
+
+    python -m benchmarks.bench_audio_delta --seconds 1
+"""
+
+import os
+import time
+import base64
+import argparse
+
+from realtime.conversation import RealtimeConversation, RETAIN_ALL, RETAIN_NONE
+from realtime.utils import base64_to_array_buffer
+
+
+class LegacyConversation(RealtimeConversation):
+    """Reproduces the old eager decoding of every audio delta."""
+
+    def _process_audio_delta(self, event):
+        item = self.item_lookup.get(event["item_id"])
+        if not item:
+            return None, None
+        append_values = base64_to_array_buffer(event["delta"]).tobytes()
+        item["formatted"]["audio"] += [append_values]
+        return item, {"audio": append_values}
+
+
+def make_conversation(conversation_class, **kwargs):
+    conversation = conversation_class(**kwargs)
+    conversation.default_frequency = 24000
+    conversation.process_event({
+        "type": "conversation.item.created",
+        "item": {"id": "item_1", "type": "message", "role": "assistant", "content": []},
+    })
+    if conversation_class is LegacyConversation:
+        conversation.item_lookup["item_1"]["formatted"]["audio"] = []
+    return conversation
+
+
+def rate(conversation, event, consume, seconds):
+    count = 0
+    process = conversation.process_event
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            item, delta = process(event)
+            consume(delta["audio"])
+        count += 1000
+        # Keep memory flat across long runs
+        conversation.item_lookup["item_1"]["formatted"]["audio"].clear()
+        conversation.audio_bytes = 0
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--delta-bytes", type=int, default=4800, help="raw audio bytes per delta")
+    args = parser.parse_args()
+
+    audio = base64.b64encode(os.urandom(args.delta_bytes)).decode("ascii")
+    event = {
+        "type": "response.audio.delta",
+        "event_id": "event_B1cVnJcWvTLjfSTG5Ouaf",
+        "response_id": "resp_B1cVmGYgRhV1S3M8LqT1y",
+        "item_id": "item_1",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": audio,
+    }
+    candidates = [
+        ("baseline", make_conversation(LegacyConversation), lambda payload: payload),
+        ("lazy, base64 consumer", make_conversation(RealtimeConversation, audio_retention=RETAIN_NONE),
+         lambda payload: payload.base64),
+        ("lazy, bytes consumer", make_conversation(RealtimeConversation, audio_retention=RETAIN_ALL),
+         lambda payload: payload.bytes),
+    ]
+
+    print(f"deltas/sec on one core, {args.delta_bytes} byte audio deltas")
+    for name, conversation, consume in candidates:
+        print(f"{name:<24}{rate(conversation, event, consume, args.seconds):>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark of database lookups made from coroutines.
+
+Compares, against the SQLite stand-in with a simulated network latency on
+every connect and query:
+
+- blocking: the previous pattern, a new connection per lookup, opened,
+  queried and closed synchronously inside the coroutine
+- pooled: utils.db_pool.AsyncDatabase, pooled connections used from a
+  thread pool
+
+--calls coroutines each run --queries dealer lookups concurrently while a
+heartbeat task measures how late the event loop wakes it up, which is what
+every other call on the worker feels as audio jitter.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_db_pool --calls 50 --latency-ms 5
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from utils.db_pool import AsyncDatabase, SQLiteBackend
+
+QUERY = "SELECT * FROM dealers_info WHERE dealer_id = %s"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def create_database(path, dealers):
+    backend = SQLiteBackend(path)
+    conn = backend.connect()
+    conn.execute(
+        "CREATE TABLE dealers_info (dealer_id INTEGER PRIMARY KEY, dealer_name TEXT, phone TEXT, "
+        "voice TEXT, bot_name TEXT, welcome_script TEXT, opening_hours TEXT)"
+    )
+    conn.executemany(
+        "INSERT INTO dealers_info VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (i, f"Dealer {i}", f"555010{i:04d}", "alloy", f"Bot {i}", "Thanks for calling!", "Mon-Sat 9-18")
+            for i in range(dealers)
+        ],
+    )
+    conn.close()
+
+
+async def heartbeat(lags, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - expected)
+
+
+async def blocking_call(backend, queries, dealers, call):
+    for i in range(queries):
+        conn = backend.connect()
+        cursor = backend.cursor(conn, dictionary=True)
+        cursor.execute(backend.prepare(QUERY), ((call * queries + i) % dealers,))
+        cursor.fetchall()
+        cursor.close()
+        conn.close()
+        await asyncio.sleep(0)
+
+
+async def pooled_call(database, queries, dealers, call):
+    for i in range(queries):
+        await database.fetch_all(QUERY, ((call * queries + i) % dealers,), dictionary=True)
+
+
+async def measure(name, make_call, args):
+    lags = []
+    beat = asyncio.create_task(heartbeat(lags))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(make_call(call) for call in range(args.calls)))
+    elapsed = time.perf_counter() - started
+    beat.cancel()
+    queries = args.calls * args.queries
+    print(
+        f"{name:<10}{queries / elapsed:>10,.0f}{elapsed:>9.2f}"
+        f"{1000 * percentile(lags, 0.99):>12.1f}{1000 * max(lags, default=0):>11.1f}"
+    )
+
+
+async def run(args, path):
+    backend = SQLiteBackend(path, latency_ms=args.latency_ms)
+    database = AsyncDatabase(backend, pool_size=args.pool_size)
+    print(f"{args.calls} calls x {args.queries} lookups, {args.latency_ms} ms simulated latency, pool of {args.pool_size}")
+    print(f"{'':<10}{'lookups/s':>10}{'wall s':>9}{'stall p99':>12}{'stall max':>11}  (ms)")
+    await measure("blocking", lambda call: blocking_call(backend, args.queries, args.dealers, call), args)
+    await measure("pooled", lambda call: pooled_call(database, args.queries, args.dealers, call), args)
+    timings = database.timings()
+    if timings:
+        query, count, total, longest = timings[0]
+        print(f"pooled per-query timing: {count} runs, mean {1000 * total / count:.1f} ms, max {1000 * longest:.1f} ms")
+    await database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50, help="concurrent coroutines")
+    parser.add_argument("--queries", type=int, default=10, help="lookups per coroutine")
+    parser.add_argument("--dealers", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "dealers.db")
+        create_database(path, args.dealers)
+        asyncio.run(run(args, path))
+
+
+if __name__ == "__main__":
+    main()
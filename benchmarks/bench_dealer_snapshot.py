@@ -0,0 +1,105 @@
+"""
+Benchmark of the get_dealers_info tool query path.
+
+Compares, for the kind of SQL the model sends to get_dealers_info:
+
+- pandasql: the previous path, the dealer's rows loaded from the database
+  into a DataFrame and the query run with pandasql.sqldf, which builds a
+  new SQLite database every time
+- snapshot: utils.dealer_snapshot.DealerSnapshotCache, an in-memory SQLite
+  snapshot per dealer with cached statements and results
+
+Both run against the SQLite stand-in of utils.db_pool, and the outputs are
+checked to be identical. pandas and pandasql are only needed for the
+comparison.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dealer_snapshot --repeat 200
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+QUERIES = [
+    "SELECT dealer_name, address, phone FROM dealers_info",
+    "SELECT opening_hours FROM dealers_info",
+    "select   offers_test_drive, trade_ins\n  from dealers_info ;",
+    "SELECT dealer_name FROM dealers_info WHERE shipping = 'yes'",
+    "SELECT * FROM dealers_info",
+]
+
+
+def create_database(path, dealers):
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE dealers_info (dealer_id INTEGER, dealer_name TEXT, address TEXT, phone TEXT, "
+        "credit_app_link TEXT, inventory_link TEXT, offers_test_drive TEXT, welcome_message TEXT, "
+        "shipping TEXT, trade_ins TEXT, opening_hours TEXT, offer_finance TEXT, rating REAL)"
+    )
+    conn.executemany(
+        "INSERT INTO dealers_info VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (i, f"Dealer {i}", f"{i} Main St, Springfield", f"555010{i:04d}", "https://example.com/credit",
+             "https://example.com/inventory", "yes", "Welcome!", "no", "yes", "Mon-Sat 9-18", "yes", 4.5)
+            for i in range(dealers)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+async def pandasql_query(database, dealer_id, sql_query):
+    import pandas as pd
+    import pandasql as ps
+
+    rows = await database.fetch_all("SELECT * FROM dealers_info WHERE dealer_id = %s", (dealer_id,), dictionary=True)
+    result_df = ps.sqldf(sql_query, {"dealers_info": pd.DataFrame(rows)})
+    return None if result_df.empty else result_df.to_json()
+
+
+async def run(args):
+    from utils.db_pool import get_database
+    from utils.dealer_snapshot import DealerSnapshotCache
+
+    database = get_database()
+    snapshots = DealerSnapshotCache()
+    dealer_ids = [i % args.dealers for i in range(args.repeat)]
+
+    for sql_query in QUERIES:
+        expected = await pandasql_query(database, 1, sql_query)
+        actual = await snapshots.query(1, sql_query)
+        assert actual == expected, (sql_query, expected, actual)
+    print(f"outputs identical for {len(QUERIES)} queries")
+
+    for name, run_query in (("pandasql", lambda d, q: pandasql_query(database, d, q)), ("snapshot", snapshots.query)):
+        started = time.perf_counter()
+        for dealer_id in dealer_ids:
+            for sql_query in QUERIES:
+                await run_query(dealer_id, sql_query)
+        elapsed = time.perf_counter() - started
+        calls = len(dealer_ids) * len(QUERIES)
+        print(f"{name:<10}{1e6 * elapsed / calls:>10,.0f} us/call")
+    print(f"snapshot loads {snapshots.loads}, result hits {snapshots.hits}, misses {snapshots.misses}")
+    await database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="tool calls per query")
+    parser.add_argument("--dealers", type=int, default=20, help="dealers the calls are spread over")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "dealers.db")
+        create_database(path, args.dealers)
+        os.environ["DB_SQLITE_PATH"] = path
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
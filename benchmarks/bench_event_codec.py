@@ -0,0 +1,81 @@
+"""
+Microbenchmark of Realtime event encoding and decoding on a single core.
+
+Measures messages/sec for the baseline (json.loads / json.dumps on every
+message) against each available codec, for the high-volume events
+(`response.audio.delta` received, `input_audio_buffer.append` sent) and for
+a small control event.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_event_codec --seconds 1
+"""
+
+import os
+import json
+import time
+import base64
+import argparse
+
+from realtime.codec import codecs, orjson
+
+
+def make_messages(delta_bytes):
+    audio = base64.b64encode(os.urandom(delta_bytes)).decode("ascii")
+    audio_delta = json.dumps({
+        "type": "response.audio.delta",
+        "event_id": "event_B1cVnJcWvTLjfSTG5Ouaf",
+        "response_id": "resp_B1cVmGYgRhV1S3M8LqT1y",
+        "item_id": "item_B1cVmFS5tVJmpgsD2kr4E",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": audio,
+    }, separators=(",", ":"))
+    transcript_delta = json.dumps({
+        "type": "response.audio_transcript.delta",
+        "event_id": "event_B1cVnJcWvTLjfSTG5Ouag",
+        "response_id": "resp_B1cVmGYgRhV1S3M8LqT1y",
+        "item_id": "item_B1cVmFS5tVJmpgsD2kr4E",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": "Hello, ",
+    }, separators=(",", ":"))
+    audio_append = {"event_id": "evt_1729180000000", "type": "input_audio_buffer.append", "audio": audio}
+    return audio_delta, transcript_delta, audio_append
+
+
+def rate(fn, arg, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            fn(arg)
+        count += 1000
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--delta-bytes", type=int, default=4800, help="raw audio bytes per delta")
+    args = parser.parse_args()
+
+    audio_delta, transcript_delta, audio_append = make_messages(args.delta_bytes)
+    candidates = [("baseline", json.loads, json.dumps)]
+    for name, codec_class in codecs.items():
+        if name == "orjson" and orjson is None:
+            continue
+        codec = codec_class()
+        candidates.append((name, codec.decode, codec.encode))
+
+    print(f"messages/sec on one core, {args.delta_bytes} byte audio deltas")
+    print(f"{'codec':<10}{'audio.delta in':>16}{'transcript in':>16}{'append out':>16}")
+    for name, decode, encode in candidates:
+        print(f"{name:<10}"
+              f"{rate(decode, audio_delta, args.seconds):>16,.0f}"
+              f"{rate(decode, transcript_delta, args.seconds):>16,.0f}"
+              f"{rate(encode, audio_append, args.seconds):>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark of conversation item storage in RealtimeConversation.
+
+Feeds the same synthetic event stream through the previous storage (a list
+plus a dict of copied dicts, deletion by list.remove) and the ItemStore of
+slot records. Each assistant item is created, receives transcript and text
+deltas, is marked done and, once more than --live-items are in the
+conversation, a random older item is deleted, as a context window manager
+would do on a long call.
+
+Reports events/sec on one core and the memory held by the live items.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_item_store --events 100000
+"""
+
+import time
+import random
+import argparse
+import tracemalloc
+
+from realtime.conversation import RealtimeConversation, RETAIN_NONE
+
+
+class LegacyConversation(RealtimeConversation):
+    """Reproduces the previous list and dict item storage."""
+
+    def clear(self):
+        super().clear()
+        self.items = []
+        self.item_lookup = {}
+
+    def _insert_item(self, item, previous_item_id):
+        if previous_item_id is ... or not self.items or (
+                previous_item_id is not None and previous_item_id == self.items[-1]["id"]):
+            self.items.append(item)
+        elif previous_item_id is None:
+            self.items.insert(0, item)
+        else:
+            previous = self.item_lookup.get(previous_item_id)
+            if previous is None:
+                self.items.append(item)
+            else:
+                self.items.insert(self.items.index(previous) + 1, item)
+
+    def _process_item_created(self, event):
+        item = event["item"]
+        new_item = item.copy()
+        if new_item["id"] not in self.item_lookup:
+            self.item_lookup[new_item["id"]] = new_item
+            self._insert_item(new_item, event.get("previous_item_id", ...))
+        new_item["formatted"] = {"audio": bytearray(), "text": "", "transcript": ""}
+        if "content" in new_item:
+            text_content = [c for c in new_item["content"] if c["type"] in ["text", "input_text"]]
+            for content in text_content:
+                new_item["formatted"]["text"] += content["text"]
+        if new_item["type"] == "message" and new_item["role"] != "user":
+            new_item["status"] = "in_progress"
+        return new_item, None
+
+    def _process_item_deleted(self, event):
+        item_id = event["item_id"]
+        item = self.item_lookup.get(item_id)
+        if not item:
+            raise Exception(f'item.deleted: Item "{item_id}" not found')
+        del self.item_lookup[item["id"]]
+        self.items.remove(item)
+        return item, None
+
+    def _process_output_item_done(self, event):
+        item = event["item"]
+        found_item = self.item_lookup.get(item["id"])
+        if not found_item:
+            raise Exception(f'response.output_item.done: Item "{item["id"]}" not found')
+        found_item["status"] = item["status"]
+        return found_item, None
+
+    def _process_audio_transcript_delta(self, event):
+        item_id = event["item_id"]
+        content_index = event["content_index"]
+        delta = event["delta"]
+        item = self.item_lookup.get(item_id)
+        if not item:
+            raise Exception(f'response.audio_transcript.delta: Item "{item_id}" not found')
+        item["content"][content_index]["transcript"] += delta
+        item["formatted"]["transcript"] += delta
+        return item, {"transcript": delta}
+
+    def _process_text_delta(self, event):
+        item_id = event["item_id"]
+        content_index = event["content_index"]
+        delta = event["delta"]
+        item = self.item_lookup.get(item_id)
+        if not item:
+            raise Exception(f'response.text.delta: Item "{item_id}" not found')
+        item["content"][content_index]["text"] += delta
+        item["formatted"]["text"] += delta
+        return item, {"text": delta}
+
+
+def synthetic_events(count, live_items, seed=0):
+    """Roughly `count` events: 5 per item plus the deletions keeping the conversation at `live_items`."""
+    rng = random.Random(seed)
+    events = []
+    live = []
+    n = 0
+    while len(events) < count:
+        item_id = f"item_{n}"
+        n += 1
+        events.append({
+            "type": "conversation.item.created",
+            "previous_item_id": live[-1] if live else None,
+            "item": {
+                "id": item_id,
+                "object": "realtime.item",
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "audio", "transcript": ""}, {"type": "text", "text": ""}],
+            },
+        })
+        for delta in ("Thanks for calling, ", "how can I help "):
+            events.append({"type": "response.audio_transcript.delta", "item_id": item_id, "content_index": 0, "delta": delta})
+        events.append({"type": "response.text.delta", "item_id": item_id, "content_index": 1, "delta": "you today?"})
+        events.append({"type": "response.output_item.done", "item": {"id": item_id, "status": "completed"}})
+        live.append(item_id)
+        if len(live) > live_items:
+            # Anything but the newest few, oldest items the most likely
+            index = int(rng.random() ** 2 * (len(live) - 4))
+            events.append({"type": "conversation.item.deleted", "item_id": live.pop(index)})
+    return events[:count]
+
+
+def run(conversation_class, events):
+    conversation = conversation_class(audio_retention=RETAIN_NONE)
+    process = conversation.process_event
+    started = time.perf_counter()
+    for event in events:
+        process(event)
+    elapsed = time.perf_counter() - started
+    return len(events) / elapsed, conversation
+
+
+def live_memory(conversation_class, events):
+    tracemalloc.start()
+    _, conversation = run(conversation_class, events)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(conversation.item_lookup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--live-items", type=int, default=5000, help="conversation size kept by deletions")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.events} events, conversation kept at {args.live_items} items")
+    print(f"{'':<10}{'events/sec':>14}{'live items':>12}{'memory':>12}")
+    for name, conversation_class in (("list/dict", LegacyConversation), ("ItemStore", RealtimeConversation)):
+        # Deltas are applied in place, so every run gets a fresh copy of the stream
+        rate = max(
+            run(conversation_class, synthetic_events(args.events, args.live_items))[0]
+            for _ in range(args.repeat)
+        )
+        memory, items = live_memory(conversation_class, synthetic_events(args.events, args.live_items))
+        print(f"{name:<10}{rate:>14,.0f}{items:>12}{memory / 1e6:>10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
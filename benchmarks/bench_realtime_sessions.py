@@ -0,0 +1,147 @@
+"""
+Load test of concurrent RealtimeClient sessions against the local fake server.
+
+Starts realtime.fake_server in-process (or uses --url), opens N sessions in
+the Twilio configuration (G.711 mu-law passthrough, 100 ms input coalescing)
+and streams 20 ms frames of input audio into each in real time. The fake
+server turns that audio into caller turns and streamed responses. Reports
+the response latency seen by the clients (speech_stopped to first audio
+delta), event throughput and CPU use of this process.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_realtime_sessions --sessions 200 --seconds 30
+
+With --url, run the fake server in its own process so its CPU is not counted:
+
+    python -m realtime.fake_server --port 8765 &
+    python -m benchmarks.bench_realtime_sessions --url ws://127.0.0.1:8765
+"""
+
+import time
+import base64
+import asyncio
+import logging
+import argparse
+
+from realtime.client import RealtimeClient
+from realtime.fake_server import FakeRealtimeServer
+
+FRAME_MS = 20
+SILENCE_FRAME = base64.b64encode(b"\xff" * (FRAME_MS * 8)).decode("ascii")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class SessionProbe:
+    """Streams audio into one session and records what it sees."""
+
+    def __init__(self, url):
+        self.client = RealtimeClient(
+            url=url,
+            api_key="load-test",
+            audio_format="g711_ulaw",
+            input_audio_chunk_ms=100,
+            voice="alloy",
+            dealer_id="load-test",
+            auto_start=False,
+        )
+        self.latencies = []
+        self.events = 0
+        self.stopped_at = None
+        self.client.realtime.on("server.input_audio_buffer.speech_stopped", self._on_speech_stopped)
+        self.client.realtime.on("server.response.audio.delta", self._on_audio_delta)
+        self.client.realtime.on("server.*", self._count)
+
+    def _count(self, event):
+        self.events += 1
+
+    def _on_speech_stopped(self, event):
+        self.stopped_at = time.monotonic()
+
+    def _on_audio_delta(self, event):
+        if self.stopped_at is not None:
+            self.latencies.append(time.monotonic() - self.stopped_at)
+            self.stopped_at = None
+
+    async def run(self, seconds):
+        await self.client.connect()
+        await asyncio.wait_for(self.client.wait_for_session_created(), timeout=30)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        frame = 0
+        while loop.time() - started < seconds:
+            await self.client.append_input_audio(SILENCE_FRAME)
+            frame += 1
+            delay = started + frame * FRAME_MS / 1000 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await self.client.disconnect()
+
+
+async def run(args):
+    server = None
+    url = args.url
+    if not url:
+        server = await FakeRealtimeServer(
+            port=0,
+            latency_ms=args.latency_ms,
+            response_ms=args.response_ms,
+            speech_ms=args.speech_ms,
+            pause_ms=args.pause_ms,
+        ).start()
+        url = server.url
+
+    probes = [SessionProbe(url) for _ in range(args.sessions)]
+    cpu_started = time.process_time()
+    wall_started = time.monotonic()
+    tasks = []
+    for probe in probes:
+        tasks.append(asyncio.create_task(probe.run(args.seconds)))
+        # Ramp up rather than opening every socket in the same instant
+        await asyncio.sleep(args.ramp / max(1, args.sessions))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    wall = time.monotonic() - wall_started
+    cpu = time.process_time() - cpu_started
+    if server:
+        await server.close()
+
+    failed = [r for r in results if isinstance(r, Exception)]
+    latencies = [l for probe in probes for l in probe.latencies]
+    events = sum(probe.events for probe in probes)
+    print(f"sessions: {args.sessions} ({len(failed)} failed), {wall:.1f} s wall")
+    print(f"server events received: {events} ({events / wall:.0f}/s)")
+    print(f"CPU: {cpu:.1f} s ({100 * cpu / wall:.0f}% of one core), {1000 * cpu / wall / args.sessions:.2f} ms CPU per session-second")
+    print(
+        f"response latency over {len(latencies)} turns: "
+        f"p50 {1000 * percentile(latencies, 0.5):.0f} ms, "
+        f"p95 {1000 * percentile(latencies, 0.95):.0f} ms, "
+        f"p99 {1000 * percentile(latencies, 0.99):.0f} ms"
+    )
+    if failed:
+        print(f"first failure: {failed[0]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which sessions are opened")
+    parser.add_argument("--url", help="an already running fake server, started in-process when omitted")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--response-ms", type=int, default=2000)
+    parser.add_argument("--speech-ms", type=int, default=1500)
+    parser.add_argument("--pause-ms", type=int, default=3000)
+    args = parser.parse_args()
+    # Per-call INFO logs would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark of silence detection strategies under concurrent calls.
+
+Simulates N concurrent calls where every call sees a Twilio audio frame and an
+audio delta every 20 ms, plus a VAD speech boundary every few seconds, and
+reports peak thread count and CPU time per call for:
+
+- legacy: one threading.Timer cancelled and restarted on every event
+- wheel: the shared TimerWheel, only touched on speech events
+
+Run from the repository root:
+
+    python -m benchmarks.bench_silence_timers --calls 50 --seconds 10
+"""
+
+import time
+import asyncio
+import argparse
+import threading
+
+from realtime.inactivitetimeout import SilenceDetector
+
+FRAME_INTERVAL = 0.02
+EVENTS_PER_FRAME = 2  # input_audio_buffer.append + response.audio.delta
+SPEECH_EVERY_FRAMES = 150  # a speech boundary every 3 seconds
+
+
+class LegacyTimerCall:
+    """Reproduces the old per-event threading.Timer behaviour."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.timer = None
+
+    def start(self):
+        self._schedule()
+
+    def on_event(self):
+        if self.timer:
+            self.timer.cancel()
+        self._schedule()
+
+    def on_speech(self, started):
+        self.on_event()
+
+    def stop(self):
+        if self.timer:
+            self.timer.cancel()
+
+    def _schedule(self):
+        self.timer = threading.Timer(self.timeout, lambda: None)
+        self.timer.daemon = True
+        self.timer.start()
+
+
+class WheelCall:
+    """The current behaviour: raw traffic is ignored, VAD drives the detector."""
+
+    def __init__(self, timeout):
+        self.detector = SilenceDetector(timeout_seconds=timeout)
+
+    def start(self):
+        self.detector.start()
+
+    def on_event(self):
+        pass
+
+    def on_speech(self, started):
+        if started:
+            self.detector.pause()
+        else:
+            self.detector.resume()
+
+    def stop(self):
+        self.detector.stop()
+
+
+async def run_call(call, frames, stats):
+    call.start()
+    started = False
+    next_tick = time.monotonic()
+    for frame in range(frames):
+        for _ in range(EVENTS_PER_FRAME):
+            call.on_event()
+        if frame % SPEECH_EVERY_FRAMES == 0:
+            started = not started
+            call.on_speech(started)
+        stats["peak_threads"] = max(stats["peak_threads"], threading.active_count())
+        next_tick += FRAME_INTERVAL
+        await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+    call.stop()
+
+
+async def run_scenario(factory, calls, seconds, timeout):
+    stats = {"peak_threads": threading.active_count()}
+    frames = int(seconds / FRAME_INTERVAL)
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    await asyncio.gather(*(run_call(factory(timeout), frames, stats) for _ in range(calls)))
+    stats["cpu"] = time.process_time() - cpu_start
+    stats["wall"] = time.monotonic() - wall_start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    print(f"{args.calls} concurrent calls, {args.seconds}s each, "
+          f"{EVENTS_PER_FRAME / FRAME_INTERVAL:.0f} events/s per call")
+    print(f"{'strategy':<10}{'peak threads':>14}{'cpu s':>10}{'cpu ms/call/s':>16}")
+    for name, factory in (("legacy", LegacyTimerCall), ("wheel", WheelCall)):
+        stats = asyncio.run(run_scenario(factory, args.calls, args.seconds, args.timeout))
+        per_call = stats["cpu"] * 1000 / args.calls / stats["wall"]
+        print(f"{name:<10}{stats['peak_threads']:>14}{stats['cpu']:>10.2f}{per_call:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
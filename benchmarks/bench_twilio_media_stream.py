@@ -0,0 +1,344 @@
+"""
+Load generator imitating Twilio against a running twilio_app.
+
+For every simulated call it requests /incoming-call like Twilio's webhook,
+reads the <Stream> URL and parameters out of the TwiML, opens the
+/media-stream websocket and sends `connected`, `start`, then 20 ms mu-law
+`media` frames paced in real time (from a WAV file or a synthetic signal),
+and finally `stop`. It reads back the `media` frames the server sends.
+
+Concurrency ramps through the given levels. For each level it reports:
+
+- time to first audio: from `start` to the first `media` frame received
+- jitter: RFC 3550 style interarrival jitter of received audio against
+  its own playout clock, within talk spurts
+- underruns: frames received more than a frame after the audio before
+  them finished playing
+- clears: barge-ins, `clear` messages received (marks are echoed once
+  played, like Twilio does, so the server can track playback)
+- send lag: how late this generator sent its own frames, a sign it is
+  itself saturated
+- server CPU (% of one core) and peak RSS, from /proc/<pid> or psutil
+
+Pair it with the fake Realtime server to find the per-worker call ceiling:
+
+    python -m realtime.fake_server --port 8765 &
+    REALTIME_URL=ws://127.0.0.1:8765 REALTIME_POOL_SIZE=0 python twilio_app.py &
+    python -m benchmarks.bench_twilio_media_stream --url http://127.0.0.1:5050 \\
+        --levels 10,25,50,100 --step-seconds 30 --server-pid $!
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import wave
+import base64
+import asyncio
+import argparse
+import urllib.parse
+import urllib.request
+
+import websockets
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+FRAME_MS = 20
+FRAME_BYTES = 160  # 20 ms of 8 kHz mu-law
+# Silence longer than this between received frames starts a new talk spurt
+TALK_SPURT_GAP = 0.5
+
+
+def linear_to_ulaw(sample):
+    """G.711 mu-law encoding of one signed 16-bit sample."""
+    sign = 0x80 if sample < 0 else 0
+    if sample < 0:
+        sample = -sample
+    sample = min(sample, 32635) + 0x84
+    exponent = 7
+    mask = 0x4000
+    while exponent > 0 and not sample & mask:
+        exponent -= 1
+        mask >>= 1
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def load_wav(path):
+    """mu-law bytes of an 8 kHz mono 16-bit PCM WAV file."""
+    with wave.open(path, "rb") as wav:
+        if wav.getframerate() != 8000 or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError("WAV must be 8 kHz mono 16-bit PCM")
+        pcm = wav.readframes(wav.getnframes())
+    samples = memoryview(pcm).cast("h")
+    return bytes(linear_to_ulaw(s) for s in samples)
+
+
+def synthetic_audio(seconds=10):
+    """Alternating 1.5 s of a 300 Hz tone and 3 s of silence, in mu-law."""
+    speech = bytes(
+        linear_to_ulaw(int(6000 * math.sin(2 * math.pi * 300 * n / 8000))) for n in range(12000)
+    )
+    silence = b"\xff" * 24000
+    cycle = silence + speech
+    return (cycle * int(seconds * 8000 // len(cycle) + 1))[:int(seconds * 8000)]
+
+
+def audio_frames(audio):
+    """The audio cut into base64 20 ms frames."""
+    return [
+        base64.b64encode(audio[i:i + FRAME_BYTES].ljust(FRAME_BYTES, b"\xff")).decode("ascii")
+        for i in range(0, len(audio), FRAME_BYTES)
+    ]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class ServerSampler:
+    """CPU time and RSS of the server process (and its children) from psutil or /proc."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak_rss = 0
+
+    def _pids(self):
+        if psutil is not None:
+            process = psutil.Process(self.pid)
+            return [process] + process.children(recursive=True)
+        return [self.pid]
+
+    def cpu_seconds(self):
+        if not self.pid:
+            return 0.0
+        total = 0.0
+        for process in self._pids():
+            if psutil is not None:
+                times = process.cpu_times()
+                total += times.user + times.system
+            else:
+                with open(f"/proc/{process}/stat") as stat:
+                    # Fields after the parenthesised command name; utime and stime are 14 and 15
+                    fields = stat.read().rsplit(")", 1)[1].split()
+                total += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        return total
+
+    def sample_rss(self):
+        if not self.pid:
+            return
+        rss = 0
+        for process in self._pids():
+            if psutil is not None:
+                rss += process.memory_info().rss
+            else:
+                with open(f"/proc/{process}/status") as status:
+                    for line in status:
+                        if line.startswith("VmRSS:"):
+                            rss += int(line.split()[1]) * 1024
+        self.peak_rss = max(self.peak_rss, rss)
+
+
+class SimulatedCall:
+    """One Twilio call: the webhook, then a media stream for `seconds`."""
+
+    def __init__(self, base_url, frames, seconds):
+        self.base_url = base_url.rstrip("/")
+        self.frames = frames
+        self.seconds = seconds
+        self.call_sid = "CA" + uuid.uuid4().hex
+        self.stream_sid = "MZ" + uuid.uuid4().hex
+        self.time_to_first_audio = None
+        self.jitter = 0.0
+        self.underruns = 0
+        self.frames_received = 0
+        self.clears = 0
+        self.max_send_lag = 0.0
+        self.started = None
+        self.error = None
+
+    def _incoming_call(self):
+        data = urllib.parse.urlencode({
+            "CallSid": self.call_sid,
+            "From": "+15550100" + self.call_sid[-3:],
+            "To": "+15550199000",
+        }).encode()
+        with urllib.request.urlopen(f"{self.base_url}/incoming-call", data=data, timeout=10) as response:
+            return response.read().decode("utf-8")
+
+    def _stream_target(self, twiml):
+        # The TwiML points at wss://<host>/media-stream; test servers run plain ws on the same host
+        stream_url = re.search(r'<Stream url="([^"]+)"', twiml).group(1)
+        path = urllib.parse.urlparse(stream_url).path
+        base = urllib.parse.urlparse(self.base_url)
+        scheme = "wss" if base.scheme == "https" else "ws"
+        parameters = dict(re.findall(r'<Parameter name="([^"]+)" value="([^"]*)"', twiml))
+        return f"{scheme}://{base.netloc}{path}", parameters
+
+    async def run(self):
+        try:
+            twiml = await asyncio.to_thread(self._incoming_call)
+            url, parameters = self._stream_target(twiml)
+            async with websockets.connect(url) as ws:
+                receiver = asyncio.create_task(self._receive(ws))
+                await self._send(ws, parameters)
+                receiver.cancel()
+        except Exception as e:
+            self.error = e
+
+    async def _send(self, ws, parameters):
+        loop = asyncio.get_running_loop()
+        await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+        self.started = loop.time()
+        await ws.send(json.dumps({
+            "event": "start",
+            "sequenceNumber": "1",
+            "start": {
+                "streamSid": self.stream_sid,
+                "callSid": self.call_sid,
+                "tracks": ["inbound"],
+                "customParameters": parameters,
+                "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+            },
+            "streamSid": self.stream_sid,
+        }))
+        started = loop.time()
+        count = int(self.seconds * 1000 / FRAME_MS)
+        for index in range(count):
+            due = started + index * FRAME_MS / 1000
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.max_send_lag = max(self.max_send_lag, -delay)
+            await ws.send(json.dumps({
+                "event": "media",
+                "sequenceNumber": str(index + 2),
+                "media": {
+                    "track": "inbound",
+                    "chunk": str(index + 1),
+                    "timestamp": str(index * FRAME_MS),
+                    "payload": self.frames[index % len(self.frames)],
+                },
+                "streamSid": self.stream_sid,
+            }))
+        await ws.send(json.dumps({"event": "stop", "streamSid": self.stream_sid, "stop": {"callSid": self.call_sid}}))
+
+    async def _receive(self, ws):
+        loop = asyncio.get_running_loop()
+        playout_end = None
+        previous_transit = None
+        pending_marks = []
+        async for message in ws:
+            event = json.loads(message)
+            kind = event.get("event")
+            now = loop.time()
+            if kind == "mark":
+                # Like Twilio, echo a mark once the audio queued before it has played
+                echo = json.dumps({"event": "mark", "streamSid": self.stream_sid, "mark": event["mark"]})
+                due = max(now, playout_end or now)
+                pending_marks.append(loop.call_at(due, lambda: asyncio.ensure_future(self._send_mark(ws, echo))))
+                continue
+            if kind == "clear":
+                # Buffered audio is dropped along with its marks
+                self.clears += 1
+                for handle in pending_marks:
+                    handle.cancel()
+                pending_marks = []
+                playout_end = None
+                continue
+            if kind != "media":
+                continue
+            payload = event["media"]["payload"]
+            duration = (len(payload) * 3 // 4 - payload[-2:].count("=")) / 8000
+            self.frames_received += 1
+            if self.time_to_first_audio is None:
+                self.time_to_first_audio = now - self.started
+            if playout_end is None or now - playout_end > TALK_SPURT_GAP:
+                # New talk spurt, its first frame defines the playout clock
+                playout_end = now
+                previous_transit = None
+            elif now > playout_end + FRAME_MS / 1000:
+                # Later than a frame past the end of what was queued: audible gap
+                self.underruns += 1
+            # Transit relative to the playout clock; jitter is its smoothed variation
+            transit = now - playout_end
+            if previous_transit is not None:
+                self.jitter += (abs(transit - previous_transit) - self.jitter) / 16
+            previous_transit = transit
+            playout_end = max(playout_end, now) + duration
+
+    async def _send_mark(self, ws, message):
+        try:
+            await ws.send(message)
+        except websockets.ConnectionClosed:
+            pass
+
+
+async def run_level(args, frames, concurrency, sampler):
+    calls = [SimulatedCall(args.url, frames, args.step_seconds) for _ in range(concurrency)]
+    cpu_started = sampler.cpu_seconds()
+    wall_started = time.monotonic()
+    tasks = []
+    for call in calls:
+        tasks.append(asyncio.create_task(call.run()))
+        await asyncio.sleep(args.ramp / concurrency)
+    while not all(task.done() for task in tasks):
+        sampler.sample_rss()
+        await asyncio.wait(tasks, timeout=1)
+    wall = time.monotonic() - wall_started
+    cpu = sampler.cpu_seconds() - cpu_started
+
+    ok = [call for call in calls if call.error is None]
+    ttfa = [call.time_to_first_audio for call in ok if call.time_to_first_audio is not None]
+    jitter = [call.jitter for call in ok if call.frames_received]
+    errors = [call.error for call in calls if call.error is not None]
+    print(
+        f"{concurrency:>5} {len(ok):>4}/{len(errors):<4}"
+        f" {1000 * percentile(ttfa, 0.5):>7.0f} {1000 * percentile(ttfa, 0.95):>7.0f}"
+        f" {1000 * percentile(jitter, 0.5):>7.1f} {1000 * percentile(jitter, 0.95):>7.1f}"
+        f" {sum(call.underruns for call in ok):>6}"
+        f" {sum(call.clears for call in ok):>6}"
+        f" {1000 * max((call.max_send_lag for call in calls), default=0):>7.1f}"
+        f" {100 * cpu / wall:>6.0f} {sampler.peak_rss / 2 ** 20:>7.0f}"
+    )
+    if errors:
+        print(f"      first error: {errors[0]!r}")
+
+
+async def run(args):
+    audio = load_wav(args.wav) if args.wav else synthetic_audio()
+    frames = audio_frames(audio)
+    sampler = ServerSampler(args.server_pid)
+    print("calls  ok/fail  ttfa50  ttfa95  jit50  jit95  under  clear  sendlag  cpu%  rss_mb")
+    print("                  (ms)    (ms)   (ms)   (ms)                   (ms)")
+    for level in args.levels:
+        await run_level(args, frames, level, sampler)
+        await asyncio.sleep(args.cooldown)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5050", help="base URL of twilio_app")
+    parser.add_argument("--levels", default="5,10,25,50",
+                        type=lambda value: [int(level) for level in value.split(",")],
+                        help="comma-separated concurrency levels to ramp through")
+    parser.add_argument("--step-seconds", type=float, default=20, help="length of every call")
+    parser.add_argument("--ramp", type=float, default=2, help="seconds over which a level's calls start")
+    parser.add_argument("--cooldown", type=float, default=3, help="seconds between levels")
+    parser.add_argument("--wav", help="8 kHz mono 16-bit WAV streamed as caller audio")
+    parser.add_argument("--server-pid", type=int, help="twilio_app process to sample CPU and memory from")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
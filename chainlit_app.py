@@ -12,8 +12,9 @@ from dotenv import load_dotenv
 
 from realtime.client import RealtimeClient
 from realtime.utils import get_realtime_instructions
-from config.systeme_prompt import agent_system_prompt
 from tools import tools
+from utils.dealer_profile import dealer_profiles
+from variables.variables import load_variables
 
 # Load environment variables
 load_dotenv()
@@ -29,9 +30,10 @@ async def setup_openai_realtime():
         logger.error("OPENAI_API_KEY not found in environment variables")
         return None
 
+    # The system prompt is built per session from the dealer's cached profile, see config.systeme_prompt
+    await dealer_profiles.load(load_variables().get("dealer_id"))
     openai_realtime = RealtimeClient(
         api_key=api_key,
-        system_message=agent_system_prompt
     )
     cl.user_session.set("track_id", str(uuid4()))
 
@@ -40,7 +42,7 @@ async def setup_openai_realtime():
         delta = event.get("delta")
         if delta:
             if "audio" in delta:
-                audio = delta["audio"]
+                audio = delta["audio"].bytes
                 await cl.context.emitter.send_audio_chunk(
                     cl.OutputAudioChunk(
                         mimeType="pcm16",
@@ -1,16 +1,20 @@
-from utils.get_dealer_name_bot import get_dealer_name_bot
-from utils.get_welcome_script import get_welcome_script 
-bot_name=get_dealer_name_bot()
+"""
+System prompt of the sales agent.
+
+The prompt is built on demand, never at import. The static instructions,
+with the dealer's bot name filled in, are compiled once per dealer and form
+a stable prefix that upstream prompt caching can reuse across calls. The
+parts that change on every call (date, time, caller context and the
+featured vehicles) are appended after it.
+"""
+
+from string import Template
 from datetime import datetime
+from utils.get_dealer_name_bot import get_dealer_name_bot
 
-# Get current date and time
-now = datetime.now()
+DEFAULT_BOT_NAME = "your sales assistant"
 
-# Extract date and time components
-current_date = now.date()  # YYYY-MM-DD
-current_time = now.time()  # HH:MM:SS.microseconds
-welcome_script=get_welcome_script()
-suitable_vehicles="""
+DEFAULT_FEATURED_VEHICLES = """
 2023 Honda TRX520FM1P – A green ATV priced at $8,519 with 0 miles.
 2023 Honda SXS10M5PP – A black side-by-side utility vehicle priced at $20,194 with 0 miles.
 2023 Honda SXS10M3DTP – Available in orange and blue, both priced at $22,194 with 0 miles.
@@ -23,13 +27,10 @@ suitable_vehicles="""
 2025 Honda SXS700M4DS – A black forest green side-by-side priced at $17,777 with 1 mile.
 2025 Honda SXS10M5DS – A black forest green side-by-side priced at $20,399 with 0 miles.
 Most of these vehicles are brand new with little to no mileage. The list consists of a mix of ATVs, side-by-sides, and motorcycles, with colors ranging from red, black, green, orange, yellow, and gray. Prices vary from under $2,000 for dirt bikes to over $22,000 for larger utility vehicles.
-
-
 """
 
-
-
-agent_system_prompt = """
+# Only per-dealer values in here, anything that changes per call goes in CALL_CONTEXT_TEMPLATE
+AGENT_PROMPT_TEMPLATE = Template("""
 Instructions:
 You are ${bot_name}, a top-performing automotive sales consultant at our dealership. You're initiating a phone conversation with a potential customer.
 
@@ -39,16 +40,12 @@ Your PRIMARY MISSION is to secure either:
 1. A vehicle purchase commitment
 2. A firm test drive appointment
 
-Current date: {date}
-Current time: {time}
-
-FEATURED VEHICLES TO PROMOTE:
-${suitable_vehicles}
+The current date and time and the FEATURED VEHICLES TO PROMOTE are listed at the end of these instructions.
 
 VEHICLE RECOMMENDATION STRATEGY:
-- Immediately reference our featured vehicles from the list above
+- Immediately reference our featured vehicles from the list below
 - Match specific vehicles to customer needs based on their responses
-- Describe these vesuitable_vehicles=hicles with vivid, compelling details that create desire
+- Describe these vehicles with vivid, compelling details that create desire
 - Emphasize limited availability of these specific models
 - Quote exact pricing and financing options for these vehicles
 - Mention any special promotions or discounts available for these specific models
@@ -90,7 +87,61 @@ Use all available tools aggressively to:
 - Schedule appointments immediately while on the call
 
 Remember: Every call MUST end with either a purchase commitment for a specific vehicle or a scheduled test drive appointment. Be persistent, confident, and always lead the customer toward a decision about our featured vehicles.
+""")
+
+CALL_CONTEXT_TEMPLATE = Template("""
+Current date: ${date}
+Current time: ${time}
+${caller}
+FEATURED VEHICLES TO PROMOTE:
+${featured_vehicles}""")
+
+
+class SystemPromptBuilder:
+    """Compiles the static prompt once per dealer and appends the per-call context."""
+
+    def __init__(self, template: Template = AGENT_PROMPT_TEMPLATE):
+        self.template = template
+        self._prefixes = {}
+
+    def prefix(self, dealer_id=None) -> str:
+        """The stable part of the prompt for `dealer_id`, compiled on first use."""
+        # Keyed by bot name too, so renaming the bot recompiles the prefix
+        bot_name = get_dealer_name_bot(dealer_id) or DEFAULT_BOT_NAME
+        key = (str(dealer_id), bot_name)
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = self._prefixes[key] = self.template.substitute(bot_name=bot_name)
+        return prefix
+
+    def build(self, dealer_id=None, caller_number=None, featured_vehicles=None, now=None) -> str:
+        now = now or datetime.now()
+        caller = f"Caller phone number: {caller_number}\n" if caller_number and caller_number != "Unknown" else ""
+        return self.prefix(dealer_id) + CALL_CONTEXT_TEMPLATE.substitute(
+            date=now.strftime("%Y-%m-%d"),
+            time=now.strftime("%H:%M"),
+            caller=caller,
+            featured_vehicles=(featured_vehicles or DEFAULT_FEATURED_VEHICLES).strip(),
+        )
+
+    def invalidate(self, dealer_id=None):
+        if dealer_id is None:
+            self._prefixes.clear()
+            return
+        for key in [key for key in self._prefixes if key[0] == str(dealer_id)]:
+            del self._prefixes[key]
+
+
+prompt_builder = SystemPromptBuilder()
+
 
+def build_system_prompt(dealer_id=None, **context) -> str:
+    """System prompt for one call of `dealer_id`, see SystemPromptBuilder.build for the context."""
+    return prompt_builder.build(dealer_id, **context)
 
 
-""".format(bot_name=bot_name,date=current_date, time=current_time,suitable_vehicles=suitable_vehicles)
\ No newline at end of file
+def __getattr__(name):
+    # Former module constant, now built on access with the current date and time
+    if name == "agent_system_prompt":
+        return build_system_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,14 @@
 import os
 import asyncio
 import uuid
-import json
 import websockets
 from datetime import datetime
 import logging
 from .event_handler import RealtimeEventHandler
+from .codec import get_codec
+from .send_queue import SendQueue
+from .recorder import SessionRecorder
+from .metrics import events_total
 from websockets.http import Headers
 logger = logging.getLogger(__name__)
 
@@ -16,8 +19,13 @@ class RealtimeAPI(RealtimeEventHandler):
         api_key=None,
         api_version="2024-12-17-preview",
         deployment=None,
+        codec=None,
+        send_queue_options=None,
     ):
         super().__init__()
+        self.codec = codec or get_codec()
+        self.send_queue_options = send_queue_options or {}
+        self.send_queue = None
         self.use_azure = os.getenv("USE_AZURE", "false").lower() == "true"
 
         if self.use_azure:
@@ -33,17 +41,26 @@ class RealtimeAPI(RealtimeEventHandler):
             self.api_key = api_key or os.getenv("OPENAI_API_KEY")
 
         self.ws = None
+        self.recorder = None
 
     def is_connected(self):
         return self.ws is not None
 
     def log(self, *args):
-        logger.debug(f"[Websocket/{datetime.utcnow().isoformat()}]", *args)
+        # Called for every event sent and received, so skip all formatting unless debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[Websocket/%s] %s", datetime.utcnow().isoformat(), " ".join(str(arg) for arg in args))
 
-    async def connect(self, model="gpt-4o-mini-realtime-preview-2024-12-17"):
+    async def connect(self, model="gpt-4o-mini-realtime-preview-2024-12-17", ws=None):
+        """Open the websocket, or adopt `ws` (e.g. a recorder.NullWebSocket for offline replay)."""
         if self.is_connected():
             raise Exception("Already connected")
 
+        if ws is not None:
+            self.ws = ws
+            self._start_send_queue()
+            return
+
         if self.use_azure:
             if not self.url:
                 raise ValueError("Azure OpenAI URL is required")
@@ -67,16 +84,86 @@ class RealtimeAPI(RealtimeEventHandler):
             )
 
         self.log(f"Connected to {self.url}")
+        self._start_send_queue()
         asyncio.create_task(self._receive_messages())
 
+    def _start_send_queue(self):
+        ws = self.ws
+
+        async def write(message):
+            if self.recorder:
+                self.recorder.record_sent(message)
+            await ws.send(message)
+
+        def on_send_error(error):
+            # Closing the socket ends the receive loop, which runs the lost connection path (and reconnects)
+            if self.ws is ws:
+                asyncio.create_task(ws.close())
+
+        self.send_queue = SendQueue(
+            write,
+            write_buffer_size=self._write_buffer_size,
+            on_error=on_send_error,
+            **self.send_queue_options,
+        )
+        self.send_queue.start()
+
+    def start_recording(self, path):
+        """Append every frame sent and received from now on to `path`, see realtime.recorder."""
+        self.stop_recording()
+        self.recorder = SessionRecorder(path)
+        return self.recorder
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def _write_buffer_size(self):
+        transport = getattr(self.ws, "transport", None)
+        return transport.get_write_buffer_size() if transport else 0
+
     async def _receive_messages(self):
-        async for message in self.ws:
-            event = json.loads(message)
-            if event["type"] == "error":
-                logger.error("ERROR", event)
-            self.log("received:", event)
-            self.dispatch(f"server.{event['type']}", event)
-            self.dispatch("server.*", event)
+        ws = self.ws
+        error = None
+        try:
+            async for message in ws:
+                if self.ws is not ws:
+                    # Detached by disconnect(), drop what arrives while closing
+                    break
+                if self.recorder:
+                    self.recorder.record_received(message)
+                try:
+                    self._handle_message(message)
+                except Exception as e:
+                    # A bad event or handler must not take the whole call down
+                    logger.error(f"Error handling Realtime event: {str(e)}", exc_info=True)
+        except websockets.ConnectionClosed as e:
+            error = e
+        finally:
+            # disconnect() detaches the socket first, so still owning it here
+            # means the connection was lost rather than closed by us
+            if self.ws is ws:
+                self.ws = None
+                send_queue = self.send_queue
+                # A failed send closes the socket itself, report why
+                error = error or (send_queue.error if send_queue else None)
+                logger.warning(f"Connection to {self.url} lost: {error or 'closed by server'}")
+                # Dispatched before awaiting anything, so listeners (the client's
+                # reconnect) see the loss before other tasks try to send
+                self.dispatch("close", {"error": True, "reason": str(error or "closed by server")})
+                if send_queue:
+                    await send_queue.close()
+
+    def _handle_message(self, message):
+        """Decode and dispatch one server message, live or from a recording."""
+        event = self.codec.decode(message)
+        events_total.inc(direction="server", type=event["type"])
+        if event["type"] == "error":
+            logger.error("ERROR %s", event)
+        self.log("received:", event)
+        self.dispatch(f"server.{event['type']}", event)
+        self.dispatch("server.*", event)
 
     async def send(self, event_name, data=None):
         if not self.is_connected():
@@ -85,17 +172,21 @@ class RealtimeAPI(RealtimeEventHandler):
         if not isinstance(data, dict):
             raise Exception("data must be a dictionary")
         event = {"event_id": self._generate_id("evt_"), "type": event_name, **data}
+        events_total.inc(direction="client", type=event_name)
         self.dispatch(f"client.{event_name}", event)
         self.dispatch("client.*", event)
         self.log("sent:", event)
-        await self.ws.send(json.dumps(event))
+        await self.send_queue.put(event_name, self.codec.encode(event))
 
     def _generate_id(self, prefix):
         return f"{prefix}{int(datetime.utcnow().timestamp() * 1000)}"
 
     async def disconnect(self):
-        if self.ws:
-            await self.ws.close()
-            self.ws = None
+        ws, self.ws = self.ws, None
+        if self.send_queue:
+            await self.send_queue.close()
+        if ws:
+            await ws.close()
             self.log(f"Disconnected from {self.url}")
+        self.stop_recording()
 
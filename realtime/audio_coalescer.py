@@ -0,0 +1,133 @@
+# audio_coalescer.py
+import time
+import base64
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCoalescer:
+    """
+    Batches small inbound audio frames into larger `input_audio_buffer.append` messages.
+
+    Frames are buffered until `chunk_ms` of audio is pending, the oldest
+    buffered frame has waited `max_delay_ms`, or `flush()` is called (speech
+    boundaries, commits, disconnects).
+    """
+
+    def __init__(self,
+                 send: Callable[[str], Awaitable[None]],
+                 bytes_per_ms: int,
+                 chunk_ms: int = 100,
+                 max_delay_ms: Optional[int] = None):
+        """
+        Initialize the coalescer.
+
+        Args:
+            send: Coroutine function sending one base64 audio chunk upstream
+            bytes_per_ms: Audio bytes per millisecond in the session's input format
+            chunk_ms: Amount of audio to batch into a single message
+            max_delay_ms: Longest a frame may wait before being flushed
+        """
+        self.send = send
+        self.bytes_per_ms = bytes_per_ms
+        self.chunk_ms = chunk_ms
+        self.chunk_bytes = chunk_ms * bytes_per_ms
+        self.max_delay_ms = max_delay_ms if max_delay_ms is not None else chunk_ms + 40
+        self.pending = bytearray()
+        self.pending_frames = 0
+        self.pending_arrival_sum = 0.0
+        self.pending_since = None
+        self.deadline_handle = None
+        # Background flushes in flight, referenced until they finish
+        self.flush_tasks = set()
+
+        # Metrics
+        self.started_at = None
+        self.frames_in = 0
+        self.frames_discarded = 0
+        self.messages_out = 0
+        self.added_latency_sum = 0.0
+        self.added_latency_max = 0.0
+
+    async def add(self, audio: bytes):
+        """Buffer one frame of raw audio, flushing when a chunk is full."""
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now
+        self.frames_in += 1
+        if not self.pending:
+            self.pending_since = now
+        self.pending += audio
+        self.pending_frames += 1
+        self.pending_arrival_sum += now
+        if len(self.pending) >= self.chunk_bytes:
+            await self.flush()
+        elif self.deadline_handle is None:
+            loop = asyncio.get_event_loop()
+            self.deadline_handle = loop.call_later(self.max_delay_ms / 1000, self._on_deadline)
+
+    def _on_deadline(self):
+        self.deadline_handle = None
+        if self.pending:
+            self.flush_soon()
+
+    def flush_soon(self):
+        """Flush in a background task, e.g. from a sync event handler. Send errors are logged."""
+        task = asyncio.create_task(self.flush())
+        self.flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+        return task
+
+    def _flush_done(self, task):
+        self.flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error flushing coalesced input audio: {str(task.exception())}")
+
+    async def flush(self):
+        """Send everything buffered so far as one message."""
+        if self.deadline_handle is not None:
+            self.deadline_handle.cancel()
+            self.deadline_handle = None
+        if not self.pending:
+            return
+        audio, frames, arrival_sum = bytes(self.pending), self.pending_frames, self.pending_arrival_sum
+        oldest = self.pending_since
+        self._clear()
+
+        now = time.monotonic()
+        self.messages_out += 1
+        self.added_latency_sum += frames * now - arrival_sum
+        self.added_latency_max = max(self.added_latency_max, now - oldest)
+        await self.send(base64.b64encode(audio).decode("ascii"))
+
+    def discard(self):
+        """Drop buffered audio without sending it."""
+        self.frames_discarded += self.pending_frames
+        self._clear()
+
+    def _clear(self):
+        if self.deadline_handle is not None:
+            self.deadline_handle.cancel()
+            self.deadline_handle = None
+        self.pending = bytearray()
+        self.pending_frames = 0
+        self.pending_arrival_sum = 0.0
+        self.pending_since = None
+
+    def stats(self):
+        """Messages saved and latency added by coalescing so far."""
+        flushed_frames = self.frames_in - self.pending_frames - self.frames_discarded
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        saved = flushed_frames - self.messages_out
+        return {
+            "frames_in": self.frames_in,
+            "frames_discarded": self.frames_discarded,
+            "messages_out": self.messages_out,
+            "messages_saved": saved,
+            "messages_saved_per_second": saved / elapsed if elapsed else 0.0,
+            "avg_added_latency_ms": (self.added_latency_sum / flushed_frames) * 1000 if flushed_frames else 0.0,
+            "max_added_latency_ms": self.added_latency_max * 1000,
+        }
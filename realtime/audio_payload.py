@@ -0,0 +1,48 @@
+# audio_payload.py
+import base64
+import numpy as np
+
+
+class AudioPayload:
+    """
+    One chunk of audio as received from the server, decoded on demand.
+
+    Holds the base64 string of a `response.audio.delta`. Consumers that
+    forward audio as base64 (e.g. to Twilio) read `.base64` and no decoding
+    ever happens; `.bytes` and `.samples()` decode once and cache the result.
+    """
+
+    __slots__ = ("_base64", "_bytes")
+
+    def __init__(self, base64_string: str):
+        self._base64 = base64_string
+        self._bytes = None
+
+    @property
+    def base64(self) -> str:
+        return self._base64
+
+    @property
+    def bytes(self) -> bytes:
+        if self._bytes is None:
+            self._bytes = base64.b64decode(self._base64)
+        return self._bytes
+
+    def samples(self, dtype=np.int16) -> np.ndarray:
+        """The decoded audio as a read-only numpy array, int16 for pcm16."""
+        return np.frombuffer(self.bytes, dtype=dtype)
+
+    @property
+    def decoded(self) -> bool:
+        return self._bytes is not None
+
+    def __len__(self):
+        """Decoded size in bytes, computed without decoding."""
+        encoded = self._base64
+        return len(encoded) * 3 // 4 - encoded[-2:].count("=")
+
+    def __bytes__(self):
+        return self.bytes
+
+    def __repr__(self):
+        return f"AudioPayload({len(self)} bytes)"
@@ -0,0 +1,90 @@
+# audio_ring_buffer.py
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity history of input audio, addressed by absolute sample offset.
+
+    Sample offsets count every sample ever written, so they line up with the
+    `audio_start_ms` / `audio_end_ms` the server reports for the whole session.
+    Only the most recent `capacity_samples` are kept; slicing outside that
+    window returns just the part still retained. Storage is allocated on the
+    first write and never grows after that.
+    """
+
+    def __init__(self, capacity_samples: int, sample_width: int = 2):
+        """
+        Initialize the ring buffer.
+
+        Args:
+            capacity_samples: Number of samples kept in memory
+            sample_width: Bytes per sample (2 for pcm16)
+        """
+        self.sample_width = sample_width
+        self.capacity = capacity_samples * sample_width
+        self.buffer = None
+        self.end = 0  # absolute byte offset of the next write
+
+    @property
+    def start(self) -> int:
+        """Absolute byte offset of the oldest retained byte."""
+        return max(0, self.end - self.capacity)
+
+    @property
+    def start_sample(self) -> int:
+        return self.start // self.sample_width
+
+    @property
+    def end_sample(self) -> int:
+        return self.end // self.sample_width
+
+    def extend(self, data):
+        """Append raw audio bytes, overwriting the oldest audio when full."""
+        size = len(data)
+        if not size or not self.capacity:
+            self.end += size
+            return
+        if self.buffer is None:
+            self.buffer = bytearray(self.capacity)
+        view = memoryview(data).cast("B")
+        if size >= self.capacity:
+            view = view[size - self.capacity:]
+            self.end += size - self.capacity
+            size = self.capacity
+        position = self.end % self.capacity
+        first = min(size, self.capacity - position)
+        self.buffer[position:position + first] = view[:first]
+        if first < size:
+            self.buffer[:size - first] = view[first:]
+        self.end += size
+
+    def read(self, start: int, end: int) -> bytes:
+        """Return the retained bytes between absolute byte offsets `start` and `end`."""
+        start = max(start, self.start)
+        end = min(end, self.end)
+        if start >= end:
+            return b""
+        begin = start % self.capacity
+        stop = begin + (end - start)
+        if stop <= self.capacity:
+            return bytes(self.buffer[begin:stop])
+        return bytes(self.buffer[begin:]) + bytes(self.buffer[:stop - self.capacity])
+
+    def __getitem__(self, key):
+        """Slice by absolute sample offset, e.g. `buffer[start_sample:end_sample]`."""
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("AudioRingBuffer only supports contiguous slices")
+        start = self.start_sample if key.start is None else key.start
+        end = self.end_sample if key.stop is None else key.stop
+        return self.read(start * self.sample_width, end * self.sample_width)
+
+    def __len__(self):
+        """Number of bytes currently retained."""
+        return self.end - self.start
+
+    def __bytes__(self):
+        return self.read(self.start, self.end)
+
+    def clear(self):
+        """Forget all audio, keeping the allocated storage."""
+        self.end = 0
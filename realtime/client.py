@@ -3,34 +3,83 @@
 import os
 import asyncio
 import time
+import base64
 import logging
-from threading import Timer
+import inspect
 from .event_handler import RealtimeEventHandler
 from .api import RealtimeAPI
-from .conversation import RealtimeConversation
-from .utils import get_realtime_instructions, array_buffer_to_base64
+from .conversation import RealtimeConversation, RETAIN_ALL
+from .inactivitetimeout import SilenceDetector
+from .audio_coalescer import AudioCoalescer
+from .audio_ring_buffer import AudioRingBuffer
+from .event_tap import EventTap
+from .context_window import ContextWindowManager
+from . import metrics
+from .utils import get_realtime_instructions, array_buffer_to_base64, array_buffer_to_bytes
 from datetime import datetime
 import numpy as np
 import json
-from config.systeme_prompt import agent_system_prompt
+from config.systeme_prompt import build_system_prompt
 # Import the global END_CALL variable
 from . import globals
 from utils.get_welcome_script import get_welcome_script
 
 from utils.get_dealer_voice import get_dealer_voice
+from utils.dealer_profile import dealer_profiles
+from variables.variables import load_variables
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 class RealtimeClient(RealtimeEventHandler):
-    def __init__(self, url=None, api_key=None, system_message=None, silence_timeout=30):
+    # Formats the API accepts as already-encoded base64 payloads, e.g. Twilio media
+    passthrough_audio_formats = ("g711_ulaw", "g711_alaw")
+    # Input audio bytes per millisecond: pcm16 is 24 kHz 16-bit, G.711 is 8 kHz 8-bit
+    audio_bytes_per_ms = {"pcm16": 48, "g711_ulaw": 8, "g711_alaw": 8}
+    audio_sample_rates = {"pcm16": 24000, "g711_ulaw": 8000, "g711_alaw": 8000}
+
+    def __init__(
+        self,
+        url=None,
+        api_key=None,
+        system_message=None,
+        silence_timeout=30,
+        audio_format="pcm16",
+        input_audio_chunk_ms=0,
+        input_audio_max_delay_ms=None,
+        input_audio_history_seconds=60,
+        audio_retention=RETAIN_ALL,
+        audio_retention_seconds=60,
+        voice=None,
+        auto_start=True,
+        auto_reconnect=False,
+        max_reconnect_attempts=5,
+        reconnect_backoff=0.5,
+        max_replay_items=50,
+        dealer_id=None,
+        event_history_size=200,
+        context_max_items=None,
+        context_max_tokens=None,
+        context_summarize=None,
+    ):
         super().__init__()
+        self.dealer_id = dealer_id if dealer_id is not None else load_variables().get("dealer_id")
+        # Without a fixed system_message the prompt is rebuilt at call start with
+        # the current date and time and call_context, see config.systeme_prompt
+        self.system_message = system_message
+        self.call_context = {}
+        # When False the call (greeting, silence detection, END_CALL watcher)
+        # waits for start_call(), e.g. for sessions pre-warmed in a pool
+        self.auto_start = auto_start
+        self.audio_format = audio_format
+        self.input_audio_history_seconds = input_audio_history_seconds
+        self.audio_passthrough = audio_format in self.passthrough_audio_formats
         self.default_session_config = {
             "modalities": ["text", "audio"],
-            "instructions": agent_system_prompt,
-            "voice": get_dealer_voice(),
-            "input_audio_format": "pcm16",
-            "output_audio_format": "pcm16",
+            "instructions": system_message or build_system_prompt(self.dealer_id),
+            "voice": voice or get_dealer_voice(self.dealer_id),
+            "input_audio_format": audio_format,
+            "output_audio_format": audio_format,
             "input_audio_transcription": {"model": "whisper-1"},
             "turn_detection": {"type": "server_vad"},
             "tools": [],
@@ -50,19 +99,60 @@ class RealtimeClient(RealtimeEventHandler):
             url=url,
             api_key=api_key,
         )
-        self.conversation = RealtimeConversation()
+        # Observes the connection's events, see realtime.event_tap
+        self.event_tap = EventTap(history_size=event_history_size)
+        self.realtime_event_subscription = None
+        self.conversation = RealtimeConversation(
+            audio_retention=audio_retention,
+            audio_retention_seconds=audio_retention_seconds,
+        )
+        # Bounds the server-side conversation of long calls, see realtime.context_window
+        self.context_window = None
+        if context_max_items or context_max_tokens:
+            self.context_window = ContextWindowManager(
+                self,
+                max_items=context_max_items,
+                max_tokens=context_max_tokens,
+                summarize=context_summarize,
+            )
+        # pcm16 is 24 kHz 16-bit, G.711 is 8 kHz with one byte per sample
+        self.conversation.default_frequency = self.audio_sample_rates[audio_format]
+        self.conversation.sample_width = 2 if audio_format == "pcm16" else 1
+        
+        # Inbound audio coalescing, disabled when input_audio_chunk_ms is 0
+        self.audio_coalescer = None
+        if input_audio_chunk_ms:
+            self.audio_coalescer = AudioCoalescer(
+                send=self._send_input_audio,
+                bytes_per_ms=self.audio_bytes_per_ms[audio_format],
+                chunk_ms=input_audio_chunk_ms,
+                max_delay_ms=input_audio_max_delay_ms,
+            )
         
         # Silence detection attributes
         self.silence_timeout = silence_timeout
-        self.silence_timer = None
-        self.last_activity_time = time.time()
-        self.silence_detection_active = False
+        self.silence_detector = None
         self.timeout_triggered = False
         self.loop = None
         
         # Start a background task to check the END_CALL flag
         self.end_call_check_task = None
         
+        # Reconnect attributes
+        self.auto_reconnect = auto_reconnect
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.reconnect_backoff = reconnect_backoff
+        self.max_replay_items = max_replay_items
+        self.reconnecting = False
+        
+        # Latency instrumentation, monotonic timestamps of pending transitions
+        self.connect_started_at = None
+        self.greeting_started_at = None
+        self.speech_started_at = None
+        self.speech_stopped_at = None
+        self.call_counted = False
+        self.response_in_progress = False
+        
         self._reset_config()
         self._add_api_event_handlers()
         
@@ -70,16 +160,25 @@ class RealtimeClient(RealtimeEventHandler):
 
     def _reset_config(self):
         self.session_created = False
+        self.call_started = False
         self.tools = {}
         self.session_config = self.default_session_config.copy()
-        self.input_audio_buffer = bytearray()
+        # Only the last input_audio_history_seconds of input audio are kept, so
+        # memory per call stays flat however long the call runs
+        self.input_audio_buffer = AudioRingBuffer(
+            capacity_samples=int(self.input_audio_history_seconds * self.conversation.default_frequency),
+            sample_width=self.conversation.sample_width,
+        )
         return True
 
     def _add_api_event_handlers(self):
-        self.realtime.on("client.*", self._log_event)
-        self.realtime.on("server.*", self._log_event)
+        self.event_tap.attach(self.realtime)
+        if self.context_window:
+            self.context_window.attach()
         self.realtime.on("server.session.created", self._on_session_created)
-        self.realtime.on("server.response.created", self._process_event)
+        self.realtime.on("close", self._on_connection_closed)
+        self.realtime.on("server.response.created", self._on_response_created)
+        self.realtime.on("server.response.done", self._on_response_done)
         self.realtime.on("server.response.output_item.added", self._process_event)
         self.realtime.on("server.response.content_part.added", self._process_event)
         self.realtime.on("server.input_audio_buffer.speech_started", self._on_speech_started)
@@ -92,7 +191,7 @@ class RealtimeClient(RealtimeEventHandler):
             self._process_event,
         )
         self.realtime.on("server.response.audio_transcript.delta", self._process_event)
-        self.realtime.on("server.response.audio.delta", self._process_event)
+        self.realtime.on("server.response.audio.delta", self._on_audio_delta)
         self.realtime.on("server.response.text.delta", self._process_event)
         self.realtime.on("server.response.function_call_arguments.delta", self._process_event)
         self.realtime.on("server.response.output_item.done", self._on_output_item_done)
@@ -148,19 +247,42 @@ class RealtimeClient(RealtimeEventHandler):
             except Exception as e:
                 logger.error(f"Error disconnecting: {str(e)}", exc_info=True)
 
-    def _log_event(self, event):
-        realtime_event = {
-            "time": datetime.utcnow().isoformat(),
-            "source": "client" if event["type"].startswith("client.") else "server",
-            "event": event,
-        }
-        self.dispatch("realtime.event", realtime_event)
-        
-        # Reset silence timer on any event
-        self._reset_silence_timer()
+    def _add_route(self, event_name, handler, once):
+        super()._add_route(event_name, handler, once)
+        # "realtime.event" is fed by the tap, which stays detached until needed
+        if event_name == "realtime.event" and self.realtime_event_subscription is None:
+            self.realtime_event_subscription = self.event_tap.subscribe(self._dispatch_realtime_event)
+
+    def _dispatch_realtime_event(self, tapped):
+        if self.has_listeners("realtime.event"):
+            self.dispatch("realtime.event", {
+                "time": datetime.utcfromtimestamp(tapped["time"]).isoformat(),
+                "source": tapped["source"],
+                "event": tapped["event"],
+            })
 
     def _on_session_created(self, event):
         self.session_created = True
+        if self.connect_started_at is not None:
+            metrics.connect_latency.observe(time.monotonic() - self.connect_started_at, dealer=self.dealer_id)
+            self.connect_started_at = None
+        if self.auto_start:
+            asyncio.create_task(self.start_call())
+
+    async def start_call(self):
+        """
+        Start the call on a created session: silence detection, END_CALL watcher and greeting.
+
+        Returns once the refreshed prompt and the greeting are sent, so what
+        the caller sends next reaches the session after them.
+        """
+        if self.call_started:
+            return
+        self.call_started = True
+        self.greeting_started_at = time.monotonic()
+        if not self.call_counted:
+            self.call_counted = True
+            metrics.active_calls.inc(dealer=self.dealer_id)
         
         # Start silence detection when session is created
         self._start_silence_detection()
@@ -170,42 +292,72 @@ class RealtimeClient(RealtimeEventHandler):
             self.end_call_check_task = asyncio.create_task(self._check_end_call_flag())
         
         if self.loop :
-            asyncio.create_task(self.send_initial_conversation_item())    
+            await self.send_initial_conversation_item()
 
     def _process_event(self, event, *args):
-        # Reset silence timer on any event
-        self._reset_silence_timer()
-        
         item, delta = self.conversation.process_event(event, *args)
         if item:
             self.dispatch("conversation.updated", {"item": item, "delta": delta})
         return item, delta
 
     def _on_speech_started(self, event):
+        self.speech_started_at = time.monotonic()
         self._process_event(event)
         self.dispatch("conversation.interrupted", event)
+        self._flush_input_audio()
         
-        # Reset silence timer when speech starts
-        self._reset_silence_timer()
+        # The caller is talking, hold the silence countdown
+        if self.silence_detector:
+            self.silence_detector.pause()
 
     def _on_speech_stopped(self, event):
+        self.speech_stopped_at = time.monotonic()
         self._process_event(event, self.input_audio_buffer)
+        self._flush_input_audio()
         
-        # Reset silence timer when speech stops
-        self._reset_silence_timer()
+        # Restart the silence countdown once the caller stops talking
+        if self.silence_detector:
+            self.silence_detector.resume()
+
+    def _on_audio_delta(self, event):
+        if self.speech_stopped_at is not None or self.greeting_started_at is not None:
+            now = time.monotonic()
+            if self.speech_stopped_at is not None:
+                metrics.response_latency.observe(now - self.speech_stopped_at, dealer=self.dealer_id)
+                self.speech_stopped_at = None
+            if self.greeting_started_at is not None:
+                metrics.greeting_latency.observe(now - self.greeting_started_at, dealer=self.dealer_id)
+                self.greeting_started_at = None
+        self._process_event(event)
+
+    def _on_response_created(self, event):
+        self.response_in_progress = True
+        self._process_event(event)
+        
+        # The agent is talking, hold the silence countdown
+        if self.silence_detector:
+            self.silence_detector.pause()
+
+    def _on_response_done(self, event):
+        self.response_in_progress = False
+        # Restart the silence countdown once the agent is done
+        if self.silence_detector:
+            self.silence_detector.resume()
 
     def _on_item_created(self, event):
         item, delta = self._process_event(event)
         self.dispatch("conversation.item.appended", {"item": item})
         if item and item["status"] == "completed":
             self.dispatch("conversation.item.completed", {"item": item})
-            
-        # Reset silence timer when an item is created
-        self._reset_silence_timer()
     
     
     async def send_initial_conversation_item(self):
         """Send initial conversation item to make AI speak first."""
+        # Prompt and greeting read the cached profile, reload it if it expired since the session was created
+        await dealer_profiles.load(self.dealer_id)
+        if self.system_message is None:
+            # A pre-warmed session may have been configured minutes ago
+            await self.update_session(instructions=build_system_prompt(self.dealer_id, **self.call_context))
         initial_conversation_item = {
             "type": "conversation.item.create",
             "item": {
@@ -214,7 +366,7 @@ class RealtimeClient(RealtimeEventHandler):
                 "content": [
                     {
                         "type": "input_text",
-                        "text": "Greet the user with "+ str(get_welcome_script())
+                        "text": "Greet the user with "+ str(get_welcome_script(self.dealer_id))
                     }
                 ]
             }
@@ -236,14 +388,11 @@ class RealtimeClient(RealtimeEventHandler):
             self.dispatch("conversation.item.completed", {"item": item})
         if item and item.get("formatted", {}).get("tool"):
             await self._call_tool(item["formatted"]["tool"])
-            
-        # Reset silence timer when an output item is done
-        self._reset_silence_timer()
 
     # Silence detection methods
     def _start_silence_detection(self):
         """Start the silence detection."""
-        if self.silence_detection_active:
+        if self.silence_detector and self.silence_detector.is_active:
             return
             
         # Store the event loop for later use
@@ -253,75 +402,34 @@ class RealtimeClient(RealtimeEventHandler):
             logger.warning("No event loop found in _start_silence_detection")
             return
             
-        self.silence_detection_active = True
         self.timeout_triggered = False
-        self.last_activity_time = time.time()
-        self._schedule_silence_timer()
-        logger.info(f"Silence detection started with {self.silence_timeout}s timeout")
+        self.silence_detector = SilenceDetector(
+            timeout_seconds=self.silence_timeout,
+            on_timeout=self._handle_silence_timeout,
+            loop=self.loop,
+        )
+        self.silence_detector.start()
 
     def _stop_silence_detection(self):
         """Stop the silence detection."""
-        self.silence_detection_active = False
-        if self.silence_timer:
-            self.silence_timer.cancel()
-            self.silence_timer = None
-            logger.info("Silence detection stopped")
+        if self.silence_detector:
+            self.silence_detector.stop()
+            self.silence_detector = None
 
     def _reset_silence_timer(self):
         """Reset the timer when user activity is detected."""
-        if not self.silence_detection_active or self.timeout_triggered:
-            return
-            
-        self.last_activity_time = time.time()
-        
-        if self.silence_timer:
-            self.silence_timer.cancel()
-            
-        self._schedule_silence_timer()
-
-    def _schedule_silence_timer(self):
-        """Schedule the silence timeout timer."""
-        if self.silence_detection_active and not self.timeout_triggered:
-            self.silence_timer = Timer(self.silence_timeout, self._handle_silence_timeout)
-            self.silence_timer.daemon = True
-            self.silence_timer.start()
+        if self.silence_detector and not self.timeout_triggered:
+            self.silence_detector.reset()
 
     def _handle_silence_timeout(self):
-        """Handle the silence timeout event."""
-        if not self.silence_detection_active or self.timeout_triggered:
+        """Handle the silence timeout event, runs on the event loop."""
+        if self.timeout_triggered:
             return
             
-        current_time = time.time()
-        elapsed = current_time - self.last_activity_time
-        
-        if elapsed >= self.silence_timeout:
-            logger.info(f"Silence timeout triggered after {elapsed:.2f}s of inactivity")
-            
-            # Set the flag immediately to prevent multiple timeouts
-            self.timeout_triggered = True
-            self.silence_detection_active = False
-            
-            # Cancel the timer
-            if self.silence_timer:
-                self.silence_timer.cancel()
-                self.silence_timer = None
-            
-            # Schedule the disconnect on the event loop
-            if self.loop and self.loop.is_running():
-                try:
-                    # Use call_soon_threadsafe to safely schedule from this thread
-                    self.loop.call_soon_threadsafe(
-                        lambda: asyncio.create_task(self._handle_silence_disconnect())
-                    )
-                except Exception as e:
-                    logger.error(f"Error scheduling disconnect: {str(e)}", exc_info=True)
-                    # Fallback: try to create a new event loop
-                    try:
-                        new_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(new_loop)
-                        new_loop.run_until_complete(self._handle_silence_disconnect())
-                    except Exception as e2:
-                        logger.error(f"Fallback disconnect also failed: {str(e2)}", exc_info=True)
+        # Set the flag immediately to prevent multiple timeouts
+        self.timeout_triggered = True
+        self.silence_detector = None
+        asyncio.create_task(self._handle_silence_disconnect())
 
     async def _handle_silence_disconnect(self):
         """Coroutine to handle the disconnection after silence timeout."""
@@ -355,40 +463,136 @@ class RealtimeClient(RealtimeEventHandler):
             except Exception as e:
                 logger.error(f"Error force disconnecting: {str(e)}", exc_info=True)
 
+    # Reconnect methods
+    def _on_connection_closed(self, event):
+        """Reconnect when the connection drops in the middle of a call."""
+        self.session_created = False
+        if self.audio_coalescer:
+            self.audio_coalescer.discard()
+        if self.auto_reconnect and self.call_started and not self.timeout_triggered and not self.reconnecting:
+            self.reconnecting = True
+            asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        """Open a new session with exponential backoff and replay the conversation into it."""
+        started = time.monotonic()
+        try:
+            for attempt in range(1, self.max_reconnect_attempts + 1):
+                if attempt > 1:
+                    await asyncio.sleep(min(self.reconnect_backoff * 2 ** (attempt - 2), 8))
+                try:
+                    await self.realtime.connect()
+                    await self.update_session()
+                    await asyncio.wait_for(self.wait_for_session_created(), timeout=10)
+                    replayed = await self._replay_conversation()
+                except Exception as e:
+                    logger.warning(f"Reconnect attempt {attempt} failed: {str(e)}")
+                    if self.realtime.is_connected():
+                        await self.realtime.disconnect()
+                    continue
+                duration = time.monotonic() - started
+                metrics.reconnect_latency.observe(duration, dealer=self.dealer_id)
+                logger.info(
+                    f"Reconnected after {duration * 1000:.0f} ms ({attempt} attempt(s)), "
+                    f"replayed {replayed} conversation items"
+                )
+                self.dispatch("conversation.reconnected", {
+                    "attempts": attempt,
+                    "duration": duration,
+                    "replayed_items": replayed,
+                    "timestamp": time.time()
+                })
+                return True
+        finally:
+            self.reconnecting = False
+
+        logger.error(f"Could not reconnect after {self.max_reconnect_attempts} attempts")
+        self._stop_silence_detection()
+        self.dispatch("conversation.ended", {
+            "reason": "connection_lost",
+            "timestamp": time.time()
+        })
+        return False
+
+    def _compact_history(self):
+        """Text-only copy of the conversation, as items ready for conversation.item.create."""
+        history = []
+        for item in self.conversation.iter_items():
+            formatted = item.get("formatted", {})
+            if item["type"] == "message":
+                text = formatted.get("transcript") or formatted.get("text") or ""
+                if not text.strip():
+                    continue
+                content_type = "text" if item["role"] == "assistant" else "input_text"
+                history.append({
+                    "id": item["id"],
+                    "type": "message",
+                    "role": item["role"],
+                    "content": [{"type": content_type, "text": text}],
+                })
+            elif item["type"] == "function_call" and item.get("status") == "completed":
+                history.append({
+                    "id": item["id"],
+                    "type": "function_call",
+                    "call_id": item["call_id"],
+                    "name": item["name"],
+                    "arguments": item.get("arguments", ""),
+                })
+            elif item["type"] == "function_call_output":
+                history.append({
+                    "id": item["id"],
+                    "type": "function_call_output",
+                    "call_id": item["call_id"],
+                    "output": item["output"],
+                })
+        history = history[-self.max_replay_items:]
+        # A tool output must not lose the call it answers
+        while history and history[0]["type"] == "function_call_output":
+            history.pop(0)
+        return history
+
+    async def _replay_conversation(self):
+        history = self._compact_history()
+        for item in history:
+            await self.realtime.send("conversation.item.create", {"item": item})
+        return len(history)
+
     # Original methods with silence detection integration
     async def _call_tool(self, tool):
+        started = time.monotonic()
+        status = "ok"
         try:
             json_arguments = json.loads(tool["arguments"])
             tool_config = self.tools.get(tool["name"])
             if not tool_config:
                 raise Exception(f'Tool "{tool["name"]}" has not been added')
+            if tool_config["dealer_aware"]:
+                # Tools act for the dealer of this call, whatever the model sent
+                json_arguments["dealer_id"] = self.dealer_id
             result = await tool_config["handler"](**json_arguments)
-            await self.realtime.send(
-                "conversation.item.create",
-                {
-                    "item": {
-                        "type": "function_call_output",
-                        "call_id": tool["call_id"],
-                        "output": json.dumps(result),
-                    }
-                },
-            )
+            output = json.dumps(result)
         except Exception as e:
+            status = "error"
             logger.error("Tool call error: " + json.dumps({"error": str(e)}))
-            await self.realtime.send(
-                "conversation.item.create",
-                {
-                    "item": {
-                        "type": "function_call_output",
-                        "call_id": tool["call_id"],
-                        "output": json.dumps({"error": str(e)}),
-                    }
-                },
-            )
+            output = json.dumps({"error": str(e)})
+        metrics.tool_call_latency.observe(
+            time.monotonic() - started, dealer=self.dealer_id, tool=tool["name"], status=status
+        )
+        if self.reconnecting:
+            # The session this call belongs to is gone, the model can ask again after the replay
+            logger.warning(f'Dropped the output of tool "{tool["name"]}", reconnecting')
+            return
+        await self.realtime.send(
+            "conversation.item.create",
+            {
+                "item": {
+                    "type": "function_call_output",
+                    "call_id": tool["call_id"],
+                    "output": output,
+                }
+            },
+        )
         await self.create_response()
-        
-        # Reset silence timer after tool call
-        self._reset_silence_timer()
 
     def is_connected(self):
         return self.realtime.is_connected()
@@ -407,7 +611,7 @@ class RealtimeClient(RealtimeEventHandler):
         self._add_api_event_handlers()
         return True
 
-    async def connect(self):
+    async def connect(self, ws=None):
         if self.is_connected():
             raise Exception("Already connected, use .disconnect() first")
             
@@ -419,7 +623,8 @@ class RealtimeClient(RealtimeEventHandler):
             self.loop = asyncio.new_event_loop()
             asyncio.set_event_loop(self.loop)
             
-        await self.realtime.connect()
+        self.connect_started_at = time.monotonic()
+        await self.realtime.connect(ws=ws)
         await self.update_session()
         
         # Reset timeout flags
@@ -428,6 +633,17 @@ class RealtimeClient(RealtimeEventHandler):
         # Start silence detection will be called when session is created
         return True
 
+    def start_recording(self, path):
+        """Record the connection to `path` from now on, see realtime.recorder."""
+        recorder = self.realtime.start_recording(path)
+        # A pooled session was configured before recording started, replay needs its audio format
+        recorder.record_received(json.dumps({
+            "type": "session.updated",
+            "event_id": "recording_started",
+            "session": self.session_config,
+        }))
+        return recorder
+
     async def wait_for_session_created(self):
         if not self.is_connected():
             raise Exception("Not connected, use .connect() first")
@@ -439,6 +655,10 @@ class RealtimeClient(RealtimeEventHandler):
         # Stop silence detection
         self._stop_silence_detection()
         
+        if self.call_counted:
+            self.call_counted = False
+            metrics.active_calls.dec(dealer=self.dealer_id)
+        
         # Cancel the END_CALL check task if it exists
         if self.end_call_check_task:
             self.end_call_check_task.cancel()
@@ -448,6 +668,14 @@ class RealtimeClient(RealtimeEventHandler):
         self.session_created = False
         self.conversation.clear()
         
+        if self.audio_coalescer:
+            self.audio_coalescer.discard()
+            stats = self.audio_coalescer.stats()
+            logger.info(
+                f"Input audio coalescing: {stats['messages_saved_per_second']:.1f} messages/s saved, "
+                f"{stats['avg_added_latency_ms']:.1f} ms average added latency"
+            )
+        
         # Disconnect from OpenAI
         if self.realtime.is_connected():
             await self.realtime.disconnect()
@@ -465,7 +693,11 @@ class RealtimeClient(RealtimeEventHandler):
             )
         if not callable(handler):
             raise Exception(f'Tool "{name}" handler must be a function')
-        self.tools[name] = {"definition": definition, "handler": handler}
+        self.tools[name] = {
+            "definition": definition,
+            "handler": handler,
+            "dealer_aware": "dealer_id" in inspect.signature(handler).parameters,
+        }
         await self.update_session()
         return self.tools[name]
 
@@ -495,6 +727,9 @@ class RealtimeClient(RealtimeEventHandler):
 
     async def send_user_message_content(self, content=[]):
         self._reset_silence_timer()
+        if self.reconnecting:
+            logger.warning("Dropped a user message, reconnecting")
+            return False
         if content:
             for c in content:
                 if c["type"] == "input_audio":
@@ -514,28 +749,50 @@ class RealtimeClient(RealtimeEventHandler):
         return True
 
     async def append_input_audio(self, array_buffer):
+        if self.reconnecting:
+            # Audio from the gap cannot be delivered, resume with fresh frames
+            return False
+        if self.audio_passthrough and isinstance(array_buffer, str):
+            # Already base64 in the session's format, forward it untouched
+            if array_buffer:
+                if self.audio_coalescer:
+                    await self.audio_coalescer.add(base64.b64decode(array_buffer))
+                else:
+                    await self._send_input_audio(array_buffer)
+            return True
         if len(array_buffer) > 0:
-            self._reset_silence_timer()
-            await self.realtime.send(
-                "input_audio_buffer.append",
-                {
-                    "audio": array_buffer_to_base64(np.array(array_buffer)),
-                },
-            )
+            if self.audio_coalescer:
+                await self.audio_coalescer.add(array_buffer_to_bytes(np.array(array_buffer)))
+            else:
+                await self._send_input_audio(array_buffer_to_base64(np.array(array_buffer)))
             self.input_audio_buffer.extend(array_buffer)
         return True
 
+    async def _send_input_audio(self, audio):
+        if self.reconnecting:
+            # Audio from the gap cannot be delivered, e.g. a flush racing the loss
+            return
+        await self.realtime.send("input_audio_buffer.append", {"audio": audio})
+
+    def _flush_input_audio(self):
+        """Send coalesced input audio right away, e.g. on a speech boundary."""
+        if self.audio_coalescer and self.audio_coalescer.pending and self.is_connected() and not self.reconnecting:
+            self.audio_coalescer.flush_soon()
+
     async def create_response(self):
-        self._reset_silence_timer()
+        if self.reconnecting:
+            # The replacement session starts from the replayed conversation
+            return False
+        if self.audio_coalescer:
+            await self.audio_coalescer.flush()
         if self.get_turn_detection_type() is None and len(self.input_audio_buffer) > 0:
             await self.realtime.send("input_audio_buffer.commit")
-            self.conversation.queue_input_audio(self.input_audio_buffer)
-            self.input_audio_buffer = bytearray()
+            self.conversation.queue_input_audio(bytes(self.input_audio_buffer))
+            self.input_audio_buffer.clear()
         await self.realtime.send("response.create")
         return True
 
     async def cancel_response(self, id=None, sample_count=0):
-        self._reset_silence_timer()
         if not id:
             await self.realtime.send("response.cancel")
             return {"item": None}
@@ -547,7 +804,8 @@ class RealtimeClient(RealtimeEventHandler):
                 raise Exception('Can only cancelResponse messages with type "message"')
             if item["role"] != "assistant":
                 raise Exception('Can only cancelResponse messages with role "assistant"')
-            await self.realtime.send("response.cancel")
+            if self.response_in_progress:
+                await self.realtime.send("response.cancel")
             audio_index = next((i for i, c in enumerate(item["content"]) if c["type"] == "audio"), -1)
             if audio_index == -1:
                 raise Exception("Could not find audio on item to cancel")
@@ -0,0 +1,93 @@
+# codec.py
+import os
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DELTA_PREFIX = '{"type":"response.audio.delta"'
+DELTA_KEY = ',"delta":"'
+AUDIO_APPEND_TYPE = "input_audio_buffer.append"
+
+
+class JsonCodec:
+    """
+    Encodes client events and decodes server events for RealtimeAPI.
+
+    Besides plain JSON it has fast paths for the two high-volume events:
+    `response.audio.delta` frames are decoded by slicing the base64 `delta`
+    out of the raw message and parsing only the small remainder, and
+    `input_audio_buffer.append` events are encoded without scanning the
+    audio string.
+    """
+    name = "json"
+
+    def loads(self, message):
+        return json.loads(message)
+
+    def dumps(self, event):
+        return json.dumps(event, separators=(",", ":"))
+
+    def decode(self, message):
+        """Decode a server message into an event dict."""
+        if isinstance(message, str) and message.startswith(AUDIO_DELTA_PREFIX):
+            event = self._decode_audio_delta(message)
+            if event is not None:
+                return event
+        return self.loads(message)
+
+    def encode(self, event):
+        """Encode a client event into a text message."""
+        if event.get("type") == AUDIO_APPEND_TYPE and len(event) == 3:
+            # event_id is generated by us and audio is base64, neither needs escaping
+            return f'{{"event_id":"{event["event_id"]}","type":"{AUDIO_APPEND_TYPE}","audio":"{event["audio"]}"}}'
+        return self.dumps(event)
+
+    def _decode_audio_delta(self, message):
+        start = message.find(DELTA_KEY)
+        if start < 0:
+            return None
+        delta_start = start + len(DELTA_KEY)
+        delta_end = message.find('"', delta_start)
+        if delta_end < 0 or message.find("\\", delta_start, delta_end) >= 0:
+            return None
+        event = self.loads(message[:start] + message[delta_end + 1:])
+        event["delta"] = message[delta_start:delta_end]
+        return event
+
+
+class OrjsonCodec(JsonCodec):
+    """JsonCodec backed by orjson."""
+    name = "orjson"
+
+    def loads(self, message):
+        return orjson.loads(message)
+
+    def dumps(self, event):
+        return orjson.dumps(event).decode("utf-8")
+
+
+codecs = {"json": JsonCodec, "orjson": OrjsonCodec}
+
+
+def get_codec(name=None):
+    """
+    Return a codec by name: "json", "orjson" or "auto".
+
+    Defaults to the REALTIME_JSON_CODEC environment variable, or "auto",
+    which picks orjson when it is installed.
+    """
+    name = (name or os.getenv("REALTIME_JSON_CODEC", "auto")).lower()
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name == "orjson" and orjson is None:
+        logger.warning("orjson is not installed, falling back to the json codec")
+        name = "json"
+    if name not in codecs:
+        raise ValueError(f'Unknown codec "{name}"')
+    return codecs[name]()
@@ -0,0 +1,194 @@
+# context_window.py
+import math
+import asyncio
+import inspect
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# Audio costs several times the tokens of its transcript
+AUDIO_TOKENS_PER_TEXT_TOKEN = 2.5
+SUMMARY_PREFIX = "Summary of the earlier part of this call:\n"
+
+
+def estimate_item_tokens(item) -> int:
+    """Rough token count of a conversation item, from its text and transcript."""
+    formatted = item.get("formatted", {})
+    if item["type"] == "function_call":
+        text = item.get("arguments", "")
+    elif item["type"] == "function_call_output":
+        text = item.get("output", "")
+    else:
+        text = formatted.get("transcript") or formatted.get("text") or ""
+    tokens = len(text) / CHARS_PER_TOKEN
+    if any(content.get("type") in ("audio", "input_audio") for content in item.get("content", [])):
+        tokens *= AUDIO_TOKENS_PER_TEXT_TOKEN
+    return math.ceil(tokens) + 4
+
+
+def transcript_summary(items, max_chars: int = 2000) -> str:
+    """A compact digest of evicted items: their transcript, keeping the most recent `max_chars`."""
+    lines = []
+    for item in items:
+        if item["type"] != "message":
+            continue
+        formatted = item.get("formatted", {})
+        text = (formatted.get("transcript") or formatted.get("text") or "").strip()
+        if text.startswith(SUMMARY_PREFIX):
+            lines.append(text[len(SUMMARY_PREFIX):])
+        elif text:
+            lines.append(f"{item['role'].capitalize()}: {text}")
+    digest = "\n".join(lines)
+    if len(digest) > max_chars:
+        digest = "..." + digest[-max_chars:]
+    return SUMMARY_PREFIX + digest
+
+
+class ContextWindowManager:
+    """
+    Keeps the server-side conversation of a RealtimeClient bounded.
+
+    After every response it checks the item count and the tokens of the
+    conversation items. The server reports the whole context, including the
+    instructions and tool schemas that can never be deleted, so that fixed
+    part is measured on the first response (usage minus the local estimate
+    of the items) and subtracted from later reports; without usage the local
+    estimate is used. Past `max_items` or `max_tokens` it deletes the oldest
+    items with `conversation.item.delete` until both are back under
+    `target_ratio` of their limits, always keeping the `keep_recent` newest
+    items and never splitting a function call from its output. With
+    `summarize`, one item summarizing what was deleted is inserted at the
+    start of the conversation, replacing the previous summary.
+
+    Local items are evicted as the server confirms each deletion.
+    """
+
+    def __init__(self,
+                 client,
+                 max_items: Optional[int] = 60,
+                 max_tokens: Optional[int] = 12000,
+                 target_ratio: float = 0.5,
+                 keep_recent: int = 8,
+                 summarize: Optional[Callable] = None):
+        """
+        Initialize the context window manager.
+
+        Args:
+            client: RealtimeClient whose conversation is managed
+            max_items: Item count above which old items are deleted, None for no limit
+            max_tokens: Tokens of the conversation items above which old items are deleted, None for no limit
+            target_ratio: Fraction of the limits to trim down to
+            keep_recent: Number of newest items never deleted
+            summarize: Function (sync or async) turning deleted items into summary text
+        """
+        self.client = client
+        self.max_items = max_items if max_items is not None else math.inf
+        self.max_tokens = max_tokens if max_tokens is not None else math.inf
+        self.target_ratio = target_ratio
+        self.keep_recent = keep_recent
+        self.summarize = summarize
+        self.reported_tokens = None
+        # Tokens of the instructions and tools, in every report, measured once
+        self.fixed_tokens = None
+        self.pending_deletes = set()
+        self.task = None
+
+        # Metrics
+        self.trims = 0
+        self.deleted_items = 0
+
+    def attach(self):
+        self.client.realtime.on("server.response.done", self._on_response_done)
+        self.client.realtime.on("server.conversation.item.deleted", self._on_item_deleted)
+        return self
+
+    def context_items(self):
+        return [item for item in self.client.conversation.iter_items() if item["id"] not in self.pending_deletes]
+
+    def item_tokens(self, items):
+        """Tokens of `items`, from the last usage report when there is one, else estimated."""
+        tokens = sum(estimate_item_tokens(item) for item in items)
+        if self.reported_tokens is None:
+            return tokens
+        if self.fixed_tokens is None:
+            self.fixed_tokens = max(0, self.reported_tokens - tokens)
+        return max(tokens, self.reported_tokens - self.fixed_tokens)
+
+    def _on_response_done(self, event):
+        usage = event.get("response", {}).get("usage") or {}
+        if usage.get("input_tokens") is not None:
+            self.reported_tokens = usage["input_tokens"] + usage.get("output_tokens", 0)
+        if self.task and not self.task.done():
+            return
+        items = self.context_items()
+        tokens = self.item_tokens(items)
+        if len(items) > self.max_items or tokens > self.max_tokens:
+            self.task = asyncio.create_task(self._trim(items, tokens))
+
+    def _on_item_deleted(self, event):
+        self.pending_deletes.discard(event.get("item_id"))
+
+    def _select(self, items, tokens):
+        """The oldest items to delete to get back under target."""
+        target_items = self.max_items * self.target_ratio
+        target_tokens = self.max_tokens * self.target_ratio
+        # Items still being produced are at the end, within keep_recent
+        removable = max(0, len(items) - self.keep_recent)
+        cut = 0
+        while cut < removable and (len(items) - cut > target_items or tokens > target_tokens):
+            tokens -= estimate_item_tokens(items[cut])
+            cut += 1
+        # Back off rather than split a function call from its output,
+        # moving forward could reach into the keep_recent window
+        while cut > 0 and (
+            items[cut - 1]["type"] == "function_call"
+            or (cut < len(items) and items[cut]["type"] == "function_call_output")
+        ):
+            cut -= 1
+        return items[:cut]
+
+    async def _trim(self, items, tokens):
+        evicted = self._select(items, tokens)
+        if not evicted:
+            return
+        summary = None
+        if self.summarize:
+            try:
+                summary = self.summarize(evicted)
+                if inspect.isawaitable(summary):
+                    summary = await summary
+            except Exception as e:
+                logger.error(f"Error summarizing evicted conversation items: {str(e)}")
+        try:
+            for item in evicted:
+                self.pending_deletes.add(item["id"])
+                await self.client.delete_item(item["id"])
+            if summary:
+                await self.client.realtime.send("conversation.item.create", {
+                    "previous_item_id": "root",
+                    "item": {
+                        "type": "message",
+                        "role": "system",
+                        "content": [{"type": "input_text", "text": summary}],
+                    },
+                })
+        except Exception as e:
+            logger.error(f"Error trimming the conversation: {str(e)}")
+            return
+        # Usage is stale until the next response reports it again
+        self.reported_tokens = None
+        self.trims += 1
+        self.deleted_items += len(evicted)
+        self.client.conversation.prune_responses()
+        logger.info(f"Trimmed {len(evicted)} conversation items (~{tokens} tokens before)")
+
+    def stats(self):
+        return {
+            "items": len(self.context_items()),
+            "reported_tokens": self.reported_tokens,
+            "fixed_tokens": self.fixed_tokens,
+            "trims": self.trims,
+            "deleted_items": self.deleted_items,
+        }
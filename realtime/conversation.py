@@ -1,11 +1,18 @@
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import logging
-from .utils import base64_to_array_buffer
+from .audio_payload import AudioPayload
+from .item_store import ItemStore, ItemRecord, FormattedItem
 
 logger = logging.getLogger(__name__)
 
+# Audio retention policies
+RETAIN_ALL = "all"
+RETAIN_LAST = "last"
+RETAIN_NONE = "none"
+
 class RealtimeConversation:
     default_frequency = 16000  # Default sample rate
+    sample_width = 2  # Bytes per sample of stored audio
 
     EventProcessors = {
         "conversation.item.created": lambda self, event: self._process_item_created(event),
@@ -30,17 +37,36 @@ class RealtimeConversation:
         ),
     }
 
-    def __init__(self):
+    def __init__(self, audio_retention=RETAIN_ALL, audio_retention_seconds=60):
+        """
+        Initialize the conversation.
+
+        Audio deltas are handed on as AudioPayload objects, decoded only when
+        a consumer or the retention policy needs the raw bytes.
+
+        Args:
+            audio_retention: Audio kept on items, RETAIN_ALL, RETAIN_LAST (the
+                items covering the last audio_retention_seconds) or RETAIN_NONE
+            audio_retention_seconds: Seconds of audio kept under RETAIN_LAST
+        """
+        if audio_retention not in (RETAIN_ALL, RETAIN_LAST, RETAIN_NONE):
+            raise ValueError(f'Unknown audio retention policy "{audio_retention}"')
+        self.audio_retention = audio_retention
+        self.audio_retention_seconds = audio_retention_seconds
         self.clear()
 
     def clear(self):
-        self.item_lookup = {}
-        self.items = []
+        # One store serves both as the ordered item list and the lookup by id
+        self.items = ItemStore()
+        self.item_lookup = self.items
         self.response_lookup = {}
         self.responses = []
         self.queued_speech_items = {}
         self.queued_transcript_items = {}
         self.queued_input_audio = None
+        # Items holding audio, oldest first, and their total size in bytes
+        self.audio_items = OrderedDict()
+        self.audio_bytes = 0
 
     def queue_input_audio(self, input_audio):
         self.queued_input_audio = input_audio
@@ -55,44 +81,80 @@ class RealtimeConversation:
         return self.item_lookup.get(id)
 
     def get_items(self):
-        return self.items[:]
+        return list(self.items)
+
+    def iter_items(self):
+        """Items in conversation order, without copying."""
+        return iter(self.items)
+
+    def _append_audio(self, item, data):
+        """Append audio to the item's buffer, subject to the retention policy."""
+        if self.audio_retention == RETAIN_NONE or not data:
+            return
+        item.formatted.audio += data
+        self.audio_bytes += len(data)
+        if item.id not in self.audio_items:
+            self.audio_items[item.id] = item
+        if self.audio_retention == RETAIN_LAST:
+            limit = int(self.audio_retention_seconds * self.default_frequency) * self.sample_width
+            # Drop whole items, oldest first, while the rest still covers the limit
+            while self.audio_bytes > limit:
+                oldest_id, oldest = next(iter(self.audio_items.items()))
+                oldest_audio = oldest.formatted.audio
+                if oldest is item or self.audio_bytes - len(oldest_audio) < limit:
+                    break
+                self._release_audio(oldest_id)
+
+    def _release_audio(self, item_id):
+        item = self.audio_items.pop(item_id, None)
+        if item is not None:
+            self.audio_bytes -= len(item.formatted.audio)
+            item.formatted.audio = bytearray()
+
+    def prune_responses(self, keep=20):
+        """Forget all but the last `keep` responses, e.g. once their items were deleted."""
+        if len(self.responses) <= keep:
+            return
+        for response in self.responses[:len(self.responses) - keep]:
+            del self.response_lookup[response["id"]]
+        del self.responses[:len(self.responses) - keep]
 
     def _process_item_created(self, event):
-        item = event["item"]
-        new_item = item.copy()
-        if new_item["id"] not in self.item_lookup:
-            self.item_lookup[new_item["id"]] = new_item
-            self.items.append(new_item)
-        new_item["formatted"] = {"audio": [], "text": "", "transcript": ""}
-        if new_item["id"] in self.queued_speech_items:
-            new_item["formatted"]["audio"] = self.queued_speech_items[new_item["id"]]["audio"]
-            del self.queued_speech_items[new_item["id"]]
+        new_item = ItemRecord(event["item"])
+        if new_item.id not in self.item_lookup:
+            # previous_item_id places items inserted out of order, e.g. at "root"
+            self.items.add(new_item, event.get("previous_item_id", ...))
+        formatted = new_item.formatted = FormattedItem(audio=bytearray(), text="", transcript="")
+        if new_item.id in self.queued_speech_items:
+            # No audio is queued when the input audio is not kept, e.g. in passthrough
+            speech = self.queued_speech_items.pop(new_item.id)
+            if "audio" in speech:
+                self._append_audio(new_item, speech["audio"])
         if "content" in new_item:
-            text_content = [c for c in new_item["content"] if c["type"] in ["text", "input_text"]]
+            text_content = [c for c in new_item.content if c["type"] in ["text", "input_text"]]
             for content in text_content:
-                new_item["formatted"]["text"] += content["text"]
-        if new_item["id"] in self.queued_transcript_items:
-            new_item["formatted"]["transcript"] = self.queued_transcript_items[new_item["id"]]["transcript"]
-            del self.queued_transcript_items[new_item["id"]]
-        if new_item["type"] == "message":
-            if new_item["role"] == "user":
-                new_item["status"] = "completed"
+                formatted.text += content["text"]
+        if new_item.id in self.queued_transcript_items:
+            formatted.transcript = self.queued_transcript_items.pop(new_item.id)["transcript"]
+        if new_item.type == "message":
+            if new_item.role == "user":
+                new_item.status = "completed"
                 if self.queued_input_audio:
-                    new_item["formatted"]["audio"] = self.queued_input_audio
+                    self._append_audio(new_item, self.queued_input_audio)
                     self.queued_input_audio = None
             else:
-                new_item["status"] = "in_progress"
-        elif new_item["type"] == "function_call":
-            new_item["formatted"]["tool"] = {
+                new_item.status = "in_progress"
+        elif new_item.type == "function_call":
+            formatted.tool = {
                 "type": "function",
-                "name": new_item["name"],
-                "call_id": new_item["call_id"],
+                "name": new_item.name,
+                "call_id": new_item.call_id,
                 "arguments": "",
             }
-            new_item["status"] = "in_progress"
-        elif new_item["type"] == "function_call_output":
-            new_item["status"] = "completed"
-            new_item["formatted"]["output"] = new_item["output"]
+            new_item.status = "in_progress"
+        elif new_item.type == "function_call_output":
+            new_item.status = "completed"
+            formatted.output = new_item.output
         return new_item, None
 
     def _process_item_truncated(self, event):
@@ -101,9 +163,13 @@ class RealtimeConversation:
         item = self.item_lookup.get(item_id)
         if not item:
             raise Exception(f'item.truncated: Item "{item_id}" not found')
-        end_index = (audio_end_ms * self.default_frequency) // 1000
-        item["formatted"]["transcript"] = ""
-        item["formatted"]["audio"] = item["formatted"]["audio"][:end_index]
+        end = (audio_end_ms * self.default_frequency) // 1000 * self.sample_width
+        item.formatted.transcript = ""
+        audio = item.formatted.audio
+        if len(audio) > end:
+            if item_id in self.audio_items:
+                self.audio_bytes -= len(audio) - end
+            del audio[end:]
         return item, None
 
     def _process_item_deleted(self, event):
@@ -111,8 +177,8 @@ class RealtimeConversation:
         item = self.item_lookup.get(item_id)
         if not item:
             raise Exception(f'item.deleted: Item "{item_id}" not found')
-        del self.item_lookup[item["id"]]
-        self.items.remove(item)
+        self._release_audio(item_id)
+        self.items.remove(item_id)
         return item, None
 
     def _process_input_audio_transcription_completed(self, event):
@@ -124,8 +190,8 @@ class RealtimeConversation:
         if not item:
             self.queued_transcript_items[item_id] = {"transcript": formatted_transcript}
             return None, None
-        item["content"][content_index]["transcript"] = transcript
-        item["formatted"]["transcript"] = formatted_transcript
+        item.content[content_index]["transcript"] = transcript
+        item.formatted.transcript = formatted_transcript
         return item, {"transcript": transcript}
 
     def _process_speech_started(self, event):
@@ -139,7 +205,7 @@ class RealtimeConversation:
         audio_end_ms = event["audio_end_ms"]
         speech = self.queued_speech_items[item_id]
         speech["audio_end_ms"] = audio_end_ms
-        if input_audio_buffer:
+        if input_audio_buffer and self.audio_retention != RETAIN_NONE:
             start_index = (speech["audio_start_ms"] * self.default_frequency) // 1000
             end_index = (speech["audio_end_ms"] * self.default_frequency) // 1000
             speech["audio"] = input_audio_buffer[start_index:end_index]
@@ -168,7 +234,7 @@ class RealtimeConversation:
         found_item = self.item_lookup.get(item["id"])
         if not found_item:
             raise Exception(f'response.output_item.done: Item "{item["id"]}" not found')
-        found_item["status"] = item["status"]
+        found_item.status = item["status"]
         return found_item, None
 
     def _process_content_part_added(self, event):
@@ -177,7 +243,7 @@ class RealtimeConversation:
         item = self.item_lookup.get(item_id)
         if not item:
             raise Exception(f'response.content_part.added: Item "{item_id}" not found')
-        item["content"].append(part)
+        item.content.append(part)
         return item, None
 
     def _process_audio_transcript_delta(self, event):
@@ -187,8 +253,8 @@ class RealtimeConversation:
         item = self.item_lookup.get(item_id)
         if not item:
             raise Exception(f'response.audio_transcript.delta: Item "{item_id}" not found')
-        item["content"][content_index]["transcript"] += delta
-        item["formatted"]["transcript"] += delta
+        item.content[content_index]["transcript"] += delta
+        item.formatted.transcript += delta
         return item, {"transcript": delta}
 
     def _process_audio_delta(self, event):
@@ -199,10 +265,10 @@ class RealtimeConversation:
         if not item:
             logger.debug(f'response.audio.delta: Item "{item_id}" not found')
             return None, None
-        array_buffer = base64_to_array_buffer(delta)
-        append_values = array_buffer.tobytes()
-        item["formatted"]["audio"] += [append_values]
-        return item, {"audio": append_values}
+        audio = AudioPayload(delta)
+        if self.audio_retention != RETAIN_NONE:
+            self._append_audio(item, audio.bytes)
+        return item, {"audio": audio}
 
     def _process_text_delta(self, event):
         item_id = event["item_id"]
@@ -211,8 +277,8 @@ class RealtimeConversation:
         item = self.item_lookup.get(item_id)
         if not item:
             raise Exception(f'response.text.delta: Item "{item_id}" not found')
-        item["content"][content_index]["text"] += delta
-        item["formatted"]["text"] += delta
+        item.content[content_index]["text"] += delta
+        item.formatted.text += delta
         return item, {"text": delta}
 
     def _process_function_call_arguments_delta(self, event):
@@ -221,6 +287,6 @@ class RealtimeConversation:
         item = self.item_lookup.get(item_id)
         if not item:
             raise Exception(f'response.function_call_arguments.delta: Item "{item_id}" not found')
-        item["arguments"] += delta
-        item["formatted"]["tool"]["arguments"] += delta
+        item.arguments += delta
+        item.formatted.tool["arguments"] += delta
         return item, {"arguments": delta}
\ No newline at end of file
@@ -1,31 +1,76 @@
-from collections import defaultdict
 import inspect
 import asyncio
 
+
 class RealtimeEventHandler:
+    """
+    Routes events to handlers registered per event name.
+
+    Handlers are classified as sync or async once, when registered, and each
+    event name maps to a precompiled tuple of routes, so dispatching an event
+    nobody listens to is a single dict lookup.
+    """
+
     def __init__(self):
-        self.event_handlers = defaultdict(list)
+        self.event_handlers = {}
 
     def on(self, event_name, handler):
-        self.event_handlers[event_name].append(handler)
+        self._add_route(event_name, handler, once=False)
+
+    def once(self, event_name, handler):
+        """Register a handler that is removed after its first event."""
+        self._add_route(event_name, handler, once=True)
+
+    def off(self, event_name, handler=None):
+        """Remove `handler` from `event_name`, or every handler of `event_name` if omitted."""
+        routes = self.event_handlers.get(event_name)
+        if not routes:
+            return False
+        if handler is None:
+            del self.event_handlers[event_name]
+            return True
+        for index, route in enumerate(routes):
+            if route[0] == handler:
+                remaining = routes[:index] + routes[index + 1:]
+                if remaining:
+                    self.event_handlers[event_name] = remaining
+                else:
+                    del self.event_handlers[event_name]
+                return True
+        return False
+
+    def has_listeners(self, event_name):
+        return event_name in self.event_handlers
 
     def clear_event_handlers(self):
-        self.event_handlers = defaultdict(list)
+        self.event_handlers = {}
+
+    def _add_route(self, event_name, handler, once):
+        route = (handler, inspect.iscoroutinefunction(handler), once)
+        self.event_handlers[event_name] = self.event_handlers.get(event_name, ()) + (route,)
 
     def dispatch(self, event_name, event):
-        for handler in self.event_handlers[event_name]:
-            if inspect.iscoroutinefunction(handler):
+        routes = self.event_handlers.get(event_name)
+        if not routes:
+            return
+        for handler, is_async, once in routes:
+            if once:
+                self.off(event_name, handler)
+            if is_async:
                 asyncio.create_task(handler(event))
             else:
                 handler(event)
 
     async def wait_for_next(self, event_name):
-        future = asyncio.Future()
+        future = asyncio.get_event_loop().create_future()
 
         def handler(event):
             if not future.done():
                 future.set_result(event)
 
-        self.on(event_name, handler)
-        return await future
-
+        self.once(event_name, handler)
+        try:
+            return await future
+        finally:
+            # Deregister if we were cancelled before the event arrived
+            self.off(event_name, handler)
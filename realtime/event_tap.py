@@ -0,0 +1,141 @@
+# event_tap.py
+import time
+import random
+import logging
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# High-volume audio frames, left out of the history by default so a few
+# seconds of speech do not push every control event out of the buffer
+AUDIO_EVENT_TYPES = frozenset({
+    "input_audio_buffer.append",
+    "response.audio.delta",
+})
+
+
+class TapSubscription:
+    __slots__ = ("callback", "types", "sample_rate")
+
+    def __init__(self, callback, types, sample_rate):
+        self.callback = callback
+        self.types = types
+        self.sample_rate = sample_rate
+
+
+class EventTap:
+    """
+    Observes the client and server events of one RealtimeAPI connection.
+
+    The tap only hooks into the connection while it has something to do:
+    with no subscribers and the history disabled it is detached and costs
+    nothing. Subscribers can restrict themselves to a set of event types and
+    to a random sample of them. The last `history_size` events are kept in a
+    ring buffer for post-mortems.
+    """
+
+    def __init__(self,
+                 history_size: int = 200,
+                 history_exclude: Iterable[str] = AUDIO_EVENT_TYPES):
+        """
+        Initialize the event tap.
+
+        Args:
+            history_size: Number of recent events kept, 0 disables the history
+            history_exclude: Event types never recorded in the history
+        """
+        self.history = deque(maxlen=history_size) if history_size else None
+        self.history_exclude = frozenset(history_exclude)
+        self.subscriptions = ()
+        self.api = None
+        self.attached = False
+
+    def attach(self, api):
+        """Observe `api`, registering on it only while the tap is in use."""
+        self.api = api
+        self.attached = False
+        api.off("client.*", self._on_client_event)
+        api.off("server.*", self._on_server_event)
+        self._sync()
+
+    def subscribe(self,
+                  callback: Callable[[dict], None],
+                  types: Optional[Iterable[str]] = None,
+                  sample_rate: float = 1.0) -> TapSubscription:
+        """
+        Call `callback` with {"time", "source", "event"} for tapped events.
+
+        Args:
+            callback: Function called synchronously for each delivered event
+            types: Event types to deliver (e.g. "response.done"), all when omitted
+            sample_rate: Fraction of the matching events delivered, between 0 and 1
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        subscription = TapSubscription(callback, frozenset(types) if types else None, sample_rate)
+        self.subscriptions += (subscription,)
+        self._sync()
+        return subscription
+
+    def unsubscribe(self, subscription: TapSubscription):
+        self.subscriptions = tuple(s for s in self.subscriptions if s is not subscription)
+        self._sync()
+
+    def recent_events(self, limit: Optional[int] = None):
+        """The recorded history, oldest first, as {"time", "source", "event"} dicts."""
+        if self.history is None:
+            return []
+        entries = list(self.history)
+        if limit is not None:
+            entries = entries[-limit:]
+        return [{"time": at, "source": source, "event": event} for at, source, event in entries]
+
+    def format_history(self, limit: Optional[int] = None) -> str:
+        """The recorded history as one line per event, for logs."""
+        lines = []
+        for entry in self.recent_events(limit):
+            event = entry["event"]
+            lines.append(f"{entry['time']:.3f} {entry['source']} {event.get('type')} {event.get('event_id', '')}")
+        return "\n".join(lines)
+
+    def clear(self):
+        if self.history is not None:
+            self.history.clear()
+
+    def _sync(self):
+        active = self.history is not None or bool(self.subscriptions)
+        if self.api is None or active == self.attached:
+            return
+        if active:
+            self.api.on("client.*", self._on_client_event)
+            self.api.on("server.*", self._on_server_event)
+        else:
+            self.api.off("client.*", self._on_client_event)
+            self.api.off("server.*", self._on_server_event)
+        self.attached = active
+
+    def _on_client_event(self, event):
+        self._record("client", event)
+
+    def _on_server_event(self, event):
+        self._record("server", event)
+
+    def _record(self, source, event):
+        event_type = event["type"]
+        if self.history is not None and event_type not in self.history_exclude:
+            self.history.append((time.time(), source, event))
+        if not self.subscriptions:
+            return
+        tapped = None
+        for subscription in self.subscriptions:
+            if subscription.types is not None and event_type not in subscription.types:
+                continue
+            if subscription.sample_rate < 1 and random.random() >= subscription.sample_rate:
+                continue
+            if tapped is None:
+                tapped = {"time": time.time(), "source": source, "event": event}
+            try:
+                subscription.callback(tapped)
+            except Exception as e:
+                logger.error(f"Error in event tap subscriber: {str(e)}")
@@ -0,0 +1,469 @@
+# fake_server.py
+"""
+Local stand-in for the OpenAI Realtime API, for offline load testing.
+
+Speaks the subset of the protocol RealtimeClient uses: session.created and
+session.update, simulated server VAD (speech_started/stopped, commit,
+transcription), responses streamed as response.audio.delta and transcript
+deltas, function calls, cancellation, truncation and deletion.
+
+The simulated caller alternates `pause_ms` of silence and `speech_ms` of
+speech, measured in received input audio, so a client streaming audio in real
+time sees a user turn every (pause_ms + speech_ms). Responses start after
+`latency_ms` (plus up to `latency_jitter_ms`) and stream `response_ms` of
+audio at `audio_rate` times real time (0 for as fast as possible).
+
+Run from the repository root, then point RealtimeClient(url=...) or
+REALTIME_URL at ws://127.0.0.1:8765:
+
+    python -m realtime.fake_server --port 8765 --latency-ms 300
+"""
+
+import json
+import math
+import base64
+import random
+import asyncio
+import logging
+import argparse
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# Output audio bytes per millisecond: pcm16 is 24 kHz 16-bit, G.711 is 8 kHz 8-bit
+AUDIO_BYTES_PER_MS = {"pcm16": 48, "g711_ulaw": 8, "g711_alaw": 8}
+DEFAULT_TRANSCRIPT = "Thanks for calling, this is a simulated response from the local test server."
+DEFAULT_USER_TRANSCRIPT = "I would like to book a test drive."
+
+
+def _tone(audio_format, duration_ms):
+    """A 440 Hz tone, so forwarded audio is audible, in the given format."""
+    if audio_format == "pcm16":
+        samples = duration_ms * 24
+        data = bytearray()
+        for n in range(samples):
+            data += int(8000 * math.sin(2 * math.pi * 440 * n / 24000)).to_bytes(2, "little", signed=True)
+        return bytes(data)
+    # Alternating G.711 codes make a coarse square-ish tone
+    return bytes([0x2A, 0xAA] * (duration_ms * 4))
+
+
+class FakeSession:
+    """One client connection to the fake server."""
+
+    def __init__(self, server, ws, session_id):
+        self.server = server
+        self.ws = ws
+        self.session_id = session_id
+        self.session = {
+            "id": session_id,
+            "object": "realtime.session",
+            "model": "gpt-4o-mini-realtime-preview",
+            "modalities": ["text", "audio"],
+            "instructions": "",
+            "voice": "alloy",
+            "input_audio_format": "pcm16",
+            "output_audio_format": "pcm16",
+            "input_audio_transcription": None,
+            "turn_detection": {"type": "server_vad"},
+            "tools": [],
+            "tool_choice": "auto",
+        }
+        self.counter = 0
+        self.last_item_id = None
+        self.last_item_type = None
+        self.responses = 0
+        self.response_task = None
+        self.input_ms = 0.0
+        self.speaking = False
+        self.speech_item_id = None
+        self.speech_start_ms = 0
+
+    def _id(self, prefix):
+        self.counter += 1
+        return f"{prefix}_{self.session_id[5:]}{self.counter:06d}"
+
+    async def send(self, event_type, **fields):
+        event = {"type": event_type, "event_id": self._id("event"), **fields}
+        self.server.events_sent += 1
+        await self.ws.send(json.dumps(event, separators=(",", ":")))
+
+    async def run(self):
+        await self.send("session.created", session=self.session)
+        async for message in self.ws:
+            event = json.loads(message)
+            self.server.events_received += 1
+            handler = getattr(self, "_on_" + event["type"].replace(".", "_"), None)
+            if handler:
+                await handler(event)
+        self._cancel_response()
+
+    # Client events
+
+    async def _on_session_update(self, event):
+        self.session.update(event.get("session", {}))
+        await self.send("session.updated", session=self.session)
+
+    async def _on_input_audio_buffer_append(self, event):
+        audio = event["audio"]
+        size = len(audio) * 3 // 4 - audio[-2:].count("=")
+        self.input_ms += size / AUDIO_BYTES_PER_MS.get(self.session["input_audio_format"], 48)
+        if self.server.speech_ms and (self.session.get("turn_detection") or {}).get("type") == "server_vad":
+            await self._detect_speech()
+
+    async def _on_input_audio_buffer_commit(self, event):
+        item_id = self._id("item")
+        await self.send("input_audio_buffer.committed", previous_item_id=self.last_item_id, item_id=item_id)
+        await self._create_user_audio_item(item_id)
+
+    async def _on_input_audio_buffer_clear(self, event):
+        await self.send("input_audio_buffer.cleared")
+
+    async def _on_conversation_item_create(self, event):
+        item = {"id": self._id("item"), "object": "realtime.item", "status": "completed", **event["item"]}
+        if event.get("previous_item_id") == "root":
+            # Inserted at the start, the end of the conversation is unchanged
+            await self.send("conversation.item.created", previous_item_id=None, item=item)
+            return
+        await self._add_item(item)
+
+    async def _on_conversation_item_truncate(self, event):
+        await self.send(
+            "conversation.item.truncated",
+            item_id=event["item_id"],
+            content_index=event.get("content_index", 0),
+            audio_end_ms=event.get("audio_end_ms", 0),
+        )
+
+    async def _on_conversation_item_delete(self, event):
+        await self.send("conversation.item.deleted", item_id=event["item_id"])
+
+    async def _on_response_create(self, event):
+        self._start_response()
+
+    async def _on_response_cancel(self, event):
+        self._cancel_response()
+
+    # Simulation
+
+    async def _add_item(self, item):
+        await self.send("conversation.item.created", previous_item_id=self.last_item_id, item=item)
+        self.last_item_id = item["id"]
+        self.last_item_type = item["type"]
+
+    async def _detect_speech(self):
+        cycle = self.server.pause_ms + self.server.speech_ms
+        cycle_start = (self.input_ms // cycle) * cycle
+        in_speech = self.input_ms - cycle_start >= self.server.pause_ms
+        if in_speech and not self.speaking:
+            self.speaking = True
+            self.speech_item_id = self._id("item")
+            self.speech_start_ms = int(cycle_start + self.server.pause_ms)
+            if self.response_task and not self.response_task.done():
+                # The caller talks over the response, as server VAD would cancel it
+                self._cancel_response()
+            await self.send(
+                "input_audio_buffer.speech_started",
+                audio_start_ms=self.speech_start_ms,
+                item_id=self.speech_item_id,
+            )
+        elif not in_speech and self.speaking:
+            self.speaking = False
+            await self.send(
+                "input_audio_buffer.speech_stopped",
+                audio_end_ms=self.speech_start_ms + self.server.speech_ms,
+                item_id=self.speech_item_id,
+            )
+            await self.send(
+                "input_audio_buffer.committed",
+                previous_item_id=self.last_item_id,
+                item_id=self.speech_item_id,
+            )
+            await self._create_user_audio_item(self.speech_item_id)
+            if self.session["turn_detection"].get("create_response", True):
+                self._start_response()
+
+    async def _create_user_audio_item(self, item_id):
+        await self._add_item({
+            "id": item_id,
+            "object": "realtime.item",
+            "type": "message",
+            "status": "completed",
+            "role": "user",
+            "content": [{"type": "input_audio", "transcript": None}],
+        })
+        if self.session.get("input_audio_transcription"):
+            await self.send(
+                "conversation.item.input_audio_transcription.completed",
+                item_id=item_id,
+                content_index=0,
+                transcript=self.server.user_transcript,
+            )
+
+    def _start_response(self):
+        self._cancel_response()
+        self.response_task = asyncio.create_task(self._respond())
+
+    def _cancel_response(self):
+        if self.response_task and not self.response_task.done():
+            self.response_task.cancel()
+        self.response_task = None
+
+    async def _respond(self):
+        self.responses += 1
+        response = {"id": self._id("resp"), "object": "realtime.response", "status": "in_progress", "output": []}
+        output = []
+        status = "completed"
+        try:
+            await self.send("response.created", response=response)
+            await asyncio.sleep((self.server.latency_ms + random.uniform(0, self.server.latency_jitter_ms)) / 1000)
+            call_tool = (
+                self.server.function_call_every
+                and self.session["tools"]
+                and self.last_item_type != "function_call_output"
+                and self.responses % self.server.function_call_every == 0
+            )
+            if call_tool:
+                output.append(await self._stream_function_call(response["id"]))
+            else:
+                output.append(await self._stream_audio(response["id"]))
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except websockets.ConnectionClosed:
+            return
+        self.server.responses += 1
+        try:
+            await self.send("response.done", response={**response, "status": status, "output": output})
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _stream_function_call(self, response_id):
+        tool = self.session["tools"][0]
+        item = {
+            "id": self._id("item"),
+            "object": "realtime.item",
+            "type": "function_call",
+            "status": "in_progress",
+            "name": tool["name"],
+            "call_id": self._id("call"),
+            "arguments": "",
+        }
+        await self.send("response.output_item.added", response_id=response_id, output_index=0, item=item)
+        await self._add_item(item)
+        arguments = self.server.function_arguments
+        await self.send(
+            "response.function_call_arguments.delta",
+            response_id=response_id, item_id=item["id"], output_index=0, call_id=item["call_id"], delta=arguments,
+        )
+        await self.send(
+            "response.function_call_arguments.done",
+            response_id=response_id, item_id=item["id"], output_index=0, call_id=item["call_id"], arguments=arguments,
+        )
+        item = {**item, "status": "completed", "arguments": arguments}
+        await self.send("response.output_item.done", response_id=response_id, output_index=0, item=item)
+        return item
+
+    async def _stream_audio(self, response_id):
+        server = self.server
+        item = {
+            "id": self._id("item"),
+            "object": "realtime.item",
+            "type": "message",
+            "status": "in_progress",
+            "role": "assistant",
+            "content": [],
+        }
+        ids = {"response_id": response_id, "item_id": item["id"], "output_index": 0, "content_index": 0}
+        await self.send("response.output_item.added", response_id=response_id, output_index=0, item=item)
+        await self._add_item(item)
+        await self.send("response.content_part.added", part={"type": "audio", "transcript": ""}, **ids)
+
+        chunk = server.audio_chunk(self.session["output_audio_format"])
+        chunks = max(1, server.response_ms // server.audio_chunk_ms)
+        words = server.transcript.split(" ")
+        per_chunk = math.ceil(len(words) / chunks)
+        transcript = ""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            for index in range(chunks):
+                if server.audio_rate:
+                    delay = started + index * server.audio_chunk_ms / 1000 / server.audio_rate - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await self.send("response.audio.delta", delta=chunk, **ids)
+                server.audio_chunks += 1
+                spoken = words[index * per_chunk:(index + 1) * per_chunk]
+                if spoken:
+                    delta = (" " if transcript else "") + " ".join(spoken)
+                    transcript += delta
+                    await self.send("response.audio_transcript.delta", delta=delta, **ids)
+        except asyncio.CancelledError:
+            # A cancelled response still closes its item, as incomplete
+            part = {"type": "audio", "transcript": transcript}
+            item = {**item, "status": "incomplete", "content": [part]}
+            await self.send("response.output_item.done", response_id=response_id, output_index=0, item=item)
+            raise
+
+        await self.send("response.audio.done", **ids)
+        await self.send("response.audio_transcript.done", transcript=transcript, **ids)
+        part = {"type": "audio", "transcript": transcript}
+        await self.send("response.content_part.done", part=part, **ids)
+        item = {**item, "status": "completed", "content": [part]}
+        await self.send("response.output_item.done", response_id=response_id, output_index=0, item=item)
+        return item
+
+
+class FakeRealtimeServer:
+    """Websocket server handing every connection its own FakeSession."""
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 8765,
+                 latency_ms: float = 300,
+                 latency_jitter_ms: float = 0,
+                 audio_rate: float = 1.0,
+                 audio_chunk_ms: int = 100,
+                 response_ms: int = 3000,
+                 speech_ms: int = 1500,
+                 pause_ms: int = 3000,
+                 function_call_every: int = 0,
+                 function_arguments: str = "{}",
+                 transcript: str = DEFAULT_TRANSCRIPT,
+                 user_transcript: str = DEFAULT_USER_TRANSCRIPT):
+        """
+        Initialize the fake server.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on, 0 for any free port
+            latency_ms: Delay between response.created and the first output
+            latency_jitter_ms: Random extra delay added to latency_ms, up to this much
+            audio_rate: Speed of the response audio relative to real time, 0 for unthrottled
+            audio_chunk_ms: Duration of audio in each response.audio.delta
+            response_ms: Duration of the audio of each response
+            speech_ms: Duration of each simulated caller utterance, 0 disables VAD events
+            pause_ms: Received audio between utterances
+            function_call_every: Make every Nth response a call to the first tool, 0 never
+            function_arguments: JSON arguments of simulated function calls
+            transcript: Transcript of every response
+            user_transcript: Transcription of every caller utterance
+        """
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.audio_rate = audio_rate
+        self.audio_chunk_ms = audio_chunk_ms
+        self.response_ms = response_ms
+        self.speech_ms = speech_ms
+        self.pause_ms = pause_ms
+        self.function_call_every = function_call_every
+        self.function_arguments = function_arguments
+        self.transcript = transcript
+        self.user_transcript = user_transcript
+        self.server = None
+        self.audio_chunks_by_format = {}
+
+        # Metrics
+        self.connections = 0
+        self.active = 0
+        self.events_received = 0
+        self.events_sent = 0
+        self.responses = 0
+        self.audio_chunks = 0
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def audio_chunk(self, audio_format):
+        """Base64 payload of one response.audio.delta, encoded once per format."""
+        chunk = self.audio_chunks_by_format.get(audio_format)
+        if chunk is None:
+            audio = _tone(audio_format, self.audio_chunk_ms)
+            chunk = self.audio_chunks_by_format[audio_format] = base64.b64encode(audio).decode("ascii")
+        return chunk
+
+    async def start(self):
+        self.server = await websockets.serve(self._handle, self.host, self.port, max_size=None)
+        # Resolve port 0 to the one actually bound
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Fake Realtime server listening on {self.url}")
+        return self
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, ws, *args):
+        self.connections += 1
+        self.active += 1
+        session = FakeSession(self, ws, f"sess_{self.connections:06d}")
+        try:
+            await session.run()
+        except websockets.ConnectionClosed:
+            session._cancel_response()
+        finally:
+            self.active -= 1
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "active": self.active,
+            "events_received": self.events_received,
+            "events_sent": self.events_sent,
+            "responses": self.responses,
+            "audio_chunks": self.audio_chunks,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0)
+    parser.add_argument("--audio-rate", type=float, default=1.0)
+    parser.add_argument("--audio-chunk-ms", type=int, default=100)
+    parser.add_argument("--response-ms", type=int, default=3000)
+    parser.add_argument("--speech-ms", type=int, default=1500)
+    parser.add_argument("--pause-ms", type=int, default=3000)
+    parser.add_argument("--function-call-every", type=int, default=0)
+    parser.add_argument("--function-arguments", default="{}")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    server = FakeRealtimeServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        audio_rate=args.audio_rate,
+        audio_chunk_ms=args.audio_chunk_ms,
+        response_ms=args.response_ms,
+        speech_ms=args.speech_ms,
+        pause_ms=args.pause_ms,
+        function_call_every=args.function_call_every,
+        function_arguments=args.function_arguments,
+    )
+
+    async def run():
+        await server.start()
+        try:
+            while True:
+                await asyncio.sleep(10)
+                logger.info(f"Fake Realtime server: {server.stats()}")
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
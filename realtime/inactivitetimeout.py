@@ -1,137 +1,256 @@
-# silence_detector.py
+# inactivitetimeout.py
+import math
 import time
-import logging
 import asyncio
-from threading import Timer
-from typing import Callable, Optional, Coroutine, Any
+import inspect
+import logging
+import weakref
+from typing import Callable, Optional, Any
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
+
+class WheelTimer:
+    """
+    A single timer living on a TimerWheel.
+
+    Resetting a timer only moves its deadline; the wheel notices the new
+    deadline when the timer's slot comes round and re-files it, so a reset
+    never allocates or touches the wheel itself.
+    """
+    __slots__ = ("wheel", "deadline", "callback", "cancelled", "slot")
+
+    def __init__(self, wheel: "TimerWheel", deadline: float, callback: Callable[[], Any]):
+        self.wheel = wheel
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self.slot = None
+
+    def reset(self, delay: float):
+        """Push the deadline to `delay` seconds from now."""
+        if not self.cancelled:
+            self.deadline = self.wheel.loop.time() + delay
+
+    def cancel(self):
+        """Cancel the timer. Safe to call more than once."""
+        if not self.cancelled:
+            self.cancelled = True
+            self.wheel._remove(self)
+
+    def remaining(self) -> float:
+        """Seconds left before the timer fires."""
+        return max(0.0, self.deadline - self.wheel.loop.time())
+
+
+class TimerWheel:
+    """
+    A hashed timing wheel driven by the asyncio event loop.
+
+    All timers of the loop share one `call_at` handle that ticks every
+    `tick` seconds while at least one timer is pending, so thousands of
+    timers cost a single scheduled callback and no threads.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tick: float = 0.25, slot_count: int = 512):
+        """
+        Initialize the timer wheel.
+
+        Args:
+            loop: Event loop the wheel runs on
+            tick: Resolution of the wheel in seconds
+            slot_count: Number of slots in the wheel
+        """
+        self.loop = loop
+        self.tick = tick
+        self.slot_count = slot_count
+        self.slots = [set() for _ in range(slot_count)]
+        self.current_tick = int(loop.time() / tick)
+        self.pending = 0
+        self._handle = None
+
+    def schedule(self, delay: float, callback: Callable[[], Any]) -> WheelTimer:
+        """
+        Schedule `callback` to run on the loop after `delay` seconds.
+
+        Args:
+            delay: Delay in seconds
+            callback: Function to call when the timer expires (non-async)
+
+        Returns:
+            The WheelTimer, which can be reset or cancelled
+        """
+        timer = WheelTimer(self, self.loop.time() + delay, callback)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer: WheelTimer):
+        if not self.pending:
+            # The wheel stops turning while empty; catch up before filing.
+            self.current_tick = max(self.current_tick, int(self.loop.time() / self.tick))
+        target_tick = max(math.ceil(timer.deadline / self.tick), self.current_tick + 1)
+        # Timers further away than one revolution wait in the slot and get
+        # re-filed when their slot comes round.
+        target_tick = min(target_tick, self.current_tick + self.slot_count)
+        timer.slot = self.slots[target_tick % self.slot_count]
+        timer.slot.add(timer)
+        self.pending += 1
+        if self._handle is None:
+            self._handle = self.loop.call_at((self.current_tick + 1) * self.tick, self._advance)
+
+    def _remove(self, timer: WheelTimer):
+        if timer.slot is not None:
+            timer.slot.discard(timer)
+            timer.slot = None
+            self.pending -= 1
+
+    def _advance(self):
+        self._handle = None
+        # The loop may run us a hair early, within its clock resolution
+        now_tick = int(self.loop.time() / self.tick + 1e-3)
+        while self.current_tick < now_tick and self.pending:
+            self.current_tick += 1
+            slot = self.slots[self.current_tick % self.slot_count]
+            if not slot:
+                continue
+            expired = list(slot)
+            slot.clear()
+            self.pending -= len(expired)
+            for timer in expired:
+                timer.slot = None
+                if timer.cancelled:
+                    continue
+                if timer.deadline > self.current_tick * self.tick:
+                    self._insert(timer)
+                    continue
+                timer.cancelled = True
+                try:
+                    timer.callback()
+                except Exception as e:
+                    logger.error(f"Error in timer callback: {str(e)}", exc_info=True)
+        self.current_tick = max(self.current_tick, now_tick)
+        if self.pending and self._handle is None:
+            self._handle = self.loop.call_at((self.current_tick + 1) * self.tick, self._advance)
+
+
+_timer_wheels = weakref.WeakKeyDictionary()
+
+
+def get_timer_wheel(loop: Optional[asyncio.AbstractEventLoop] = None) -> TimerWheel:
+    """Return the process-wide timer wheel of `loop` (the running loop by default)."""
+    loop = loop or asyncio.get_event_loop()
+    wheel = _timer_wheels.get(loop)
+    if wheel is None:
+        wheel = _timer_wheels[loop] = TimerWheel(loop)
+    return wheel
+
+
 class SilenceDetector:
     """
     A class to detect user silence and trigger actions after a specified timeout period.
-    Compatible with asyncio.
+
+    The detector is meant to be driven by speech events rather than raw
+    traffic: `pause()` while someone is talking, `resume()` once they stop,
+    and `reset()` on any other sign of user activity.
     """
-    def __init__(self, 
-                 timeout_seconds: int = 30, 
-                 on_timeout_callback: Optional[Callable[[], Any]] = None,
-                 on_timeout_coroutine: Optional[Coroutine] = None,
-                 loop: Optional[asyncio.AbstractEventLoop] = None,
-                 log_level: int = logging.INFO):
+    def __init__(self,
+                 timeout_seconds: float = 30,
+                 on_timeout: Optional[Callable[[], Any]] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
         """
         Initialize the silence detector.
-        
+
         Args:
             timeout_seconds: Number of seconds of silence before triggering timeout
-            on_timeout_callback: Function to call when timeout occurs (non-async)
-            on_timeout_coroutine: Coroutine to schedule when timeout occurs (async)
-            loop: Asyncio event loop to use for scheduling coroutines
-            log_level: Logging level for this instance (default: INFO)
+            on_timeout: Function or coroutine function to call when timeout occurs
+            loop: Asyncio event loop whose timer wheel should be used
         """
         self.timeout_seconds = timeout_seconds
-        self.on_timeout_callback = on_timeout_callback
-        self.on_timeout_coroutine = on_timeout_coroutine
+        self.on_timeout = on_timeout
         self.loop = loop
-        self.silence_timer = None
+        self.timer = None
         self.last_activity_time = time.time()
         self.is_active = False
-        
-        # Configure logger
-        self.logger = logger
-        self.logger.setLevel(log_level)
-        
-        self.logger.info(f"SilenceDetector initialized with {timeout_seconds}s timeout")
-    
+        self.is_paused = False
+
     def start(self):
         """Start the silence detection."""
+        if self.is_active:
+            return
+        self.loop = self.loop or asyncio.get_event_loop()
         self.is_active = True
+        self.is_paused = False
         self.last_activity_time = time.time()
-        self.logger.info("Silence detection started")
-        self._schedule_timer()
-    
+        self.timer = get_timer_wheel(self.loop).schedule(self.timeout_seconds, self._handle_timeout)
+        logger.info(f"Silence detection started with {self.timeout_seconds}s timeout")
+
     def stop(self):
         """Stop the silence detection."""
+        if not self.is_active:
+            return
         self.is_active = False
-        if self.silence_timer:
-            self.silence_timer.cancel()
-            self.silence_timer = None
-            self.logger.info("Silence detection stopped")
-        else:
-            self.logger.debug("Silence detection stop called, but no active timer")
-    
+        self.is_paused = False
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        logger.info("Silence detection stopped")
+
     def reset(self):
-        """Reset the timer when user activity is detected."""
+        """Restart the countdown when user activity is detected."""
         if not self.is_active:
-            self.logger.debug("Activity detected but silence detection is not active")
             return
-            
-        previous_time = self.last_activity_time
         self.last_activity_time = time.time()
-        
-        elapsed = self.last_activity_time - previous_time
-        self.logger.debug(f"Activity detected after {elapsed:.2f}s of silence")
-        
-        if self.silence_timer:
-            self.silence_timer.cancel()
-            self.logger.debug("Previous silence timer canceled")
-        
-        self._schedule_timer()
-    
-    def _schedule_timer(self):
-        """Schedule the silence timeout timer."""
-        if self.is_active:
-            self.silence_timer = Timer(self.timeout_seconds, self._handle_timeout)
-            self.silence_timer.daemon = True
-            self.silence_timer.start()
-            self.logger.debug(f"Silence timer scheduled for {self.timeout_seconds}s from now")
-    
+        if self.is_paused:
+            return
+        if self.timer is None or self.timer.cancelled:
+            self.timer = get_timer_wheel(self.loop).schedule(self.timeout_seconds, self._handle_timeout)
+        else:
+            self.timer.reset(self.timeout_seconds)
+
+    def pause(self):
+        """Suspend the countdown, e.g. while the user or the agent is speaking."""
+        if not self.is_active or self.is_paused:
+            return
+        self.is_paused = True
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def resume(self):
+        """Restart a full countdown after a pause."""
+        if not self.is_active:
+            return
+        self.is_paused = False
+        self.reset()
+
     def _handle_timeout(self):
         """Handle the silence timeout event."""
-        current_time = time.time()
-        elapsed = current_time - self.last_activity_time
-        
-        if elapsed >= self.timeout_seconds and self.is_active:
-            self.logger.info(f"Silence timeout triggered after {elapsed:.2f}s of inactivity")
-            
-            # Handle regular callback (non-async)
-            if self.on_timeout_callback:
-                self.logger.info("Executing timeout callback")
-                try:
-                    self.on_timeout_callback()
-                except Exception as e:
-                    self.logger.error(f"Error in timeout callback: {str(e)}", exc_info=True)
-            
-            # Handle async coroutine if provided
-            if self.on_timeout_coroutine and self.loop:
-                self.logger.info("Scheduling timeout coroutine on event loop")
-                try:
-                    # Use call_soon_threadsafe to safely schedule the coroutine from this thread
-                    self.loop.call_soon_threadsafe(
-                        lambda: asyncio.create_task(self.on_timeout_coroutine)
-                    )
-                except Exception as e:
-                    self.logger.error(f"Error scheduling timeout coroutine: {str(e)}", exc_info=True)
-        else:
-            # If activity happened during timer execution, reschedule
-            remaining = self.timeout_seconds - elapsed
-            if remaining > 0:
-                self.logger.debug(f"Activity occurred during timeout check, rescheduling timer for {remaining:.2f}s")
-                self.silence_timer = Timer(remaining, self._handle_timeout)
-                self.silence_timer.daemon = True
-                self.silence_timer.start()
-    
+        self.timer = None
+        if not self.is_active:
+            return
+        elapsed = time.time() - self.last_activity_time
+        logger.info(f"Silence timeout triggered after {elapsed:.2f}s of inactivity")
+        self.is_active = False
+        if not self.on_timeout:
+            return
+        try:
+            if inspect.iscoroutinefunction(self.on_timeout):
+                asyncio.ensure_future(self.on_timeout(), loop=self.loop)
+            else:
+                self.on_timeout()
+        except Exception as e:
+            logger.error(f"Error in timeout callback: {str(e)}", exc_info=True)
+
     def get_silence_duration(self):
         """Get the current duration of silence in seconds."""
-        if not self.is_active:
+        if not self.is_active or self.is_paused:
             return 0
-        
-        current_time = time.time()
-        elapsed = current_time - self.last_activity_time
-        return elapsed
-    
+
+        return time.time() - self.last_activity_time
+
     def __str__(self):
         """String representation of the silence detector state."""
-        status = "active" if self.is_active else "inactive"
+        status = "paused" if self.is_paused else "active" if self.is_active else "inactive"
         silence_duration = self.get_silence_duration()
-        return f"SilenceDetector({status}, timeout={self.timeout_seconds}s, current_silence={silence_duration:.2f}s)"
\ No newline at end of file
+        return f"SilenceDetector({status}, timeout={self.timeout_seconds}s, current_silence={silence_duration:.2f}s)"
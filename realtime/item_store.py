@@ -0,0 +1,213 @@
+# item_store.py
+from collections.abc import MutableMapping
+
+
+class SlotRecord(MutableMapping):
+    """
+    Compact record with a dict-compatible view.
+
+    Known keys live in `__slots__`, anything else in a small `extra` dict
+    created on first use. Handlers keep using `record["key"]`, `.get()`,
+    `in` and `dict(record)` as with the plain dicts this replaces.
+    """
+
+    __slots__ = ("extra",)
+    FIELDS = ()
+    _field_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+
+    def __init__(self, values=None, **kwargs):
+        self.extra = None
+        fields = self._field_set
+        for source in (values, kwargs):
+            if not source:
+                continue
+            for key, value in source.items():
+                if key in fields:
+                    setattr(self, key, value)
+                else:
+                    self[key] = value
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_set:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self.extra is None:
+            raise KeyError(key)
+        else:
+            del self.extra[key]
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return hasattr(self, key)
+        return self.extra is not None and key in self.extra
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            return getattr(self, key, default)
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        # A record is always truthy, as `if not item` guards expect
+        return True
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class FormattedItem(SlotRecord):
+    """The client-side view of an item: audio, text, transcript and tool call."""
+
+    FIELDS = ("audio", "text", "transcript", "tool", "output")
+    __slots__ = FIELDS
+
+
+class ItemRecord(SlotRecord):
+    """A conversation item, linked to its neighbours in the ItemStore."""
+
+    FIELDS = ("id", "object", "type", "status", "role", "content", "name", "call_id", "arguments", "output", "formatted")
+    __slots__ = FIELDS + ("_prev", "_next")
+
+    def __init__(self, values=None, **kwargs):
+        self._prev = None
+        self._next = None
+        super().__init__(values, **kwargs)
+
+
+class ItemStore:
+    """
+    Ordered conversation items with O(1) lookup, insertion and deletion.
+
+    Items are kept in a doubly linked list threaded through the records
+    themselves, indexed by id. Lookups by id behave like the former
+    `item_lookup` dict, iteration yields the records in conversation order
+    like the former `items` list.
+    """
+
+    def __init__(self):
+        self._lookup = {}
+        self._head = None
+        self._tail = None
+
+    def __len__(self):
+        return len(self._lookup)
+
+    def __contains__(self, item_id):
+        return item_id in self._lookup
+
+    def __getitem__(self, item_id):
+        return self._lookup[item_id]
+
+    def __delitem__(self, item_id):
+        self.remove(item_id)
+
+    def get(self, item_id, default=None):
+        return self._lookup.get(item_id, default)
+
+    def __iter__(self):
+        # Safe against removing the current record while iterating
+        record = self._head
+        while record is not None:
+            following = record._next
+            yield record
+            record = following
+
+    def __reversed__(self):
+        record = self._tail
+        while record is not None:
+            preceding = record._prev
+            yield record
+            record = preceding
+
+    @property
+    def first(self):
+        return self._head
+
+    @property
+    def last(self):
+        return self._tail
+
+    def add(self, record, previous_item_id=...):
+        """
+        Insert a record after `previous_item_id`, first when it is None and
+        last when it is omitted or unknown.
+        """
+        if record["id"] in self._lookup:
+            raise ValueError(f'Item "{record["id"]}" already exists')
+        if previous_item_id is ... or self._tail is None:
+            previous = self._tail
+        elif previous_item_id is None:
+            previous = None
+        else:
+            previous = self._lookup.get(previous_item_id, self._tail)
+        following = previous._next if previous is not None else self._head
+        record._prev = previous
+        record._next = following
+        if previous is None:
+            self._head = record
+        else:
+            previous._next = record
+        if following is None:
+            self._tail = record
+        else:
+            following._prev = record
+        self._lookup[record["id"]] = record
+        return record
+
+    def remove(self, item_id):
+        record = self._lookup.pop(item_id)
+        if record._prev is None:
+            self._head = record._next
+        else:
+            record._prev._next = record._next
+        if record._next is None:
+            self._tail = record._prev
+        else:
+            record._next._prev = record._prev
+        record._prev = record._next = None
+        return record
+
+    def clear(self):
+        # Unlink so records held elsewhere do not keep the whole chain alive
+        for record in self:
+            record._prev = record._next = None
+        self._lookup.clear()
+        self._head = self._tail = None
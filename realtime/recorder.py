@@ -0,0 +1,214 @@
+# recorder.py
+"""
+Wire-level recording and offline replay of Realtime sessions.
+
+A recording is an append-only file: a header with the wall-clock start time,
+then one record per websocket frame made of a little-endian
+(nanoseconds since start, direction, length) prefix and the raw frame.
+Timestamps come from the monotonic clock.
+
+Replay a recording from the repository root:
+
+    python -m realtime.recorder calls/CA123.rtrec --speed 0
+"""
+
+import json
+import time
+import struct
+import asyncio
+import logging
+import argparse
+from typing import Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RTREC\x01"
+HEADER = struct.Struct("<6sd")
+RECORD = struct.Struct("<QcI")
+
+RECEIVED = b"<"
+SENT = b">"
+
+
+class Frame(NamedTuple):
+    offset: float
+    direction: bytes
+    message: str
+
+
+class SessionRecorder:
+    """Appends every frame sent and received on a connection to `path`."""
+
+    def __init__(self, path: str, buffer_size: int = 64 * 1024):
+        self.path = path
+        self.file = open(path, "ab", buffering=buffer_size)
+        self.started_ns = time.monotonic_ns()
+        self.frames = 0
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, time.time()))
+
+    def record(self, direction: bytes, message):
+        if self.file is None:
+            return
+        data = message.encode("utf-8") if isinstance(message, str) else message
+        self.file.write(RECORD.pack(time.monotonic_ns() - self.started_ns, direction, len(data)))
+        self.file.write(data)
+        self.frames += 1
+
+    def record_received(self, message):
+        self.record(RECEIVED, message)
+
+    def record_sent(self, message):
+        self.record(SENT, message)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            logger.info(f"Recorded {self.frames} frames to {self.path}")
+
+
+def read_recording(path: str) -> Iterator[Frame]:
+    """Yield the frames of a recording in order, with offsets in seconds."""
+    with open(path, "rb") as file:
+        magic, _ = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Realtime session recording")
+        while True:
+            prefix = file.read(RECORD.size)
+            if len(prefix) < RECORD.size:
+                return
+            offset_ns, direction, length = RECORD.unpack(prefix)
+            data = file.read(length)
+            if len(data) < length:
+                # Truncated by a crash mid-write, keep what is complete
+                return
+            yield Frame(offset_ns / 1e9, direction, data.decode("utf-8"))
+
+
+class NullWebSocket:
+    """Stands in for the websocket while replaying: swallows, and optionally keeps, what the client sends."""
+
+    transport = None
+
+    def __init__(self, keep_sent: bool = False):
+        self.sent = [] if keep_sent else None
+
+    async def send(self, message):
+        if self.sent is not None:
+            self.sent.append(message)
+
+    async def close(self):
+        pass
+
+
+class SessionReplayer:
+    """
+    Feeds the server frames of a recording into a RealtimeClient, offline.
+
+    With `speed` 1 frames are delivered on their recorded schedule, with a
+    higher `speed` proportionally faster, and with `speed` 0 as fast as
+    possible. The client is connected to a NullWebSocket, so whatever it
+    sends in response goes nowhere.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self.frames = list(read_recording(path))
+
+    async def replay(self, client, keep_sent: bool = False):
+        """Replay into `client`, which must not be connected, and return timing stats."""
+        ws = NullWebSocket(keep_sent=keep_sent)
+        await client.connect(ws=ws)
+        api = client.realtime
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        cpu_started = time.process_time()
+        delivered = 0
+        late = 0.0
+        for frame in self.frames:
+            if frame.direction != RECEIVED:
+                continue
+            if self.speed:
+                delay = started + frame.offset / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    late = max(late, -delay)
+            api._handle_message(frame.message)
+            delivered += 1
+            if not self.speed and delivered % 100 == 0:
+                # Let handlers scheduled as tasks run as they would live
+                await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        elapsed = loop.time() - started
+        cpu = time.process_time() - cpu_started
+        return {
+            "frames": delivered,
+            "elapsed_seconds": elapsed,
+            "cpu_seconds": cpu,
+            "frames_per_second": delivered / elapsed if elapsed else 0.0,
+            "max_lateness_ms": late * 1000,
+            "sent": ws.sent,
+        }
+
+
+def session_audio_format(frames, default: str = "pcm16") -> str:
+    """The output audio format announced by the recorded session, e.g. g711_ulaw."""
+    for frame in frames:
+        if frame.direction != RECEIVED:
+            continue
+        event = json.loads(frame.message)
+        if event.get("type") in ("session.created", "session.updated"):
+            return event["session"].get("output_audio_format", default)
+    return default
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Replay a Realtime session recording offline")
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed, 0 for as fast as possible")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile of the replay")
+    args = parser.parse_args(argv)
+
+    from .client import RealtimeClient
+
+    replayer = SessionReplayer(args.path, speed=args.speed)
+    # A fixed prompt and voice, so building the client does not look up the dealer
+    client = RealtimeClient(
+        api_key="offline",
+        system_message="Offline replay",
+        voice="alloy",
+        dealer_id="replay",
+        audio_format=session_audio_format(replayer.frames),
+        auto_start=False,
+    )
+
+    async def run():
+        try:
+            stats = await replayer.replay(client)
+            # Counted before disconnect() clears the conversation
+            stats["items"] = len(client.conversation.items)
+            return stats
+        finally:
+            await client.disconnect()
+
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        stats = profiler.runcall(asyncio.run, run())
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        stats = asyncio.run(run())
+    print(
+        f"{stats['frames']} frames in {stats['elapsed_seconds']:.3f} s "
+        f"({stats['frames_per_second']:.0f} frames/s, {stats['cpu_seconds']:.3f} s CPU, "
+        f"max lateness {stats['max_lateness_ms']:.1f} ms), "
+        f"{stats['items']} conversation items"
+    )
+
+
+if __name__ == "__main__":
+    main()
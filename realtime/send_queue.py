@@ -0,0 +1,216 @@
+# send_queue.py
+import time
+import asyncio
+import logging
+import weakref
+from collections import deque
+from typing import Awaitable, Callable, Optional
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Every live queue of the process, for the depth gauge
+live_queues = weakref.WeakSet()
+dropped_total = registry.counter(
+    "realtime_send_queue_dropped_total",
+    "Audio appends dropped by send queues under the drop policy",
+)
+
+# Sent ahead of anything queued so an interruption takes effect immediately
+CONTROL_EVENT_TYPES = frozenset({
+    "response.cancel",
+    "conversation.item.truncate",
+    "session.update",
+    "input_audio_buffer.clear",
+})
+# The only events that may be dropped under the "drop" policy
+DROPPABLE_EVENT_TYPES = frozenset({"input_audio_buffer.append"})
+
+POLICY_BLOCK = "block"
+POLICY_DROP = "drop"
+
+
+class SendQueue:
+    """
+    Per-connection outbound queue drained by a single writer task.
+
+    Control events go out before everything else; all other events keep
+    their relative order, so commits and response.create never overtake the
+    audio queued before them. At most `max_audio` audio appends are held: with
+    the "block" policy producers wait for room, with the "drop" policy the
+    oldest queued audio is dropped, as is audio older than `stale_audio_ms`
+    while the socket's write buffer is above `high_water`.
+
+    If a send fails the writer stops: what is queued is dropped, `put()`
+    raises the error from then on and `on_error(error)` is called, e.g. to
+    close the connection so it is reconnected.
+    """
+
+    def __init__(self,
+                 send: Callable[[str], Awaitable[None]],
+                 write_buffer_size: Optional[Callable[[], int]] = None,
+                 max_audio: int = 50,
+                 policy: str = POLICY_DROP,
+                 high_water: int = 64 * 1024,
+                 stale_audio_ms: int = 500,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        """
+        Initialize the send queue.
+
+        Args:
+            send: Coroutine function writing one message to the socket
+            write_buffer_size: Function returning the bytes buffered by the socket
+            max_audio: Most audio appends held in the queue
+            policy: "block" to apply backpressure, "drop" to drop stale audio
+            high_water: Write buffer size above which the socket counts as backed up
+            stale_audio_ms: Age after which queued audio is dropped while backed up
+            on_error: Called with the error when a send fails and the writer stops
+        """
+        if policy not in (POLICY_BLOCK, POLICY_DROP):
+            raise ValueError(f'Unknown send queue policy "{policy}"')
+        self.send = send
+        self.write_buffer_size = write_buffer_size
+        self.max_audio = max_audio
+        self.policy = policy
+        self.high_water = high_water
+        self.stale_audio = stale_audio_ms / 1000
+        self.on_error = on_error
+        self.error = None
+        self.control = deque()
+        self.bulk = deque()
+        self.audio_count = 0
+        self.wakeup = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.task = None
+
+        # Metrics
+        self.max_depth = 0
+        self.sent = 0
+        self.dropped = 0
+        self.send_latency_sum = 0.0
+        self.send_latency_max = 0.0
+        live_queues.add(self)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the writer and drop whatever is still queued."""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self._clear()
+
+    def _clear(self):
+        self.control.clear()
+        self.bulk.clear()
+        self.audio_count = 0
+        # Wakes producers waiting for room, they see the queue closed or failed
+        self.space.set()
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise ConnectionError(f"Send queue writer stopped: {str(self.error)}") from self.error
+
+    def depth(self):
+        return len(self.control) + len(self.bulk)
+
+    async def put(self, event_type: str, message: str):
+        """Queue an encoded message, waiting for room when audio is backed up. Raises ConnectionError once a send failed."""
+        self._raise_if_failed()
+        droppable = event_type in DROPPABLE_EVENT_TYPES
+        if event_type in CONTROL_EVENT_TYPES:
+            self.control.append((time.monotonic(), message, False))
+        else:
+            if droppable:
+                while self.audio_count >= self.max_audio:
+                    if self.policy == POLICY_DROP:
+                        self._drop_oldest_audio()
+                    else:
+                        self.space.clear()
+                        await self.space.wait()
+                        self._raise_if_failed()
+                self.audio_count += 1
+            self.bulk.append((time.monotonic(), message, droppable))
+        self.max_depth = max(self.max_depth, self.depth())
+        self.wakeup.set()
+
+    def _drop_oldest_audio(self):
+        for index, entry in enumerate(self.bulk):
+            if entry[2]:
+                del self.bulk[index]
+                self.audio_count -= 1
+                self.dropped += 1
+                dropped_total.inc()
+                return
+
+    def _backed_up(self):
+        if self.write_buffer_size is None:
+            return False
+        try:
+            return self.write_buffer_size() > self.high_water
+        except Exception:
+            return False
+
+    async def _run(self):
+        while True:
+            if not self.control and not self.bulk:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            queue = self.control if self.control else self.bulk
+            enqueued_at, message, droppable = queue.popleft()
+            if droppable:
+                self.audio_count -= 1
+                self.space.set()
+                if (self.policy == POLICY_DROP
+                        and time.monotonic() - enqueued_at > self.stale_audio
+                        and self._backed_up()):
+                    self.dropped += 1
+                    dropped_total.inc()
+                    continue
+            try:
+                await self.send(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Send queue writer stopped: {str(e)}")
+                self.error = e
+                self._clear()
+                if self.on_error:
+                    self.on_error(e)
+                return
+            latency = time.monotonic() - enqueued_at
+            self.sent += 1
+            self.send_latency_sum += latency
+            self.send_latency_max = max(self.send_latency_max, latency)
+
+    def stats(self):
+        """Queue depth, drops and send latency so far."""
+        return {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "avg_send_latency_ms": (self.send_latency_sum / self.sent) * 1000 if self.sent else 0.0,
+            "max_send_latency_ms": self.send_latency_max * 1000,
+        }
+
+
+def _queue_depths():
+    depths = [queue.depth() for queue in live_queues]
+    return {("total",): sum(depths), ("max",): max(depths, default=0)}
+
+
+registry.gauge(
+    "realtime_send_queue_depth",
+    "Messages waiting in the outbound websocket send queues",
+    labels=("aggregate",),
+    function=_queue_depths,
+)
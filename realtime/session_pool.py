@@ -0,0 +1,165 @@
+# session_pool.py
+import time
+import asyncio
+import logging
+from collections import deque, namedtuple
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Sessions are interchangeable when they share a dealer and a voice;
+# a voice of None means the dealer's default voice.
+SessionProfile = namedtuple("SessionProfile", ["dealer_id", "voice"])
+
+
+class RealtimeSessionPool:
+    """
+    Keeps `size` connected, fully configured RealtimeClient sessions per profile.
+
+    Sessions are built by `factory(profile)`, which must return a connected
+    client whose session has been created and that was constructed with
+    `auto_start=False`. `acquire()` hands one out (the caller then awaits
+    `start_call()`), and a background task tops every profile back up and
+    closes sessions that sat idle longer than `max_idle` seconds.
+
+    Profiles passed to `warm()` are kept ready for as long as the pool runs.
+    A profile first seen by `acquire()` is kept ready too, until it goes
+    `max_idle` seconds without being acquired.
+    """
+
+    def __init__(self,
+                 factory: Callable[[SessionProfile], Awaitable],
+                 size: int = 2,
+                 max_idle: float = 600,
+                 refill_interval: float = 5):
+        """
+        Initialize the session pool.
+
+        Args:
+            factory: Coroutine function creating a ready session for a profile
+            size: Number of idle sessions kept per profile
+            max_idle: Seconds after which an idle session is replaced
+            refill_interval: Seconds between background maintenance passes
+        """
+        self.factory = factory
+        self.size = size
+        self.max_idle = max_idle
+        self.refill_interval = refill_interval
+        self.idle = {}
+        self.pinned = set()
+        self.last_acquired = {}
+        # Fill task -> profile it is connecting a session for
+        self.filling = {}
+        self.task = None
+        self.wakeup = asyncio.Event()
+
+    def warm(self, profile: SessionProfile):
+        """Keep sessions ready for `profile` until the pool is closed."""
+        self.pinned.add(profile)
+        self._track(profile)
+
+    def _track(self, profile):
+        if profile not in self.idle:
+            self.idle[profile] = deque()
+        self.wakeup.set()
+
+    def start(self):
+        if self.task is None and self.size > 0:
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop refilling and disconnect every idle session, and every session still connecting."""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        fills = list(self.filling)
+        for fill in fills:
+            fill.cancel()
+        await asyncio.gather(*fills, return_exceptions=True)
+        idle, self.idle = self.idle, {}
+        for sessions in idle.values():
+            while sessions:
+                _, client = sessions.popleft()
+                await self._discard(client)
+
+    async def acquire(self, profile: SessionProfile):
+        """Take a ready session for `profile`, creating one on the spot if none is idle."""
+        self.last_acquired[profile] = time.monotonic()
+        self._track(profile)
+        sessions = self.idle[profile]
+        while sessions:
+            created_at, client = sessions.popleft()
+            self.wakeup.set()
+            if client.is_connected() and time.monotonic() - created_at < self.max_idle:
+                logger.info(f"Using pre-warmed Realtime session for {profile}")
+                return client
+            await self._discard(client)
+        logger.info(f"No pre-warmed Realtime session for {profile}, connecting")
+        return await self.factory(profile)
+
+    def stats(self):
+        return {
+            str(profile): {"idle": len(sessions), "warming": self._warming(profile)}
+            for profile, sessions in self.idle.items()
+        }
+
+    def _warming(self, profile):
+        return sum(1 for filling in self.filling.values() if filling == profile)
+
+    async def _run(self):
+        while True:
+            self._evict()
+            self._expire()
+            for profile, sessions in self.idle.items():
+                for _ in range(self.size - len(sessions) - self._warming(profile)):
+                    fill = asyncio.create_task(self._fill(profile))
+                    self.filling[fill] = profile
+                    fill.add_done_callback(lambda done: self.filling.pop(done, None))
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fill(self, profile):
+        try:
+            client = await self.factory(profile)
+        except Exception as e:
+            logger.error(f"Error pre-warming Realtime session for {profile}: {str(e)}")
+            return
+        sessions = self.idle.get(profile)
+        if sessions is None:
+            # Evicted, or the pool closed, while this session was connecting
+            await self._discard(client)
+            return
+        sessions.append((time.monotonic(), client))
+
+    def _evict(self):
+        """Stop keeping sessions ready for profiles nobody acquired within `max_idle`."""
+        now = time.monotonic()
+        for profile in list(self.idle):
+            if profile in self.pinned or now - self.last_acquired.get(profile, now) < self.max_idle:
+                continue
+            logger.info(f"No call for {profile} in {self.max_idle:g}s, no longer pre-warming it")
+            del self.last_acquired[profile]
+            for _, client in self.idle.pop(profile):
+                asyncio.create_task(self._discard(client))
+
+    def _expire(self):
+        now = time.monotonic()
+        for sessions in self.idle.values():
+            for entry in list(sessions):
+                created_at, client = entry
+                if now - created_at >= self.max_idle or not client.is_connected():
+                    sessions.remove(entry)
+                    asyncio.create_task(self._discard(client))
+
+    async def _discard(self, client):
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logger.error(f"Error closing pooled Realtime session: {str(e)}")
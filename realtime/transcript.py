@@ -0,0 +1,178 @@
+# transcript.py
+"""
+Streaming transcripts of calls.
+
+A TranscriptSink collects the turns of one call as they complete and, when
+given a path, appends each one as a JSON line to a local file (the media
+stream route only gives one with REALTIME_TRANSCRIPT_DIR set). The file is
+written from the default executor, never on the event loop. Readers tail a live call
+with `tail(cursor)` or `follow()`, which only hand out the turns they have
+not seen yet.
+
+Follow a transcript file from the repository root:
+
+    python -m realtime.transcript $REALTIME_TRANSCRIPT_DIR/CA123.jsonl --follow
+"""
+
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Turn(NamedTuple):
+    role: str
+    text: str
+    started_at: float
+    ended_at: float
+    item_id: Optional[str] = None
+    interrupted: bool = False
+
+
+class TranscriptSink:
+    """Turns of one call, kept in order and appended to `path` when given."""
+
+    def __init__(self, path: Optional[str] = None, call_id: Optional[str] = None):
+        self.path = path
+        self.call_id = call_id
+        self.turns: List[Turn] = []
+        self.file = None
+        self.closed = False
+        self._pending = []
+        self._flush_task = None
+        self._appended = asyncio.Event()
+        self._item_started_at = {}
+
+    def attach(self, client):
+        """Record the caller's transcribed speech and the assistant's completed responses."""
+        client.on("conversation.item.appended", self._on_item_appended)
+        client.on("conversation.updated", self._on_conversation_updated)
+        return self
+
+    def _on_item_appended(self, event):
+        item = event["item"]
+        if item:
+            self._item_started_at[item["id"]] = time.time()
+
+    def _on_conversation_updated(self, event):
+        item, delta = event["item"], event["delta"]
+        if item["type"] != "message":
+            return
+        if item["role"] == "user":
+            # The input transcription arrives once, after the item was created
+            if delta and delta.get("transcript", "").strip():
+                self.add("user", delta["transcript"].strip(), item_id=item["id"])
+        elif item["role"] == "assistant" and delta is None and item["status"] != "in_progress":
+            if item["id"] not in self._item_started_at:
+                return
+            formatted = item["formatted"]
+            text = (formatted.get("transcript") or formatted.get("text") or "").strip()
+            if text:
+                self.add("assistant", text, item_id=item["id"], interrupted=item["status"] == "incomplete")
+            # Later updates of the item, e.g. its truncation, are not new turns
+            self._item_started_at.pop(item["id"], None)
+
+    def add(self, role: str, text: str, item_id: Optional[str] = None, interrupted: bool = False) -> Turn:
+        ended_at = time.time()
+        started_at = self._item_started_at.pop(item_id, ended_at) if item_id else ended_at
+        turn = Turn(role, text, started_at, ended_at, item_id, interrupted)
+        self.turns.append(turn)
+        self._appended.set()
+        logger.debug(f"{role.capitalize()} ({self.call_id}): {text}")
+        if self.path and not self.closed:
+            record = {"call_id": self.call_id, **turn._asdict()}
+            self._pending.append(json.dumps(record, ensure_ascii=False) + "\n")
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+        return turn
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            lines, self._pending = self._pending, []
+            try:
+                await loop.run_in_executor(None, self._write, "".join(lines))
+            except OSError as e:
+                logger.error(f"Error writing transcript to {self.path}: {e}")
+
+    def _write(self, data: str):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(data)
+        self.file.flush()
+
+    def tail(self, cursor: int = 0) -> Tuple[List[Turn], int]:
+        """Turns after `cursor` and the cursor to pass next time."""
+        return self.turns[cursor:], len(self.turns)
+
+    async def follow(self, cursor: int = 0):
+        """Yield turns as they are added, until the sink is closed."""
+        while True:
+            turns, cursor = self.tail(cursor)
+            for turn in turns:
+                yield turn
+            if self.closed:
+                return
+            self._appended.clear()
+            await self._appended.wait()
+
+    def text(self) -> str:
+        return "".join(f"{turn.role.capitalize()}: {turn.text}\n" for turn in self.turns)
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._appended.set()
+        if self._flush_task:
+            await self._flush_task
+        if self.file is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.file.close)
+            self.file = None
+            logger.info(f"Wrote {len(self.turns)} transcript turns to {self.path}")
+
+
+def read_transcript(path: str) -> Iterator[dict]:
+    """Yield the turns of a transcript file in order."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+
+def follow_transcript(path: str, poll_interval: float = 0.5) -> Iterator[dict]:
+    """Yield the turns of a transcript file, then new ones as they are appended."""
+    with open(path, encoding="utf-8") as file:
+        partial = ""
+        while True:
+            line = file.readline()
+            if not line:
+                time.sleep(poll_interval)
+                continue
+            partial += line
+            # A line is only complete once its newline was written
+            if partial.endswith("\n"):
+                yield json.loads(partial)
+                partial = ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a call transcript.")
+    parser.add_argument("path")
+    parser.add_argument("--follow", action="store_true", help="keep printing turns as they are appended")
+    args = parser.parse_args()
+    turns = follow_transcript(args.path) if args.follow else read_transcript(args.path)
+    try:
+        for turn in turns:
+            marker = " [interrupted]" if turn.get("interrupted") else ""
+            print(f"{turn['role'].capitalize()}: {turn['text']}{marker}", flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
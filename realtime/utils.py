@@ -41,6 +41,16 @@ def base64_to_array_buffer(base64_string):
     binary_data = base64.b64decode(base64_string)
     return np.frombuffer(binary_data, dtype=np.uint8)
 
+def array_buffer_to_bytes(array_buffer):
+    """
+    Converts a numpy array buffer to raw pcm16 bytes.
+    :param array_buffer: numpy array
+    :return: bytes
+    """
+    if array_buffer.dtype == np.float32:
+        array_buffer = float_to_16bit_pcm(array_buffer)
+    return array_buffer.tobytes()
+
 def array_buffer_to_base64(array_buffer):
     """
     Converts a numpy array buffer to a base64 string.
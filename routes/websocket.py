@@ -4,13 +4,22 @@ WebSocket routes for OpenAI Realtime API integration.
 
 import os
 import json
+import time
 import logging
 import asyncio
+from collections import deque
 from fastapi import WebSocket, WebSocketDisconnect
 
 from tools import tools
-from config.systeme_prompt import agent_system_prompt
+from tools.get_availibilite import availability_cache
 from realtime.client import RealtimeClient
+from realtime.conversation import RETAIN_NONE
+from realtime.context_window import transcript_summary
+from realtime.transcript import TranscriptSink
+from realtime.session_pool import RealtimeSessionPool, SessionProfile
+from realtime import metrics
+from utils.dealer_profile import dealer_profiles
+from variables.variables import load_variables
 
 # Configure logging
 logging.basicConfig(
@@ -21,69 +30,277 @@ logger = logging.getLogger(__name__)
 
 # OpenAI API configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-VOICE = 'alloy'
+# Realtime endpoint override, e.g. a local realtime.fake_server for load tests
+REALTIME_URL = os.getenv("REALTIME_URL")
+# Voice override; when unset each dealer's configured voice is used
+VOICE = os.getenv("REALTIME_VOICE")
+# Twilio media streams carry base64 8 kHz G.711 mu-law, which the Realtime API
+# speaks natively, so payloads are passed through in both directions.
+AUDIO_FORMAT = 'g711_ulaw'
+# Twilio sends 20 ms frames; batch them before sending upstream
+INPUT_AUDIO_CHUNK_MS = int(os.getenv("INPUT_AUDIO_CHUNK_MS", "100"))
+# Connected sessions kept ready per dealer/voice profile (0 disables pre-warming)
+SESSION_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", "2"))
+SESSION_POOL_MAX_IDLE = float(os.getenv("REALTIME_POOL_MAX_IDLE", "600"))
+# Server-side conversation bounds for long calls, see realtime.context_window
+CONTEXT_MAX_ITEMS = int(os.getenv("REALTIME_CONTEXT_MAX_ITEMS", "60"))
+CONTEXT_MAX_TOKENS = int(os.getenv("REALTIME_CONTEXT_MAX_TOKENS", "12000"))
+# Directory receiving a wire-level recording of every call, see realtime.recorder
+RECORD_DIR = os.getenv("REALTIME_RECORD_DIR")
+# Directory receiving the JSON lines transcript of every call, see realtime.transcript.
+# Transcripts hold caller numbers and speech, so unset (the default) keeps them in memory only
+TRANSCRIPT_DIR = os.getenv("REALTIME_TRANSCRIPT_DIR")
 
-async def handle_media_stream(websocket: WebSocket, session_id: str, session: dict):
-    """Handle the WebSocket connection for Twilio media streams."""
+
+async def create_realtime_session(profile: SessionProfile):
+    """Create a connected and fully configured Realtime session that has not started its call yet."""
+    # The client reads the dealer's prompt and voice from the cached profile
+    await dealer_profiles.load(profile.dealer_id)
+    realtime_client = RealtimeClient(
+        url=REALTIME_URL,
+        api_key=OPENAI_API_KEY,
+        audio_format=AUDIO_FORMAT,
+        input_audio_chunk_ms=INPUT_AUDIO_CHUNK_MS,
+        # Audio is forwarded to Twilio as it arrives, nothing reads it back
+        audio_retention=RETAIN_NONE,
+        context_max_items=CONTEXT_MAX_ITEMS,
+        context_max_tokens=CONTEXT_MAX_TOKENS,
+        context_summarize=transcript_summary,
+        voice=profile.voice,
+        dealer_id=profile.dealer_id,
+        auto_start=False,
+        auto_reconnect=True
+    )
+    
+    # Register all tools
+    for tool_def, tool_handler in tools:
+        await realtime_client.add_tool(tool_def, tool_handler)
+    
+    await realtime_client.connect()
+    try:
+        await asyncio.wait_for(realtime_client.wait_for_session_created(), timeout=10)
+    except BaseException:
+        # Nobody else holds the connection yet
+        await realtime_client.disconnect()
+        raise
+    return realtime_client
+
+
+def current_profile(dealer_id=None):
+    """Session profile for `dealer_id`, by default the dealer this process serves."""
+    if dealer_id is None:
+        dealer_id = load_variables().get("dealer_id")
+    return SessionProfile(dealer_id=dealer_id, voice=VOICE)
+
+
+session_pool = RealtimeSessionPool(
+    create_realtime_session,
+    size=SESSION_POOL_SIZE,
+    max_idle=SESSION_POOL_MAX_IDLE
+)
+
+
+class TwilioPlayback:
+    """
+    Sends response audio to a Twilio media stream and tracks how much was played.
+
+    Every media message is followed by a mark named after the item and the
+    sample offset the audio ends at. Twilio echoes a mark once everything
+    before it has played, so `played` is what the caller actually heard of
+    the current item. Messages go out through a single writer task, so an
+    interruption can drop everything still queued and clear Twilio's buffer.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.stream_sid = ""
+        self.queue = deque()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.item_id = None
+        self.sent = 0
+        self.played = 0
+        self.interrupted_item_id = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def send_audio(self, item_id, audio):
+        """Queue an audio delta (an AudioPayload of G.711, one byte per sample) and its mark."""
+        if item_id == self.interrupted_item_id:
+            # Still streaming from a response the caller talked over
+            return
+        if item_id != self.item_id:
+            self.item_id = item_id
+            self.sent = 0
+            self.played = 0
+        self.sent += len(audio)
+        self._put({"event": "media", "streamSid": self.stream_sid, "media": {"payload": audio.base64}})
+        self._put({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": f"{item_id}:{self.sent}"}})
+
+    def on_mark(self, name):
+        item_id, _, offset = name.rpartition(":")
+        if item_id == self.item_id:
+            self.played = max(self.played, int(offset))
+
+    def interrupt(self):
+        """
+        Drop unplayed audio and clear Twilio's buffer.
+
+        Returns the interrupted item id and the samples of it that were
+        played, or (None, 0) when everything sent had already been played.
+        """
+        if self.item_id is None or self.played >= self.sent:
+            return None, 0
+        item_id, played = self.item_id, self.played
+        self.queue.clear()
+        self._put({"event": "clear", "streamSid": self.stream_sid})
+        self.interrupted_item_id = item_id
+        self.item_id = None
+        self.sent = 0
+        self.played = 0
+        return item_id, played
+
+    def _put(self, message):
+        self.queue.append(message)
+        self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            try:
+                await self.websocket.send_text(json.dumps(self.queue.popleft()))
+            except (WebSocketDisconnect, RuntimeError):
+                # The caller hung up while audio was still queued
+                return
+
+
+async def wait_for_stream_start(websocket: WebSocket):
+    """Twilio's "start" message of the stream, or None if the stream closed before it."""
+    try:
+        while True:
+            data = json.loads(await websocket.receive_text())
+            if data.get("event") == "start":
+                return data["start"]
+            if data.get("event") == "stop":
+                return None
+    except WebSocketDisconnect:
+        return None
+
+
+async def handle_media_stream(websocket: WebSocket, sessions: dict):
+    """
+    Handle the WebSocket connection for Twilio media streams.
+
+    The call is identified by the CallSid of the stream's "start" message,
+    its entry in `sessions` (registered by the incoming call webhook, if
+    any) is used for the call and removed once the stream ends.
+    """
     await websocket.accept()
     logger.info("Client connected to media-stream")
     
-    first_message = ""
-    stream_sid = ""
+    start = await wait_for_stream_start(websocket)
+    if start is None:
+        logger.info("Twilio media stream closed before it started")
+        return
     
-    # Retrieve the caller number from the session
-    caller_number = session.get("caller_number", "Unknown")
+    stream_sid = start["streamSid"]
+    session_id = start["callSid"]
+    custom_parameters = start.get("customParameters", {})
+    session = sessions.setdefault(session_id, {"transcript": None, "stream_sid": None})
+    session["stream_sid"] = stream_sid
+    
+    logger.info(f"CallSid: {session_id}")
+    logger.info(f"StreamSid: {stream_sid}")
+    logger.info(f"Custom Parameters: {custom_parameters}")
+    
+    # Capture callerNumber and firstMessage from custom parameters
+    caller_number = custom_parameters.get("callerNumber") or session.get("caller_number", "Unknown")
+    session["caller_number"] = caller_number
+    first_message = custom_parameters.get("firstMessage", "Hello, how can I assist you?")
+    logger.info(f"First Message: {first_message}")
     logger.info(f"Caller Number: {caller_number}")
     
     # Set environment variable for tools to use
     os.environ["CALLER_NUMBER"] = caller_number
     
-    # Create and configure the OpenAI Realtime client
-    realtime_client = RealtimeClient(
-        api_key=OPENAI_API_KEY,
-        system_message=agent_system_prompt
-    )
-    realtime_client.set_voice(VOICE)
+    # Released in the finally below, whichever step of the setup fails
+    realtime_client = None
+    transcript = None
+    playback = TwilioPlayback(websocket)
+    playback.stream_sid = stream_sid
     
     # Register event handlers
-    async def handle_audio_delta(event):
-        if event.get("type") == "response.audio.delta" and event.get("delta"):
-            await websocket.send_text(json.dumps({
-                "event": "media",
-                "streamSid": stream_sid,
-                "media": {"payload": event["delta"]}
-            }))
-    
-    async def handle_response_done(event):
-        if event.get("type") == "response.done":
-            try:
-                output_items = event["response"]["output"]
-                for item in output_items:
-                    for content in item.get("content", []):
-                        if content.get("transcript"):
-                            agent_message = content["transcript"]
-                            session["transcript"] += f"Agent: {agent_message}\n"
-                            logger.info(f"Agent ({session_id}): {agent_message}")
-            except (KeyError, IndexError) as e:
-                logger.error(f"Error extracting agent message: {e}")
-    
-    async def handle_transcription(event):
-        if event.get("type") == "conversation.item.input_audio_transcription.completed" and event.get("transcript"):
-            user_message = event["transcript"].strip()
-            session["transcript"] += f"User: {user_message}\n"
-            logger.info(f"User ({session_id}): {user_message}")
+    def handle_audio_delta(event):
+        delta = event.get("delta")
+        if delta and delta.get("audio"):
+            playback.send_audio(event["item"]["id"], delta["audio"])
     
-    realtime_client.on("response.audio.delta", handle_audio_delta)
-    realtime_client.on("response.done", handle_response_done)
-    realtime_client.on("conversation.item.input_audio_transcription.completed", handle_transcription)
+    def handle_interrupted(event):
+        item_id, played = playback.interrupt()
+        if item_id:
+            asyncio.create_task(truncate_interrupted_item(item_id, played))
     
-    # Register all tools
-    for tool_def, tool_handler in tools:
-        await realtime_client.add_tool(tool_def, tool_handler)
+    async def truncate_interrupted_item(item_id, played):
+        try:
+            await realtime_client.cancel_response(item_id, played)
+        except Exception as e:
+            logger.error(f"Error truncating interrupted response: {e}")
+            return
+        if realtime_client.speech_started_at is not None:
+            metrics.interruption_latency.observe(
+                time.monotonic() - realtime_client.speech_started_at, dealer=realtime_client.dealer_id
+            )
+        logger.info(f"Caller interrupted {item_id} after {played / 8:.0f} ms of audio")
     
     try:
-        # Connect to OpenAI
-        await realtime_client.connect()
+        # The dealer owning the dialed number, found by the incoming call webhook
+        profile = current_profile(session.get("dealer_id"))
+        logger.info(f"Dealer: {profile.dealer_id}")
+        
+        # Warm the dealer's availability while the call connects, booking questions come early
+        availability_cache.prefetch(profile.dealer_id)
+        
+        # Take a connected and configured OpenAI Realtime session from the pool
+        realtime_client = await session_pool.acquire(profile)
+        if RECORD_DIR:
+            os.makedirs(RECORD_DIR, exist_ok=True)
+            realtime_client.start_recording(os.path.join(RECORD_DIR, f"{session_id}.rtrec"))
+        
+        playback.start()
+        
+        # Readers tail the live sink, turns also go to a file as they complete when TRANSCRIPT_DIR is set
+        transcript_path = None
+        if TRANSCRIPT_DIR:
+            os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+            transcript_path = os.path.join(TRANSCRIPT_DIR, f"{session_id}.jsonl")
+        transcript = TranscriptSink(transcript_path, call_id=session_id).attach(realtime_client)
+        session["transcript"] = transcript
+        
+        realtime_client.on("conversation.updated", handle_audio_delta)
+        realtime_client.on("conversation.interrupted", handle_interrupted)
+        
+        # The session is ready, greet the caller right away
+        realtime_client.call_context["caller_number"] = caller_number
+        await realtime_client.start_call()
+        
+        # Send the first message to OpenAI, after the prompt update and the greeting
+        await realtime_client.send_user_message_content([
+            {"type": "input_text", "text": first_message}
+        ])
         
         # Process WebSocket messages from Twilio
         try:
@@ -91,37 +308,25 @@ async def handle_media_stream(websocket: WebSocket, session_id: str, session: di
                 data_str = await websocket.receive_text()
                 data = json.loads(data_str)
                 
-                if data["event"] == "start":
-                    stream_sid = data["start"]["streamSid"]
-                    call_sid = data["start"]["callSid"]
-                    custom_parameters = data["start"].get("customParameters", {})
-                    
-                    logger.info(f"CallSid: {call_sid}")
-                    logger.info(f"StreamSid: {stream_sid}")
-                    logger.info(f"Custom Parameters: {custom_parameters}")
-                    
-                    # Capture callerNumber and firstMessage from custom parameters
-                    caller_number = custom_parameters.get("callerNumber", "Unknown")
-                    session["caller_number"] = caller_number
-                    first_message = custom_parameters.get("firstMessage", "Hello, how can I assist you?")
-                    
-                    logger.info(f"First Message: {first_message}")
-                    logger.info(f"Caller Number: {caller_number}")
-                    
-                    # Send the first message to OpenAI
-                    await realtime_client.send_user_message_content([
-                        {"type": "input_text", "text": first_message}
-                    ])
-                    
-                elif data["event"] == "media":
+                if data["event"] == "media":
                     # Send audio data to OpenAI
                     await realtime_client.append_input_audio(data["media"]["payload"])
+                
+                elif data["event"] == "mark":
+                    # Twilio finished playing the audio before this mark
+                    playback.on_mark(data["mark"]["name"])
                     
         except WebSocketDisconnect:
             logger.info(f"Twilio WebSocket disconnected")
         except Exception as e:
             logger.error(f"Error processing Twilio messages: {e}")
-            
+            logger.error(f"Last Realtime events ({session_id}):\n{realtime_client.event_tap.format_history(50)}")
+
     finally:
+        sessions.pop(session_id, None)
+        await playback.close()
+        if transcript is not None:
+            await transcript.close()
         # Disconnect from OpenAI
-        await realtime_client.disconnect()
\ No newline at end of file
+        if realtime_client is not None:
+            await realtime_client.disconnect()
\ No newline at end of file
@@ -9,6 +9,7 @@ import requests
 from dotenv import load_dotenv
 from variables.variables import load_variables
 from utils.create_token import create_token
+from utils.availability_cache import AvailabilityCache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -19,6 +20,8 @@ load_dotenv()
 # Load environment variables
 secret_key = os.getenv("secret_key")
 PWA_CRM_API_URL = os.getenv("PWA_CRM_API_URL")
+# Seconds to connect to, and then to wait on, the CRM; a hung request holds one of the cache's fetch threads
+AVAILABILITY_REQUEST_TIMEOUT = float(os.getenv("AVAILABILITY_REQUEST_TIMEOUT", "8"))
 
 def get_availability(dealer_id):
     if not PWA_CRM_API_URL:
@@ -30,7 +33,7 @@ def get_availability(dealer_id):
     logger.info(f"Making API request to: {time_url}")
     logger.debug(f"Headers: {headers}")
     
-    response = requests.get(time_url, headers=headers)
+    response = requests.get(time_url, headers=headers, timeout=AVAILABILITY_REQUEST_TIMEOUT)
     
     # Log response details for debugging
     logger.info(f"API response status code: {response.status_code}")
@@ -74,6 +77,93 @@ def parse_response_safely(response):
             "status_code": response.status_code
         }
 
+class AvailabilityError(Exception):
+    """The CRM did not return usable availability. `result` is the tool's error response."""
+
+    def __init__(self, result):
+        super().__init__(result.get("error"))
+        self.result = result
+
+
+def convert_to_24hour(time_str):
+    """Convert 12-hour format (e.g., '02:00 PM') to 24-hour format (e.g., '14:00')"""
+    try:
+        return datetime.strptime(time_str, "%I:%M %p").strftime("%H:%M")
+    except ValueError as e:
+        logger.error(f"Error converting time: {e}")
+        return None
+
+
+def index_availability(availability_data):
+    """
+    Parse the slots of every date once, so lookups only compare times.
+
+    Returns:
+        dict: date (YYYY-MM-DD) -> list of slots with their start as a datetime,
+        or None for a date without hours
+    """
+    index = {}
+    for date_item in availability_data.get("dates", []):
+        date = date_item["date"]
+        if date in index:
+            # The first entry of a date wins, as it always has
+            continue
+        if not date_item.get("hours"):
+            index[date] = None
+            continue
+        slots = index[date] = []
+        for slot in date_item["hours"]:
+            # Ensure slot has required fields
+            if "start" not in slot or "end" not in slot:
+                logger.warning(f"⚠️ Skipping slot with missing start or end time: {slot}")
+                continue
+            try:
+                start_time_24h = convert_to_24hour(slot["start"])
+                end_time_24h = convert_to_24hour(slot["end"])
+                if not start_time_24h or not end_time_24h:
+                    logger.warning(f"⚠️ Could not convert time format for slot: {slot}")
+                    continue
+                slots.append({
+                    "start": datetime.strptime(f"{date} {start_time_24h}", "%Y-%m-%d %H:%M"),
+                    "time": slot["start"],
+                    "end_time": slot["end"],
+                    "time_24h": start_time_24h,
+                    "end_time_24h": end_time_24h,
+                    "agent_ids": slot.get("agent_ids", []),
+                })
+            except ValueError as e:
+                # Log and skip slots with invalid date/time format
+                logger.warning(f"⚠️ Invalid date/time format in slot: {slot}. Error: {str(e)}")
+    return index
+
+
+def fetch_availability(dealer_id):
+    """Fetch and index a dealer's availability. Raises AvailabilityError if the CRM response is unusable."""
+    response = get_availability(dealer_id)
+    
+    if response.status_code != 200:
+        logger.error(f"❌ API request failed with status code: {response.status_code}")
+        logger.error(f"Response content: {response.text}")
+        raise AvailabilityError({
+            "error": f"Failed to retrieve availability. Status code: {response.status_code}",
+            "details": response.text
+        })
+    
+    # Parse the response safely
+    availability_data = parse_response_safely(response)
+    
+    # Check if there was an error parsing the response
+    if "error" in availability_data:
+        logger.error(f"❌ Error parsing API response: {availability_data['error']}")
+        raise AvailabilityError(availability_data)
+    
+    logger.info(f"Successfully parsed availability data")
+    return index_availability(availability_data)
+
+
+# Availability per dealer, refreshed in the background; invalidate it when a booking changes it
+availability_cache = AvailabilityCache(fetch_availability)
+
 # Define the function definition for the tool
 get_availability_def = {
     "name": "get_availability",
@@ -98,7 +188,7 @@ get_availability_def = {
     },
 }
 
-async def get_availability_handler(date: str, time: str, time_window: int = 3):
+async def get_availability_handler(date: str, time: str, time_window: int = 3, dealer_id=None):
     """
     Finds the nearest available time slot for a dealer based on customer's preferred time.
     
@@ -106,6 +196,7 @@ async def get_availability_handler(date: str, time: str, time_window: int = 3):
         date: The date to check availability for in YYYY-MM-DD format
         time: The preferred time in HH:MM format (24-hour)
         time_window: Optional time window in hours to search for available slots (default: 3)
+        dealer_id: The call's dealer, passed by the client, defaults to the dealer_id in variables
         
     Returns:
         JSON response with the nearest available time slot
@@ -115,9 +206,10 @@ async def get_availability_handler(date: str, time: str, time_window: int = 3):
     try:
         logger.info(f"🔍 Checking dealer availability near date: {date}, time: {time}")
         
-        # Load dealer_id from variables
-        variables = load_variables()
-        dealer_id = variables.get("dealer_id")
+        # Load dealer_id from variables unless the client passed the call's dealer
+        if dealer_id is None:
+            variables = load_variables()
+            dealer_id = variables.get("dealer_id")
         
         if not dealer_id:
             logger.error("❌ dealer_id not found in variables")
@@ -133,50 +225,19 @@ async def get_availability_handler(date: str, time: str, time_window: int = 3):
             logger.error(f"❌ Date/time parsing error: {str(e)}")
             return {"error": f"Invalid date or time format. Please use YYYY-MM-DD for date and HH:MM for time."}
         
-        # Call the existing get_availability function
-        response = get_availability(dealer_id)
-        
-        if response.status_code != 200:
-            logger.error(f"❌ API request failed with status code: {response.status_code}")
-            logger.error(f"Response content: {response.text}")
-            return {
-                "error": f"Failed to retrieve availability. Status code: {response.status_code}",
-                "details": response.text
-            }
-        
-        # Parse the response safely
-        availability_data = parse_response_safely(response)
-        
-        # Check if there was an error parsing the response
-        if "error" in availability_data:
-            logger.error(f"❌ Error parsing API response: {availability_data['error']}")
-            return availability_data
-        
-        logger.info(f"Successfully parsed availability data")
-        
-        # Helper function to convert 12-hour time to 24-hour time
-        def convert_to_24hour(time_str):
-            """Convert 12-hour format (e.g., '02:00 PM') to 24-hour format (e.g., '14:00')"""
-            try:
-                return datetime.strptime(time_str, "%I:%M %p").strftime("%H:%M")
-            except ValueError as e:
-                logger.error(f"Error converting time: {e}")
-                return None
+        # Availability is fetched once per dealer and refreshed in the background
+        try:
+            availability = await availability_cache.get(dealer_id)
+        except AvailabilityError as e:
+            return e.result
         
         # Find the nearest available time slot
         nearest_slot = None
         min_time_diff = timedelta(hours=24*7)  # Initialize with a large value (1 week)
         all_available_slots = []
         
-        # Find the date entry for the requested date
-        date_entry = None
-        for date_item in availability_data.get("dates", []):
-            if date_item["date"] == date:
-                date_entry = date_item
-                break
-        
         # Check if we found the date and it has hours data
-        if not date_entry:
+        if date not in availability:
             logger.warning(f"⚠️ No data found for date: {date}")
             return {
                 "available": False,
@@ -185,7 +246,7 @@ async def get_availability_handler(date: str, time: str, time_window: int = 3):
                 "alternative_slots": []
             }
         
-        if "hours" not in date_entry or not date_entry["hours"]:
+        if availability[date] is None:
             logger.warning(f"⚠️ No time slots available for date: {date}")
             return {
                 "available": False,
@@ -195,65 +256,38 @@ async def get_availability_handler(date: str, time: str, time_window: int = 3):
             }
         
         # Process all time slots for this date
-        for slot in date_entry["hours"]:
-            # Ensure slot has required fields
-            if "start" not in slot or "end" not in slot:
-                logger.warning(f"⚠️ Skipping slot with missing start or end time: {slot}")
-                continue
+        now = datetime.now()
+        for slot in availability[date]:
+            slot_datetime = slot["start"]
             
-            try:
-                # Convert 12-hour format to 24-hour format
-                start_time_12h = slot["start"]
-                end_time_12h = slot["end"]
-                start_time_24h = convert_to_24hour(start_time_12h)
-                end_time_24h = convert_to_24hour(end_time_12h)
-                
-                if not start_time_24h or not end_time_24h:
-                    logger.warning(f"⚠️ Could not convert time format for slot: {slot}")
-                    continue
-                
-                # Create datetime objects for comparison
-                slot_datetime = datetime.strptime(f"{date} {start_time_24h}", "%Y-%m-%d %H:%M")
-                
-                # Only consider future slots
-                if slot_datetime < datetime.now():
-                    logger.debug(f"Skipping past slot: {date} {start_time_12h}")
-                    continue
-                
-                # Calculate time difference
-                time_diff = abs(slot_datetime - requested_datetime)
-                time_diff_hours = time_diff.total_seconds() / 3600
-                
-                # Store all slots within the time window for additional options
-                if time_diff_hours <= time_window:
-                    all_available_slots.append({
-                        "date": date,
-                        "time": start_time_12h,
-                        "end_time": end_time_12h,
-                        "time_24h": start_time_24h,
-                        "end_time_24h": end_time_24h,
-                        "time_diff_minutes": int(time_diff.total_seconds() / 60),
-                        "datetime": slot_datetime.strftime("%Y-%m-%d %H:%M"),
-                        "agent_ids": slot.get("agent_ids", [])
-                    })
-                
-                # Update nearest slot if this one is closer
-                if time_diff < min_time_diff:
-                    min_time_diff = time_diff
-                    nearest_slot = {
-                        "date": date,
-                        "time": start_time_12h,
-                        "end_time": end_time_12h,
-                        "time_24h": start_time_24h,
-                        "end_time_24h": end_time_24h,
-                        "time_diff_minutes": int(time_diff.total_seconds() / 60),
-                        "datetime": slot_datetime.strftime("%Y-%m-%d %H:%M"),
-                        "agent_ids": slot.get("agent_ids", [])
-                    }
-            except ValueError as e:
-                # Log and skip slots with invalid date/time format
-                logger.warning(f"⚠️ Invalid date/time format in slot: {slot}. Error: {str(e)}")
+            # Only consider future slots
+            if slot_datetime < now:
+                logger.debug(f"Skipping past slot: {date} {slot['time']}")
                 continue
+            
+            # Calculate time difference
+            time_diff = abs(slot_datetime - requested_datetime)
+            time_diff_hours = time_diff.total_seconds() / 3600
+            
+            candidate = {
+                "date": date,
+                "time": slot["time"],
+                "end_time": slot["end_time"],
+                "time_24h": slot["time_24h"],
+                "end_time_24h": slot["end_time_24h"],
+                "time_diff_minutes": int(time_diff.total_seconds() / 60),
+                "datetime": slot_datetime.strftime("%Y-%m-%d %H:%M"),
+                "agent_ids": slot["agent_ids"]
+            }
+            
+            # Store all slots within the time window for additional options
+            if time_diff_hours <= time_window:
+                all_available_slots.append(candidate)
+            
+            # Update nearest slot if this one is closer
+            if time_diff < min_time_diff:
+                min_time_diff = time_diff
+                nearest_slot = candidate
         
         if not nearest_slot:
             logger.warning(f"⚠️ No availability found near {date} {time}")
@@ -1,10 +1,8 @@
 import logging
 import os
-import pandas as pd
-import pandasql as ps
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
 from variables.variables import load_variables
+from utils.dealer_snapshot import dealer_snapshots
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -25,39 +23,27 @@ get_dealers_info_def = {
 }
 
 
-async def get_dealers_info_handler(sql_query: str):
-    """Executes an SQL query on the dealers_info table and returns the result."""
+async def get_dealers_info_handler(sql_query: str, dealer_id=None):
+    """Executes an SQL query on the dealers_info table of the call's dealer and returns the result."""
     load_dotenv()
     
     try:
         logger.info(f"🔍 Executing dealer information query: {sql_query}")
         
-        # Database connection setup
-        DB_USER_READ = os.getenv("DB_USER_READ")
-        DB_PASSWORD_READ = os.getenv("DB_PASSWORD_READ")
-        DB_HOST_READ = os.getenv("DB_HOST_READ")
-        DB_PORT_READ = os.getenv("DB_PORT_READ")
-        DB_NAME_READ = os.getenv("DB_NAME_READ")
-        engine = create_engine(f"mysql+pymysql://{DB_USER_READ}:{DB_PASSWORD_READ}@{DB_HOST_READ}:{DB_PORT_READ}/{DB_NAME_READ}")
+        # The call's dealer, passed by the client, or the dealer_id from the JSON file
+        if dealer_id is None:
+            variables = load_variables()
+            dealer_id = variables["dealer_id"]
         
-        # Load dealer_id from JSON file
-        variables = load_variables()
-        dealer_id = variables["dealer_id"]
+        # Run the query on the dealer's in-memory snapshot of dealers_info
+        result = await dealer_snapshots.query(dealer_id, sql_query)
         
-        # Load dealers_info data
-        dealers_df = pd.read_sql_query(f"SELECT * FROM dealers_info WHERE dealer_id = {dealer_id}", engine)
-        print("dealers_df",dealers_df)
-        # Execute SQL query on DataFrame
-        env = {"dealers_info": dealers_df}
-        print("sql_query",sql_query)
-        result_df = ps.sqldf(sql_query, env)
-        
-        if result_df.empty:
+        if result is None:
             logger.warning("⚠️ No results found for the given query.")
             return {"error": "No matching records found."}
         
         logger.info("✅ Dealer information retrieved successfully.")
-        return result_df.to_json()
+        return result
         
     except Exception as e:
         logger.error(f"❌ Error executing query: {str(e)}")
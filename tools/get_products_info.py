@@ -72,12 +72,13 @@ get_products_info_def = {
     }
 }
 
-async def get_products_info_handler(filters: dict):
+async def get_products_info_handler(filters: dict, dealer_id=None):
     """
     Retrieves product information from the inventory API and analyzes the results using OpenAI's LLM.
     
     Args:
         filters (dict): Dictionary of filters to apply to the product search.
+        dealer_id: The call's dealer, passed by the client, defaults to the dealer_id in variables
         
     Returns:
         dict: Contains analyzed product insights or an error message.
@@ -101,8 +102,9 @@ async def get_products_info_handler(filters: dict):
             elif key == 'price_type':
                 api_filters.append(["price_type", "=", value])
         
-        variables = load_variables()
-        dealer_id = variables.get("dealer_id")
+        if dealer_id is None:
+            variables = load_variables()
+            dealer_id = variables.get("dealer_id")
 
         data = {
             "user_id": dealer_id,
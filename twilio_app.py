@@ -6,11 +6,15 @@ import os
 import json
 import asyncio
 import logging
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+import secrets
+from typing import Optional
+from fastapi import FastAPI, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 from dotenv import load_dotenv
 
-from routes.websocket import handle_media_stream
+from routes.websocket import handle_media_stream, session_pool, current_profile
+from realtime.metrics import registry
+from utils.dealer_profile import dealer_profiles
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +29,9 @@ logger = logging.getLogger(__name__)
 # Retrieve the OpenAI API key from environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Bearer token required to read live transcripts, which hold caller data; unset disables the endpoint
+TRANSCRIPT_API_TOKEN = os.getenv("TRANSCRIPT_API_TOKEN")
+
 # Check if the API key is missing
 if not OPENAI_API_KEY:
     logging.error("Missing OpenAI API key. Please set it in the .env file.")
@@ -36,11 +43,41 @@ app = FastAPI()
 # Session management: Store session data for ongoing calls
 sessions = {}
 
+# Keep pre-warmed Realtime sessions ready so calls skip the connection handshake
+@app.on_event("startup")
+async def start_session_pool():
+    # One query loads every dealer profile, calls then read them from memory
+    await dealer_profiles.preload()
+    session_pool.warm(current_profile())
+    session_pool.start()
+
+@app.on_event("shutdown")
+async def stop_session_pool():
+    await session_pool.close()
+
 # Root route - just for checking if the server is running
 @app.get("/")
 async def root():
     return {"message": "Twilio Media Stream Server is running!"}
 
+# Latency histograms and load gauges in the Prometheus text format
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Turns of a live call (by CallSid) after `cursor`, poll again with the returned cursor
+@app.get("/calls/{session_id}/transcript")
+async def call_transcript(session_id: str, cursor: int = 0, authorization: Optional[str] = Header(None)):
+    if not TRANSCRIPT_API_TOKEN:
+        return JSONResponse({"error": "Transcripts are disabled"}, status_code=404)
+    if not secrets.compare_digest(authorization or "", f"Bearer {TRANSCRIPT_API_TOKEN}"):
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    session = sessions.get(session_id)
+    if not session or session.get("transcript") is None:
+        return JSONResponse({"error": "Unknown or finished call"}, status_code=404)
+    turns, cursor = session["transcript"].tail(cursor)
+    return {"turns": [turn._asdict() for turn in turns], "cursor": cursor}
+
 # Handle incoming calls from Twilio
 @app.post("/incoming-call")
 @app.get("/incoming-call")
@@ -62,15 +99,21 @@ async def incoming_call(request: Request):
     logging.info(f"Caller Number: {caller_number}")
     logging.info(f"Session ID (CallSid): {session_id}")
     
+    # The dealer owning the dialed number
+    dialed_dealer = dealer_profiles.get_by_phone(twilio_params.get("To"))
+    if dialed_dealer:
+        logging.info(f"Dialed dealer: {dialed_dealer.dealer_id}")
+    
     # Set default first message
     first_message = "Hello, welcome to our service. How can I assist you today?"
     
     # Set up a new session for this call
     session = {
-        "transcript": "",
+        "transcript": None,
         "stream_sid": None,
         "caller_number": caller_number,
         "call_details": twilio_params,
+        "dealer_id": dialed_dealer.dealer_id if dialed_dealer else None,
         "first_message": first_message
     }
     sessions[session_id] = session
@@ -94,17 +137,8 @@ async def incoming_call(request: Request):
 # WebSocket route for the media stream
 @app.websocket("/media-stream")
 async def media_stream(websocket: WebSocket):
-    # Use Twilio's CallSid as the session ID or create a new one
-    headers = dict(websocket.headers)
-    session_id = headers.get("x-twilio-call-sid", f"session_{int(asyncio.get_event_loop().time())}")
-    session = sessions.get(session_id, {"transcript": "", "stream_sid": None})
-    
-    # Handle the WebSocket connection
-    await handle_media_stream(websocket, session_id, session)
-    
-    # Clean up the session
-    if session_id in sessions:
-        del sessions[session_id]
+    # The call's session is found by the CallSid of the stream's start message, and removed when it ends
+    await handle_media_stream(websocket, sessions)
 
 # Run the FastAPI application with uvicorn
 if __name__ == "__main__":
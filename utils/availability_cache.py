@@ -0,0 +1,135 @@
+"""
+Per-dealer cache of CRM availability, for the get_availability tool.
+
+Availability is fetched with a blocking HTTP call, so `fetch(dealer_id)`
+runs on a small thread pool. Concurrent lookups of a dealer share one
+fetch. An entry younger than `ttl` is served from memory. Up to
+`stale_ttl` later it is still served at once while a refresh runs in the
+background. Past that, the lookup waits for a new fetch, at most
+`wait_timeout` seconds. Failed fetches are not cached.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Seconds availability is served as is, then served stale while it is refetched
+AVAILABILITY_TTL = float(os.getenv("AVAILABILITY_TTL", "60"))
+AVAILABILITY_STALE_TTL = float(os.getenv("AVAILABILITY_STALE_TTL", "300"))
+# Seconds a lookup waits for a fetch, the fetch itself carries on and fills the cache
+AVAILABILITY_WAIT_TIMEOUT = float(os.getenv("AVAILABILITY_WAIT_TIMEOUT", "5"))
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class AvailabilityCache:
+    """Results of `fetch(dealer_id)` per dealer, with single-flight fetches and background refresh."""
+
+    def __init__(self,
+                 fetch,
+                 ttl: float = AVAILABILITY_TTL,
+                 stale_ttl: float = AVAILABILITY_STALE_TTL,
+                 wait_timeout: float = AVAILABILITY_WAIT_TIMEOUT,
+                 max_workers: int = 4):
+        """
+        Initialize the availability cache.
+
+        Args:
+            fetch: Blocking function returning the parsed availability of a dealer
+            ttl: Seconds an entry is served without refetching
+            stale_ttl: Seconds past `ttl` an entry is still served while it is refetched
+            wait_timeout: Seconds a lookup waits for a fetch before raising TimeoutError
+            max_workers: Threads running fetches
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.wait_timeout = wait_timeout
+        self._entries = {}
+        self._fetching = {}
+        # Bumped by invalidate, a fetch started before it does not store its result
+        self._generations = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="availability")
+
+        # Metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    async def _fetch(self, key, generation):
+        self.fetches += 1
+        started = time.monotonic()
+        value = await asyncio.get_running_loop().run_in_executor(self._executor, self.fetch, key)
+        if self._generations.get(key, 0) == generation:
+            self._entries[key] = _Entry(value, time.monotonic())
+        logger.info(f"Fetched availability of dealer {key} in {(time.monotonic() - started) * 1000:.0f} ms")
+        return value
+
+    def _start_fetch(self, key) -> asyncio.Future:
+        fetching = self._fetching.get(key)
+        if fetching is None:
+            fetching = self._fetching[key] = asyncio.ensure_future(self._fetch(key, self._generations.get(key, 0)))
+            fetching.add_done_callback(lambda done: self._fetch_done(key, done))
+        return fetching
+
+    def _fetch_done(self, key, done):
+        if self._fetching.get(key) is done:
+            del self._fetching[key]
+
+    def _refresh(self, key):
+        if key not in self._fetching:
+            self._start_fetch(key).add_done_callback(_log_failure)
+
+    async def get(self, dealer_id):
+        """Availability of `dealer_id`, fetched if missing or expired. Raises what `fetch` raises, or TimeoutError."""
+        key = str(dealer_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(key)
+                return entry.value
+        self.misses += 1
+        try:
+            # Shielded, a lookup giving up does not cancel the fetch other lookups share
+            return await asyncio.wait_for(asyncio.shield(self._start_fetch(key)), self.wait_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Availability of dealer {key} not fetched within {self.wait_timeout:g}s") from None
+
+    def prefetch(self, dealer_id):
+        """Start fetching `dealer_id` in the background unless it is fresh, e.g. when a call starts."""
+        if dealer_id is None:
+            return
+        key = str(dealer_id)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.fetched_at >= self.ttl:
+            self._refresh(key)
+
+    def invalidate(self, dealer_id=None):
+        """Forget one dealer, or every dealer, e.g. after an appointment is booked."""
+        keys = list(set(self._entries) | set(self._fetching)) if dealer_id is None else [str(dealer_id)]
+        for key in keys:
+            self._entries.pop(key, None)
+            # A fetch in flight may predate the change, the next lookup starts a new one
+            self._fetching.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Error refreshing availability: {future.exception()}")
@@ -2,6 +2,7 @@ import pymysql
 from pymysql import Error
 from datetime import datetime
 import os
+from .db_pool import AsyncDatabase, database_for
 
 
 
@@ -39,10 +40,10 @@ class DataBase:
             print(error_mes)
             return None  # Return None if connection fails
 
-    # Get any value from database using a SELECT query
-    def readQuery(self, conn, query, data=None, raw=False):
+    # Get any value from database using a SELECT query, rows as dicts with dictionary=True
+    def readQuery(self, conn, query, data=None, raw=False, dictionary=False):
         try:
-            with conn.cursor() as cur:
+            with conn.cursor(pymysql.cursors.DictCursor if dictionary else None) as cur:
                 if raw:
                     cur.execute(query)
                 else:
@@ -75,3 +76,24 @@ class DataBase:
     def delete_query(self, conn, query, data):
         return self.write_query(conn, query, data)  # Reuse write_query method
 
+    # Pooled connections to the same database, for code running on the event loop, see utils.db_pool
+    def pool(self) -> AsyncDatabase:
+        return database_for(self.host, self.user, self.password, self.database, self.port)
+
+    # Async readQuery on a pooled connection, does not block the event loop
+    async def read(self, query, data=None, dictionary=False):
+        try:
+            return await self.pool().fetch_all(query, data, dictionary)
+        except Exception as e:
+            error_mes = f"read function => {str(e)}"
+            print(error_mes)
+            return []
+
+    # Async write_query on a pooled connection, the pools run in autocommit
+    async def write(self, query, data=None):
+        try:
+            return await self.pool().execute(query, data)
+        except Exception as e:
+            error_mes = f"write function => {str(e)}"
+            print(error_mes)
+            return 0
@@ -0,0 +1,382 @@
+"""
+Async, pooled database access.
+
+Blocking DB-API connections are kept open in bounded pools and queries
+run on a thread pool of the same size, so coroutines await them without
+stalling the event loop. Reads go to the pool built from the `DB_*_READ`
+settings, writes to the one built from `DB_*_WRITE`, which falls back to
+the read settings. Idle connections are health checked before reuse and
+replaced after `max_lifetime`. Every query is timed into the
+`db_query_seconds` histogram and a per-statement summary.
+
+With `DB_SQLITE_PATH` set, both pools use a local SQLite database instead
+of MySQL, for tests and benchmarks without a database server.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pymysql
+
+from realtime import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's acquire timeout."""
+
+
+class MySQLBackend:
+    errors = (pymysql.err.Error,)
+
+    def __init__(self, host, user, password, database, port=3306, connect_timeout=5):
+        self.params = {
+            "host": host,
+            "user": user,
+            "password": password,
+            "database": database,
+            "port": int(port),
+            "connect_timeout": connect_timeout,
+            # Pooled connections must not sit in a transaction, reads would see a stale snapshot
+            "autocommit": True,
+        }
+
+    def connect(self):
+        return pymysql.connect(**self.params)
+
+    def cursor(self, conn, dictionary=False):
+        return conn.cursor(pymysql.cursors.DictCursor if dictionary else None)
+
+    def prepare(self, query):
+        return query
+
+    def ping(self, conn):
+        conn.ping(reconnect=False)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteBackend:
+    """
+    Local stand-in for MySQL. Queries keep the pymysql `%s` placeholders.
+
+    `latency_ms` adds a delay to every connect and query, to benchmark
+    against something closer to a remote database.
+    """
+
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path, latency_ms=0):
+        self.path = path
+        self.latency = latency_ms / 1000
+
+    def connect(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+
+    def cursor(self, conn, dictionary=False):
+        cursor = conn.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row
+        if self.latency:
+            time.sleep(self.latency)
+        return cursor
+
+    def prepare(self, query):
+        return query.replace("%s", "?")
+
+    def ping(self, conn):
+        conn.execute("SELECT 1")
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used", "broken")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+        self.broken = False
+
+
+class ConnectionPool:
+    """At most `size` connections to `backend`, and a thread per connection to use them from."""
+
+    def __init__(self,
+                 backend,
+                 name: str,
+                 size: int = 5,
+                 acquire_timeout: float = 10,
+                 health_check_after: float = 30,
+                 max_lifetime: float = 3600):
+        """
+        Initialize the connection pool.
+
+        Args:
+            backend: MySQLBackend or SQLiteBackend opening the connections
+            name: Pool name in logs and metrics, e.g. "read"
+            size: Maximum number of open connections
+            acquire_timeout: Seconds to wait for a free connection before PoolTimeout
+            health_check_after: Idle seconds after which a connection is pinged before reuse
+            max_lifetime: Seconds after which a connection is closed rather than reused
+        """
+        self.backend = backend
+        self.name = name
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        self.idle = deque()
+        self.in_use = 0
+        self.semaphore = asyncio.Semaphore(size)
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"db-{name}")
+        self.closed = False
+
+    def _update_gauges(self):
+        metrics.db_connections.set(len(self.idle), pool=self.name, state="idle")
+        metrics.db_connections.set(self.in_use, pool=self.name, state="in_use")
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _healthy(self, pooled):
+        try:
+            self.backend.ping(pooled.conn)
+            return True
+        except Exception:
+            return False
+
+    def _close(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    async def acquire(self) -> _PooledConnection:
+        if self.closed:
+            raise RuntimeError(f"Database pool {self.name} is closed")
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No {self.name} database connection free after {self.acquire_timeout}s") from None
+        try:
+            while self.idle:
+                # Most recently used first, the others age out
+                pooled = self.idle.pop()
+                now = time.monotonic()
+                if now - pooled.created_at > self.max_lifetime:
+                    await self._call(self._close, pooled)
+                    continue
+                if now - pooled.last_used > self.health_check_after and not await self._call(self._healthy, pooled):
+                    logger.warning(f"Dropping a broken {self.name} database connection")
+                    await self._call(self._close, pooled)
+                    continue
+                break
+            else:
+                pooled = _PooledConnection(await self._call(self.backend.connect))
+        except BaseException:
+            self.semaphore.release()
+            self._update_gauges()
+            raise
+        self.in_use += 1
+        self._update_gauges()
+        return pooled
+
+    def release(self, pooled: _PooledConnection, broken: bool = False):
+        self.in_use -= 1
+        if self.closed:
+            self._close(pooled)
+        elif broken:
+            self.executor.submit(self._close, pooled)
+        else:
+            pooled.last_used = time.monotonic()
+            self.idle.append(pooled)
+        self.semaphore.release()
+        self._update_gauges()
+
+    def _checked(self, fn, pooled, *args):
+        # Runs on the pool's thread, so the connection is only ever used by one thread at a time
+        try:
+            return fn(pooled.conn, *args)
+        except self.backend.errors:
+            # A failed connection is replaced, a failed statement keeps it
+            pooled.broken = not self._healthy(pooled)
+            raise
+
+    def _release_when_done(self, pooled, future):
+        if not future.cancelled():
+            future.exception()
+        self.release(pooled, pooled.broken)
+
+    async def run(self, fn, *args):
+        """Run the blocking `fn(connection, *args)` on a pooled connection."""
+        pooled = await self.acquire()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._checked, fn, pooled, *args)
+        release_later = False
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.done():
+                # The caller is gone but the thread still uses the connection,
+                # it goes back to the pool once the statement is over
+                release_later = True
+                future.add_done_callback(lambda done: self._release_when_done(pooled, done))
+            raise
+        finally:
+            if not release_later:
+                self.release(pooled, pooled.broken)
+
+    async def close(self):
+        self.closed = True
+        while self.idle:
+            await self._call(self._close, self.idle.pop())
+        self.executor.shutdown(wait=False)
+        self._update_gauges()
+
+
+class AsyncDatabase:
+    """Read and write pools with per-query timing."""
+
+    def __init__(self, read_backend, write_backend=None, pool_size: int = 5, slow_query_ms: float = 250):
+        self.read_pool = ConnectionPool(read_backend, "read", pool_size)
+        # Without a separate write server, writes share the read connections
+        self.write_pool = ConnectionPool(write_backend, "write", pool_size) if write_backend else self.read_pool
+        self.slow_query = slow_query_ms / 1000
+        # Statement text -> [count, total seconds, max seconds]
+        self.query_stats = {}
+
+    async def _timed(self, pool, fn, query, params, *args):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await pool.run(fn, pool.backend.prepare(query), params or (), *args)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.db_query_latency.observe(elapsed, pool=pool.name, status=status)
+            stats = self.query_stats.get(query)
+            if stats is None:
+                stats = self.query_stats[query] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            if elapsed > self.slow_query:
+                logger.warning(f"Slow {pool.name} query ({elapsed * 1000:.0f} ms): {' '.join(query.split())[:200]}")
+
+    def _fetch(self, backend):
+        def fetch(conn, query, params, dictionary, one):
+            cursor = backend.cursor(conn, dictionary)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchone() if one else cursor.fetchall()
+            finally:
+                cursor.close()
+        return fetch
+
+    def _execute(self, backend):
+        def execute(conn, query, params):
+            cursor = backend.cursor(conn)
+            try:
+                cursor.execute(query, params)
+                return cursor.rowcount
+            finally:
+                cursor.close()
+        return execute
+
+    async def fetch_all(self, query: str, params=None, dictionary: bool = False):
+        """Rows of a SELECT, on the read pool. Rows are dicts with dictionary=True."""
+        pool = self.read_pool
+        return list(await self._timed(pool, self._fetch(pool.backend), query, params, dictionary, False))
+
+    async def fetch_one(self, query: str, params=None, dictionary: bool = False):
+        pool = self.read_pool
+        return await self._timed(pool, self._fetch(pool.backend), query, params, dictionary, True)
+
+    async def execute(self, query: str, params=None) -> int:
+        """Run an INSERT, UPDATE or DELETE on the write pool. Returns the number of affected rows."""
+        pool = self.write_pool
+        return await self._timed(pool, self._execute(pool.backend), query, params)
+
+    def timings(self):
+        """Per-statement count, total and max seconds, slowest in total first."""
+        return sorted(
+            ((query, count, total, longest) for query, (count, total, longest) in self.query_stats.items()),
+            key=lambda stat: stat[2],
+            reverse=True,
+        )
+
+    async def close(self):
+        await self.read_pool.close()
+        if self.write_pool is not self.read_pool:
+            await self.write_pool.close()
+
+
+def database_from_env() -> AsyncDatabase:
+    pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+    sqlite_path = os.getenv("DB_SQLITE_PATH")
+    if sqlite_path:
+        return AsyncDatabase(SQLiteBackend(sqlite_path), pool_size=pool_size)
+    read = MySQLBackend(
+        host=os.getenv("DB_HOST_READ"),
+        user=os.getenv("DB_USER_READ"),
+        password=os.getenv("DB_PASSWORD_READ"),
+        database=os.getenv("DB_NAME_READ"),
+        port=os.getenv("DB_PORT_READ", 3306),
+    )
+    write = None
+    if os.getenv("DB_HOST_WRITE"):
+        write = MySQLBackend(
+            host=os.getenv("DB_HOST_WRITE"),
+            user=os.getenv("DB_USER_WRITE", os.getenv("DB_USER_READ")),
+            password=os.getenv("DB_PASSWORD_WRITE", os.getenv("DB_PASSWORD_READ")),
+            database=os.getenv("DB_NAME_WRITE", os.getenv("DB_NAME_READ")),
+            port=os.getenv("DB_PORT_WRITE", 3306),
+        )
+    return AsyncDatabase(read, write, pool_size=pool_size)
+
+
+_database: Optional[AsyncDatabase] = None
+# (host, user, database, port) -> pools, see database_for
+_databases = {}
+
+
+def _database_key(host, user, database, port):
+    return (host, user, database, int(port))
+
+
+def _env_read_key():
+    return _database_key(
+        os.getenv("DB_HOST_READ"), os.getenv("DB_USER_READ"), os.getenv("DB_NAME_READ"), os.getenv("DB_PORT_READ", 3306)
+    )
+
+
+def get_database() -> AsyncDatabase:
+    """The process-wide pools, created from the environment on first use."""
+    global _database
+    if _database is None:
+        _database = database_from_env()
+    return _database
+
+
+def database_for(host, user, password, database, port=3306) -> AsyncDatabase:
+    """Pools for one set of MySQL credentials, shared by every caller using them."""
+    key = _database_key(host, user, database, port)
+    if os.getenv("DB_SQLITE_PATH") or key == _env_read_key():
+        # The process-wide pools of get_database(), not a second set to the same server
+        return get_database()
+    pools = _databases.get(key)
+    if pools is None:
+        backend = MySQLBackend(host=host, user=user, password=password, database=database, port=port)
+        pools = _databases[key] = AsyncDatabase(backend, pool_size=int(os.getenv("DB_POOL_SIZE", "5")))
+    return pools
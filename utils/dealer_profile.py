@@ -0,0 +1,223 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import NamedTuple, Optional
+from .db import DataBase
+
+logger = logging.getLogger(__name__)
+
+DB_HOST_READ = os.getenv("DB_HOST_READ")
+DB_USER_READ = os.getenv("DB_USER_READ")
+DB_PASSWORD_READ = os.getenv("DB_PASSWORD_READ")
+DB_NAME_READ = os.getenv("DB_NAME_READ")
+DB_PORT_READ = int(os.getenv("DB_PORT_READ", 3306))  # Providing a default value for the port
+
+# Seconds a profile is served as is, then served stale while it is reloaded
+DEALER_PROFILE_TTL = float(os.getenv("DEALER_PROFILE_TTL", "300"))
+DEALER_PROFILE_STALE_TTL = float(os.getenv("DEALER_PROFILE_STALE_TTL", "3600"))
+
+
+class DealerProfile(NamedTuple):
+    dealer_id: object
+    voice: Optional[str]
+    bot_name: Optional[str]
+    welcome_script: Optional[str]
+    phone: Optional[str]
+    fields: dict
+
+
+def normalize_phone(number) -> Optional[str]:
+    """Last 10 digits of a phone number, so "+1 (555) 010-2030" and "5550102030" match."""
+    if not number:
+        return None
+    digits = re.sub(r"\D", "", str(number))
+    return digits[-10:] or None
+
+
+class _Entry:
+    __slots__ = ("profile", "loaded_at")
+
+    def __init__(self, profile, loaded_at):
+        self.profile = profile
+        self.loaded_at = loaded_at
+
+
+class DealerProfileCache:
+    """
+    `dealers_info` rows cached in memory, keyed by dealer id and by phone number.
+
+    Rows are loaded through the async connection pools, see utils.db_pool.
+    A profile younger than `ttl` is served from memory. Up to `stale_ttl`
+    later it is still served at once while it is reloaded in the background
+    (stale-while-revalidate), past that `load()` waits for a reload.
+    `get()` never waits: it serves what is cached and loads a missing
+    profile in the background, so code on the event loop awaits `load()`
+    first when it needs a profile. A dealer the database failed to return
+    is not looked up again for `retry_after` seconds, so an unreachable
+    database does not stall every call.
+    """
+
+    def __init__(self,
+                 ttl: float = DEALER_PROFILE_TTL,
+                 stale_ttl: float = DEALER_PROFILE_STALE_TTL,
+                 retry_after: float = 30):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.retry_after = retry_after
+        self._by_id = {}
+        self._by_phone = {}
+        self._failed_at = {}
+        self._loading = {}
+
+        # Metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    def _database(self):
+        return DataBase(
+            host=DB_HOST_READ,
+            user=DB_USER_READ,
+            password=DB_PASSWORD_READ,
+            database=DB_NAME_READ,
+            port=DB_PORT_READ
+        )
+
+    async def _query(self, dealer_id=None):
+        """Rows of dealers_info, for one dealer or all of them, or None if the database is unreachable."""
+        pool = self._database().pool()
+        self.queries += 1
+        try:
+            if dealer_id is None:
+                return await pool.fetch_all("SELECT * FROM dealers_info", dictionary=True)
+            return await pool.fetch_all("SELECT * FROM dealers_info WHERE dealer_id = %s", (dealer_id,), dictionary=True)
+        except Exception as e:
+            logger.error(f"Error loading dealer profiles: {str(e)}")
+            return None
+
+    def _store(self, row, loaded_at):
+        profile = DealerProfile(
+            dealer_id=row.get("dealer_id"),
+            voice=row.get("voice"),
+            bot_name=row.get("bot_name"),
+            welcome_script=row.get("welcome_script"),
+            phone=row.get("phone"),
+            fields=row,
+        )
+        key = str(profile.dealer_id)
+        previous = self._by_id.get(key)
+        if previous is not None and previous.profile.phone != profile.phone:
+            self._by_phone.pop(normalize_phone(previous.profile.phone), None)
+        self._by_id[key] = _Entry(profile, loaded_at)
+        phone = normalize_phone(profile.phone)
+        if phone:
+            self._by_phone[phone] = key
+        self._failed_at.pop(key, None)
+        return profile
+
+    async def preload(self) -> int:
+        """Load every dealer in one query, e.g. at startup. Returns the number of profiles loaded."""
+        rows = await self._query()
+        if rows is None:
+            logger.error("Could not preload dealer profiles, the database is unreachable")
+            return 0
+        loaded_at = time.monotonic()
+        for row in rows:
+            self._store(row, loaded_at)
+        logger.info(f"Preloaded {len(rows)} dealer profiles")
+        return len(rows)
+
+    async def _load(self, key):
+        rows = await self._query(key)
+        if not rows:
+            self._failed_at[key] = time.monotonic()
+            return None
+        return self._store(rows[0], time.monotonic())
+
+    def _start_load(self, key) -> asyncio.Future:
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = self._loading[key] = asyncio.ensure_future(self._load(key))
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        return loading
+
+    def _recently_failed(self, key, now) -> bool:
+        failed_at = self._failed_at.get(key)
+        return failed_at is not None and now - failed_at < self.retry_after
+
+    def _refresh(self, key):
+        """Reload `key` in the background, unless it is loading or failed recently."""
+        if key in self._loading or self._recently_failed(key, time.monotonic()):
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to load on, the next load() fetches it
+            return
+        self._start_load(key)
+
+    def _cached(self, key):
+        """The cached profile of `key`, and whether it is missing or too old to serve without reloading."""
+        now = time.monotonic()
+        entry = self._by_id.get(key)
+        if entry is not None:
+            age = now - entry.loaded_at
+            if age < self.ttl:
+                self.hits += 1
+                return entry.profile, False
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(key)
+                return entry.profile, False
+        profile = entry.profile if entry is not None else None
+        if self._recently_failed(key, now):
+            # Serve the expired profile rather than nothing while the database is down
+            return profile, False
+        self.misses += 1
+        return profile, True
+
+    async def load(self, dealer_id) -> Optional[DealerProfile]:
+        """Profile of `dealer_id`, loaded if missing or expired. None if it is unknown or the database is unreachable."""
+        if dealer_id is None:
+            return None
+        key = str(dealer_id)
+        profile, expired = self._cached(key)
+        if not expired:
+            return profile
+        loaded = await asyncio.shield(self._start_load(key))
+        return loaded if loaded is not None else profile
+
+    def get(self, dealer_id) -> Optional[DealerProfile]:
+        """Cached profile of `dealer_id` without waiting for the database, a missing one is loaded in the background."""
+        if dealer_id is None:
+            return None
+        key = str(dealer_id)
+        profile, expired = self._cached(key)
+        if expired:
+            self._refresh(key)
+        return profile
+
+    def get_by_phone(self, number) -> Optional[DealerProfile]:
+        """Cached profile of the dealer reached at `number`, e.g. the number a caller dialed."""
+        key = self._by_phone.get(normalize_phone(number))
+        return self.get(key) if key is not None else None
+
+    def invalidate(self, dealer_id=None):
+        """Forget one dealer, or every dealer, so the next lookup reloads it."""
+        if dealer_id is None:
+            self._by_id.clear()
+            self._by_phone.clear()
+            self._failed_at.clear()
+            return
+        key = str(dealer_id)
+        entry = self._by_id.pop(key, None)
+        if entry is not None:
+            self._by_phone.pop(normalize_phone(entry.profile.phone), None)
+        self._failed_at.pop(key, None)
+
+
+# Shared by every caller in the process
+dealer_profiles = DealerProfileCache()
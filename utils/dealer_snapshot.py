@@ -0,0 +1,203 @@
+"""
+In-memory SQL snapshots of `dealers_info`, for the get_dealers_info tool.
+
+The model sends SQL against `dealers_info`. Instead of loading the dealer's
+rows into pandas and letting pandasql build a fresh SQLite database for
+every query, each dealer's rows are loaded once into an in-memory SQLite
+database that stays open until `ttl` expires. Connections keep their
+compiled statements, queries are normalized so that formatting differences
+share one statement and one cached result, and an authorizer keeps the
+snapshot read-only.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import datetime as dt
+from decimal import Decimal
+from collections import OrderedDict
+
+from .db_pool import get_database
+
+logger = logging.getLogger(__name__)
+
+# Seconds a dealer's snapshot is queried before it is reloaded from the database
+DEALER_SNAPSHOT_TTL = float(os.getenv("DEALER_SNAPSHOT_TTL", "300"))
+
+# Quoted literals and identifiers are kept as is, whitespace elsewhere is collapsed
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`)""")
+
+_READ_ONLY_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+class SnapshotQueryError(Exception):
+    """The query is not a valid read-only query of the snapshot."""
+
+
+def normalize_sql(query: str) -> str:
+    """`query` with whitespace collapsed outside of quotes and no trailing semicolon."""
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    return "".join(part if i % 2 else " ".join(part.split()) for i, part in enumerate(parts))
+
+
+def _quote(identifier) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _sqlite_value(value):
+    # The types pandas used to hand to pandasql, as SQLite stores them
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dt.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, (dt.date, dt.time, dt.timedelta)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode(errors="replace")
+    return value
+
+
+def _json_value(value):
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def records_to_json(columns, rows) -> str:
+    """Rows in the layout of pandas DataFrame.to_json(): {column: {row index: value}}."""
+    return json.dumps(
+        {column: {str(i): _json_value(row[c]) for i, row in enumerate(rows)} for c, column in enumerate(columns)},
+        separators=(",", ":"),
+        default=str,
+    ).replace("/", "\\/")  # pandas escapes slashes, "/" only occurs inside JSON strings
+
+
+def _authorize(action, arg1, arg2, database, trigger):
+    return sqlite3.SQLITE_OK if action in _READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class _Snapshot:
+    __slots__ = ("conn", "loaded_at", "results")
+
+    def __init__(self, conn, loaded_at):
+        self.conn = conn
+        self.loaded_at = loaded_at
+        # Normalized query -> to_json output, or None for no rows
+        self.results = OrderedDict()
+
+
+class DealerSnapshotCache:
+    """
+    One in-memory SQLite database per dealer, holding its `dealers_info` rows.
+
+    A snapshot is reloaded once it is older than `ttl`. Concurrent calls for
+    a dealer that is loading share the one load. The last `max_results`
+    results of each snapshot are cached by normalized query and dropped with
+    the snapshot. A query runs at most `query_timeout` seconds.
+    """
+
+    def __init__(self,
+                 ttl: float = DEALER_SNAPSHOT_TTL,
+                 max_results: int = 128,
+                 query_timeout: float = 0.5):
+        self.ttl = ttl
+        self.max_results = max_results
+        self.query_timeout = query_timeout
+        self._snapshots = {}
+        self._loading = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def _build(self, rows) -> _Snapshot:
+        columns = list(rows[0])
+        # Statements stay compiled in the connection's cache, keyed by their text
+        conn = sqlite3.connect(":memory:", check_same_thread=False, cached_statements=self.max_results)
+        conn.execute(f"CREATE TABLE dealers_info ({', '.join(_quote(column) for column in columns)})")
+        conn.executemany(
+            f"INSERT INTO dealers_info VALUES ({', '.join('?' for _ in columns)})",
+            ([_sqlite_value(row.get(column)) for column in columns] for row in rows),
+        )
+        conn.commit()
+        conn.set_authorizer(_authorize)
+        return _Snapshot(conn, time.monotonic())
+
+    async def _load(self, key) -> _Snapshot:
+        self.loads += 1
+        rows = await get_database().fetch_all(
+            "SELECT * FROM dealers_info WHERE dealer_id = %s", (key,), dictionary=True
+        )
+        snapshot = self._build(rows) if rows else None
+        previous = self._snapshots.pop(key, None)
+        if previous is not None:
+            previous.conn.close()
+        if snapshot is not None:
+            self._snapshots[key] = snapshot
+        return snapshot
+
+    async def snapshot(self, dealer_id):
+        """The dealer's snapshot, loaded if missing or expired. None if the dealer has no rows."""
+        key = str(dealer_id)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl:
+            return snapshot
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = self._loading[key] = asyncio.ensure_future(self._load(key))
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(loading)
+
+    def _execute(self, snapshot, query):
+        deadline = time.monotonic() + self.query_timeout
+        snapshot.conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            cursor = snapshot.conn.execute(query)
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            raise SnapshotQueryError(str(e)) from None
+        finally:
+            snapshot.conn.set_progress_handler(None, 0)
+        if not rows:
+            return None
+        return records_to_json([column[0] for column in cursor.description], rows)
+
+    async def query(self, dealer_id, sql_query: str):
+        """
+        Run `sql_query` on the dealer's snapshot.
+
+        Returns:
+            str: The result in the DataFrame.to_json() layout, or None if the
+            query, or the dealer, has no rows
+        """
+        snapshot = await self.snapshot(dealer_id)
+        if snapshot is None:
+            return None
+        query = normalize_sql(sql_query)
+        results = snapshot.results
+        if query in results:
+            self.hits += 1
+            results.move_to_end(query)
+            return results[query]
+        self.misses += 1
+        result = results[query] = self._execute(snapshot, query)
+        if len(results) > self.max_results:
+            results.popitem(last=False)
+        return result
+
+    def invalidate(self, dealer_id=None):
+        """Drop one dealer's snapshot, or every snapshot, so the next query reloads it."""
+        keys = list(self._snapshots) if dealer_id is None else [str(dealer_id)]
+        for key in keys:
+            snapshot = self._snapshots.pop(key, None)
+            if snapshot is not None:
+                snapshot.conn.close()
+
+
+# Shared by every call in the process
+dealer_snapshots = DealerSnapshotCache()